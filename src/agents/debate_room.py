@@ -1,5 +1,5 @@
 from langchain_core.messages import HumanMessage
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
+from src.agents.state import AgentState, analysis_failed, get_messages, node_update, show_agent_reasoning, show_workflow_status
 from src.tools.overall_analyzer import get_debate_analyze
 import json
 import ast
@@ -13,10 +13,8 @@ def debate_room_agent(state: AgentState):
     stock_list = state["data"]["ticker_list"]
 
     # Fetch messages from researchers
-    bull_message = next(
-        msg for msg in state["messages"] if msg.name == "researcher_bull_agent")
-    bear_message = next(
-        msg for msg in state["messages"] if msg.name == "researcher_bear_agent")
+    bull_message, bear_message = get_messages(
+        state, "researcher_bull_agent", "researcher_bear_agent")
 
     try:
         bull_thesis = json.loads(bull_message.content)
@@ -40,10 +38,9 @@ def debate_room_agent(state: AgentState):
         show_agent_reasoning(message_content, "Debate Room")
 
     show_workflow_status("Debate Room", "completed")
-    return {
-        "messages": state["messages"] + [message],
+    return node_update({
+        "messages": [message],
         "data": {
-            **state["data"],
             "debate_analysis": message_content
         }
-    }
+    }, failed=analysis_failed(message_text))
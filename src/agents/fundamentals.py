@@ -1,7 +1,7 @@
 from langchain_core.messages import HumanMessage
 
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
-from src.tools.fundamental_analyzer import get_fundmt_analyze
+from src.agents.state import AgentState, analysis_failed, node_update, show_agent_reasoning, show_workflow_status
+from src.tools.fundamental_analyzer import get_fundmt_analyze, get_fundmt_analyze_async
 from src.utils.logging_config import setup_logger
 from src.prompts.signal_config import FUND_SIGNAL_TEXT
 import json
@@ -11,19 +11,33 @@ import json
 def fundamentals_agent(state: AgentState):
     """Responsible for fundamental analysis"""
     show_workflow_status("Fundamentals Analyst")
-    show_reasoning = state["metadata"]["show_reasoning"]
     data = state["data"]
-    end_date = data["end_date"]
+    results = _fundamental_results(data)
+    message_text=get_fundmt_analyze(data["end_date"],results,FUND_SIGNAL_TEXT)
+    return _fundamental_output(state, results, message_text)
 
+
+async def fundamentals_agent_async(state: AgentState):
+    """fundamentals_agent 的异步版本,LLM请求与其他分析师并发进行"""
+    show_workflow_status("Fundamentals Analyst")
+    data = state["data"]
+    results = _fundamental_results(data)
+    message_text = await get_fundmt_analyze_async(data["end_date"], results, FUND_SIGNAL_TEXT)
+    return _fundamental_output(state, results, message_text)
+
+
+def _fundamental_results(data):
     results={}
     for ticker in data["ticker_list"]:
         metrics = data["financial_metrics"][ticker][0]
         results[ticker]=fundamental_analyse(metrics)
+    return results
+
 
+def _fundamental_output(state: AgentState, results, message_text):
     message_content = {
         "results": results
     }
-    message_text=get_fundmt_analyze(end_date,results,FUND_SIGNAL_TEXT)
     # Create the fundamental analysis message
     message = HumanMessage(
         content=json.dumps(message_text),
@@ -31,17 +45,16 @@ def fundamentals_agent(state: AgentState):
     )
 
     # Print the reasoning if the flag is set
-    if show_reasoning:
+    if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(message_content, "Fundamental Analysis Agent")
 
     show_workflow_status("Fundamentals Analyst", "completed")
-    return {
+    return node_update({
         "messages": [message],
         "data": {
-            **data,
             "fundamental_analysis": message_content
         }
-    }
+    }, failed=analysis_failed(message_text))
 
 
 
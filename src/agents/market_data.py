@@ -1,22 +1,73 @@
 from langchain_core.messages import HumanMessage
 from src.tools.openrouter_config import get_chat_completion
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
+from src.agents.state import AgentState, node_update, show_agent_reasoning, show_workflow_status
 from src.tools.api import get_financial_metrics, get_financial_statements, get_market_data, get_price_history
 from src.utils.logging_config import setup_logger
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import os
 import pandas as pd
 
 # 设置日志记录
 logger = setup_logger('market_data_agent')
 
+# 并发获取数据的线程数,各数据源的并发上限由 src.utils.throttle 控制
+MARKET_DATA_WORKERS = int(os.getenv("MARKET_DATA_WORKERS", "8"))
+
+# 单项数据获取失败时使用的默认值
+FETCH_DEFAULTS = {
+    "prices": lambda: pd.DataFrame(columns=['close', 'open', 'high', 'low', 'volume']),
+    "financial_metrics": dict,
+    "financial_line_items": dict,
+    "market_data": lambda: {"market_cap": 0},
+}
+
+
+def fetch_all_tickers(ticker_list, fetchers, max_workers=None, failures=None):
+    """并发获取所有股票的各项数据
+
+    每个 (数据项, 股票) 组合作为独立任务提交到线程池,
+    单个任务失败只影响对应的数据项,其余数据照常返回.
+
+    Args:
+        ticker_list: 股票代码列表
+        fetchers: 数据项名称到获取函数的映射,获取函数接收股票代码
+        max_workers: 线程池大小,默认为 MARKET_DATA_WORKERS
+        failures: 传入列表时,获取失败的 (数据项, 股票代码) 追加到其中
+
+    Returns:
+        dict: {数据项名称: {股票代码: 数据}},股票顺序与 ticker_list 一致
+    """
+    results = {key: {} for key in fetchers}
+    with ThreadPoolExecutor(max_workers=max_workers or MARKET_DATA_WORKERS) as executor:
+        futures = {
+            executor.submit(fetcher, ticker): (key, ticker)
+            for ticker in ticker_list
+            for key, fetcher in fetchers.items()
+        }
+        for future in as_completed(futures):
+            key, ticker = futures[future]
+            try:
+                results[key][ticker] = future.result()
+                logger.info(f"{key} get: {ticker}")
+            except Exception as e:
+                logger.error(f"获取{ticker}的{key}失败: {str(e)}")
+                results[key][ticker] = FETCH_DEFAULTS[key]()
+                if failures is not None:
+                    failures.append((key, ticker))
+
+    return {
+        key: {ticker: values[ticker] for ticker in ticker_list}
+        for key, values in results.items()
+    }
+
 
 def market_data_agent(state: AgentState):
     """Responsible for gathering and preprocessing market data"""
     show_workflow_status("Market Data Agent")
     show_reasoning = state["metadata"]["show_reasoning"]
 
-    messages = state["messages"]
     data = state["data"]
 
     # Set default dates
@@ -39,51 +90,36 @@ def market_data_agent(state: AgentState):
 
     # Get all required data
     ticker_list = data["ticker_list"]
-    # 获取价格数据并验证
-    financial_metrics_dict={}
-    financial_line_items_dict={}
-    prices_df_dict={}
-    market_data_dict={}
-    market_cap_dict={}
-    for ticker in ticker_list:
-        prices_df = get_price_history(ticker, start_date, end_date)
-        if prices_df is None or prices_df.empty:
+    fetchers = {
+        "prices": lambda ticker: get_price_history(ticker, start_date, end_date),
+        "financial_metrics": get_financial_metrics,
+        "financial_line_items": get_financial_statements,
+        "market_data": get_market_data,
+    }
+    failures = []
+    results = fetch_all_tickers(ticker_list, fetchers, failures=failures)
+
+    prices_df_dict = {}
+    for ticker, prices_df in results["prices"].items():
+        # 验证价格数据
+        if prices_df is None or not isinstance(prices_df, pd.DataFrame) or prices_df.empty:
             logger.warning(f"警告：无法获取{ticker}的价格数据，将使用空数据继续")
+            failures.append(("prices", ticker))
             prices_df = pd.DataFrame(
                 columns=['close', 'open', 'high', 'low', 'volume'])
-        if not isinstance(prices_df, pd.DataFrame):
-            prices_df = pd.DataFrame(
-                columns=['close', 'open', 'high', 'low', 'volume'])
-        prices_df_dict[ticker] = prices_df 
-        logger.info( f"prices df get: {ticker}")
-        # 获取财务指标
-        try:
-            financial_metrics = get_financial_metrics(ticker)
-        except Exception as e:
-            logger.error(f"获取财务指标失败: {str(e)}")
-            financial_metrics = {}
-        financial_metrics_dict[ticker] = financial_metrics
-
-        # 获取财务报表
-        try:
-            financial_line_items = get_financial_statements(ticker)
-        except Exception as e:
-            logger.error(f"获取财务报表失败: {str(e)}")
-            financial_line_items = {}
-        financial_line_items_dict[ticker] = financial_line_items
-        # 获取市场数据
-        try:
-            market_data = get_market_data(ticker)
-        except Exception as e:
-            logger.error(f"获取市场数据失败: {str(e)}")
-            market_data = {"market_cap": 0}
-        market_data_dict[ticker] = market_data
-        market_cap_dict[ticker] = market_data.get("market_cap", 0)
+        prices_df_dict[ticker] = prices_df
 
-    return {
-        "messages": messages,
+    financial_metrics_dict = results["financial_metrics"]
+    financial_line_items_dict = results["financial_line_items"]
+    market_data_dict = results["market_data"]
+    market_cap_dict = {
+        ticker: market_data.get("market_cap", 0)
+        for ticker, market_data in market_data_dict.items()
+    }
+
+    # 只返回新增的数据,由 merge_dicts 合并进状态;有数据获取失败时不缓存本节点结果
+    return node_update({
         "data": {
-            **data,
             "prices": prices_df_dict,
             "start_date": start_date,
             "end_date": end_date,
@@ -92,4 +128,4 @@ def market_data_agent(state: AgentState):
             "market_cap": market_cap_dict,
             "market_data": market_data_dict,
         }
-    }
+    }, failed=bool(failures))
@@ -3,7 +3,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from src.tools.openrouter_config import get_chat_completion
 import json
 
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
+from src.agents.state import AgentState, get_messages, node_update, show_agent_reasoning, show_workflow_status
 
 
 ##### Portfolio Management Agent #####
@@ -14,16 +14,10 @@ def portfolio_management_agent(state: AgentState):
     portfolio = state["data"]["portfolio"]
 
     # Get the technical analyst, fundamentals agent, and risk management agent messages
-    technical_message = next(
-        msg for msg in state["messages"] if msg.name == "technical_analyst_agent")
-    fundamentals_message = next(
-        msg for msg in state["messages"] if msg.name == "fundamentals_agent")
-    sentiment_message = next(
-        msg for msg in state["messages"] if msg.name == "sentiment_agent")
-    valuation_message = next(
-        msg for msg in state["messages"] if msg.name == "valuation_agent")
-    risk_message = next(
-        msg for msg in state["messages"] if msg.name == "risk_management_agent")
+    (technical_message, fundamentals_message, sentiment_message,
+     valuation_message, risk_message) = get_messages(
+        state, "technical_analyst_agent", "fundamentals_agent", "sentiment_agent",
+        "valuation_agent", "risk_management_agent")
 
     # Create the system message
     system_message = {
@@ -103,7 +97,8 @@ def portfolio_management_agent(state: AgentState):
     result = get_chat_completion([system_message, user_message])
 
     # 如果API调用失败，使用默认的保守决策
-    if result is None:
+    failed = result is None
+    if failed:
         result = json.dumps({
             "action": "hold",
             "quantity": 0,
@@ -149,10 +144,9 @@ def portfolio_management_agent(state: AgentState):
         show_agent_reasoning(message.content, "Portfolio Management Agent")
 
     show_workflow_status("Portfolio Manager", "completed")
-    return {
-        "messages": state["messages"] + [message],
-        "data": state["data"],
-    }
+    return node_update({
+        "messages": [message],
+    }, failed=failed)
 
 
 def format_decision(action: str, quantity: int, confidence: float, agent_signals: list, reasoning: str) -> dict:
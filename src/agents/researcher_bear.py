@@ -1,5 +1,5 @@
 from langchain_core.messages import HumanMessage
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
+from src.agents.state import AgentState, analysis_failed, get_messages, node_update, show_agent_reasoning, show_workflow_status
 from src.tools.overall_analyzer import get_bearish_analyze
 import json
 import ast
@@ -8,19 +8,12 @@ import ast
 def researcher_bear_agent(state: AgentState):
     """Analyzes signals from a bearish perspective and generates optimistic investment thesis."""
     show_workflow_status("Bearish Researcher")
-    show_reasoning = state["metadata"]["show_reasoning"]
     end_date = state["data"]["end_date"]
     stock_list = state["data"]["ticker_list"]
 
     # Fetch messages from analysts
-    technical_message = next(
-        msg for msg in state["messages"] if msg.name == "technical_analyst_agent")
-    fundamentals_message = next(
-        msg for msg in state["messages"] if msg.name == "fundamentals_agent")
-    sentiment_message = next(
-        msg for msg in state["messages"] if msg.name == "sentiment_agent")
-    valuation_message = next(
-        msg for msg in state["messages"] if msg.name == "valuation_agent")
+    technical_message, fundamentals_message, sentiment_message, valuation_message = get_messages(
+        state, "technical_analyst_agent", "fundamentals_agent", "sentiment_agent", "valuation_agent")
     
     reasoning_dict = {
     "technical": json.loads(technical_message.content), 
@@ -31,11 +24,17 @@ def researcher_bear_agent(state: AgentState):
 
 
     reasoning=get_bearish_analyze(end_date,stock_list,reasoning_dict)
+    message = _bear_message(state, reasoning)
+    return node_update({
+        "messages": [message],
+    }, failed=analysis_failed(reasoning))
 
+
+def _bear_message(state: AgentState, reasoning) -> HumanMessage:
     message_content = {
         "perspective": "bearish",
         "reasoning": "Bearish thesis based on comprehensive analysis of technical, "
-        "fundamental, sentiment, and valuation factors, we have the following reasoning: \n\n" + reasoning,
+        "fundamental, sentiment, and valuation factors, we have the following reasoning: \n\n" + str(reasoning),
     }
 
     message = HumanMessage(
@@ -43,11 +42,8 @@ def researcher_bear_agent(state: AgentState):
         name="researcher_bear_agent",
     )
 
-    if show_reasoning:
+    if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(message_content, "Bearish Researcher")
 
     show_workflow_status("Bearish Researcher", "completed")
-    return {
-        "messages": state["messages"] + [message],
-        "data": state["data"],
-    }
+    return message
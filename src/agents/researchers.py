@@ -0,0 +1,71 @@
+import os
+import json
+import asyncio
+
+from src.agents.state import AgentState, analysis_failed, get_messages, node_update, show_workflow_status
+from src.agents.researcher_bull import _bull_message
+from src.agents.researcher_bear import _bear_message
+from src.tools.overall_analyzer import get_bullish_analyze_async, get_bearish_analyze_async
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger('researchers')
+
+# 多空研究员共用的超时时间(秒),超时后取消尚未完成的请求
+RESEARCHER_TIMEOUT = float(os.getenv("RESEARCHER_TIMEOUT", "300"))
+TIMEOUT_REASONING = "研究员分析超时,未获得结果"
+
+ANALYST_NAMES = {
+    "technical": "technical_analyst_agent",
+    "fundamentals": "fundamentals_agent",
+    "sentiment": "sentiment_agent",
+    "valuation": "valuation_agent",
+}
+
+
+def collect_analyst_reasoning(state: AgentState) -> dict:
+    """读取四位分析师的结论,作为多空研究员的共同输入"""
+    messages = get_messages(state, *ANALYST_NAMES.values())
+    return {
+        key: json.loads(message.content)
+        for key, message in zip(ANALYST_NAMES, messages)
+    }
+
+
+async def researchers_agent_async(state: AgentState):
+    """同时运行多方和空方研究员
+
+    两个LLM请求并发发出,共用 RESEARCHER_TIMEOUT 超时;
+    超时后取消未完成的请求,其结论记为超时,已完成的一方照常输出.
+    """
+    show_workflow_status("Bullish Researcher")
+    show_workflow_status("Bearish Researcher")
+    end_date = state["data"]["end_date"]
+    stock_list = state["data"]["ticker_list"]
+    reasoning_dict = collect_analyst_reasoning(state)
+
+    bull_task = asyncio.create_task(get_bullish_analyze_async(end_date, stock_list, reasoning_dict))
+    bear_task = asyncio.create_task(get_bearish_analyze_async(end_date, stock_list, reasoning_dict))
+    try:
+        _, pending = await asyncio.wait({bull_task, bear_task}, timeout=RESEARCHER_TIMEOUT)
+    except asyncio.CancelledError:
+        bull_task.cancel()
+        bear_task.cancel()
+        raise
+
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"研究员分析超过 {RESEARCHER_TIMEOUT} 秒,已取消 {len(pending)} 个请求")
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def reasoning(task):
+        return TIMEOUT_REASONING if task in pending else task.result()
+
+    # 超时或请求失败时不缓存本节点结果,下次运行重新分析
+    failed = bool(pending) or any(analysis_failed(task.result()) for task in (bull_task, bear_task))
+    return node_update({
+        "messages": [
+            _bull_message(state, reasoning(bull_task)),
+            _bear_message(state, reasoning(bear_task)),
+        ],
+    }, failed=failed)
@@ -2,7 +2,7 @@ import math
 
 from langchain_core.messages import HumanMessage
 
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
+from src.agents.state import AgentState, get_messages, show_agent_reasoning, show_workflow_status
 from src.tools.api import prices_to_df
 
 import json
@@ -21,8 +21,7 @@ def risk_management_agent(state: AgentState):
     prices_df = prices_to_df(data["prices"])
 
     # Fetch debate room message instead of individual analyst messages
-    debate_message = next(
-        msg for msg in state["messages"] if msg.name == "debate_room_agent")
+    debate_message, = get_messages(state, "debate_room_agent")
 
     try:
         debate_results = json.loads(debate_message.content)
@@ -171,9 +170,8 @@ def risk_management_agent(state: AgentState):
 
     show_workflow_status("Risk Manager", "completed")
     return {
-        "messages": state["messages"] + [message],
+        "messages": [message],
         "data": {
-            **data,
             "risk_analysis": message_content
         }
     }
@@ -1,42 +1,94 @@
 from langchain_core.messages import HumanMessage
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
-from src.tools.news_crawler import get_stock_news, get_news_sentiment
+from src.tools.news_crawler import get_stock_news, get_news_sentiment, get_news_sentiment_async
 from src.utils.logging_config import setup_logger
+import asyncio
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 # 设置日志记录
 logger = setup_logger('sentiment_agent')
 
+# 并发获取新闻的线程数,东方财富的并发上限由 src.utils.throttle 控制
+NEWS_WORKERS = int(os.getenv("NEWS_WORKERS", "8"))
+
 
 def sentiment_agent(state: AgentState):
     """Responsible for sentiment analysis"""
     show_workflow_status("Sentiment Analyst")
-    show_reasoning = state["metadata"]["show_reasoning"]
     data = state["data"]
     symbol_list = data["ticker_list"]
     logger.info(f"正在分析股票集: {symbol_list}")
     # 从命令行参数获取新闻数量，默认为5条
     num_of_news = data.get("num_of_news", 10)
 
-    news_dict = {} 
-    for symbol in symbol_list:
-        news_dict[symbol] = get_stock_news(symbol, max_news=num_of_news)  # 确保获取足够的新闻
+    # 回测时只使用截至回测日期发布的新闻
+    news_dict = _collect_news(symbol_list, num_of_news, data.get("end_date"))
+    sentiment_result = get_news_sentiment(symbol_list,news_dict, num_of_news=num_of_news)
+    return _sentiment_output(state, sentiment_result)
+
+
+async def sentiment_agent_async(state: AgentState):
+    """sentiment_agent 的异步版本,LLM请求与其他分析师并发进行"""
+    show_workflow_status("Sentiment Analyst")
+    data = state["data"]
+    symbol_list = data["ticker_list"]
+    logger.info(f"正在分析股票集: {symbol_list}")
+    num_of_news = data.get("num_of_news", 10)
+
+    # 新闻抓取是阻塞调用,放到线程中执行以免阻塞事件循环
+    news_dict = await asyncio.to_thread(_collect_news, symbol_list, num_of_news, data.get("end_date"))
+    sentiment_result = await get_news_sentiment_async(symbol_list, news_dict, num_of_news=num_of_news)
+    return _sentiment_output(state, sentiment_result)
+
+
+def _collect_news(symbol_list, num_of_news, as_of=None, max_workers=None):
+    """并发获取每只股票的新闻,返回 {股票代码: 新闻列表},顺序与 symbol_list 一致"""
+    def fetch(symbol):
+        try:
+            return get_stock_news(symbol, max_news=num_of_news, as_of=as_of)  # 确保获取足够的新闻
+        except Exception as e:
+            logger.error(f"获取{symbol}的新闻失败: {str(e)}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=max_workers or NEWS_WORKERS) as executor:
+        news_lists = list(executor.map(fetch, symbol_list))
+    news_dict = dict(zip(symbol_list, news_lists))
 
     '''# 过滤7天内的新闻
     cutoff_date = datetime.now() - timedelta(days=7)
     recent_news = [news for news in news_list
                    if datetime.strptime(news['publish_time'], '%Y-%m-%d %H:%M:%S') > cutoff_date]
     '''
-    
-    sentiment_result = get_news_sentiment(symbol_list,news_dict, num_of_news=num_of_news)
+    return news_dict
+
+
+_SIGNAL_TEXT = {"bullish": "看多", "bearish": "看空", "neutral": "中性"}
+
+
+def format_sentiment_result(sentiment_result: dict) -> str:
+    """把 get_news_sentiment 的结果逐只股票写成文本: 得分、信号及每条新闻的打分理由"""
+    lines = []
+    for symbol, summary in sentiment_result["sentiment_scores"].items():
+        lines.append(
+            f"{symbol}: 情感得分{summary['score']:.2f},信号{summary['signal']}"
+            f"({_SIGNAL_TEXT[summary['signal']]}),"
+            f"已分析{summary['scored_count']}/{summary['news_count']}条新闻")
+        for article in summary["articles"]:
+            lines.append(f"  - [{article['score']:+.2f}] {article['title']}: {article['reason']}")
+    return "\n".join(lines)
+
+
+def _sentiment_output(state: AgentState, sentiment_result):
     # 生成分析结果
     message_content = {
-        "reasoning": f"""基于最近的新闻报导,关于列表中股票的情感分析结果如下{sentiment_result}"""
+        "reasoning": f"""基于最近的新闻报导,关于列表中股票的情感分析结果如下:\n{format_sentiment_result(sentiment_result)}"""
     }
 
     # 如果需要显示推理过程
-    if show_reasoning:
+    if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(message_content, "Sentiment Analysis Agent")
 
     # 创建消息
@@ -49,7 +101,6 @@ def sentiment_agent(state: AgentState):
     return {
         "messages": [message],
         "data": {
-            **data,
             "sentiment_analysis": message_content
         }
     }
@@ -1,6 +1,9 @@
 from typing import Annotated, Any, Dict, Sequence, TypedDict
 
+import time
+import inspect
 import operator
+import functools
 from langchain_core.messages import BaseMessage
 import json
 from src.utils.logging_config import setup_logger
@@ -10,6 +13,11 @@ logger = setup_logger('agent_state')
 
 
 def merge_dicts(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    # 节点只返回新增或修改的键,没有更新时沿用原字典
+    if not b:
+        return a
+    if not a:
+        return b
     return {**a, **b}
 
 # Define agent state
@@ -19,6 +27,114 @@ class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
     data: Annotated[Dict[str, Any], merge_dicts]
     metadata: Annotated[Dict[str, Any], merge_dicts]
+    timings: Annotated[Dict[str, Any], merge_dicts]
+
+
+class FailedUpdate(dict):
+    """节点没有得到有效结果时返回的状态更新,如LLM请求失败后使用的默认结论
+
+    工作流照常继续,但 memoized_node 不缓存该结果,下次运行时重新执行该节点.
+    """
+
+
+def node_update(update: Dict[str, Any], failed: bool) -> Dict[str, Any]:
+    """failed 为真时把 update 标记为 FailedUpdate"""
+    return FailedUpdate(update) if failed else update
+
+
+def analysis_failed(result) -> bool:
+    """分析函数(get_*_analyze 等)的结果是否失败
+
+    失败时这些函数返回0.0或None;分块请求部分失败时结果带有 missing_tickers.
+    """
+    if isinstance(result, dict):
+        return bool(result.get("missing_tickers"))
+    return not isinstance(result, str)
+
+
+def get_messages(state: AgentState, *names: str) -> list:
+    """按节点名称查找消息
+
+    只遍历一次消息列表建立名称索引,同名消息取最后一条.
+
+    Args:
+        state: 当前状态
+        names: 节点名称
+
+    Returns:
+        与 names 顺序一致的消息列表
+    """
+    index = {msg.name: msg for msg in state["messages"]}
+    return [index[name] for name in names]
+
+
+def timed_node(name: str, node):
+    """包装节点函数,把节点的开始和结束时间写入 timings 通道
+
+    同时支持同步和异步节点.
+
+    Args:
+        name: 节点名称
+        node: 节点函数,参数为 AgentState,返回状态更新
+    """
+    def record(update, start):
+        end = time.perf_counter()
+        update = dict(update or {})
+        update["timings"] = {name: {"start": start, "end": end, "duration": end - start}}
+        return update
+
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state: AgentState):
+            start = time.perf_counter()
+            return record(await node(state), start)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state: AgentState):
+        start = time.perf_counter()
+        return record(node(state), start)
+    return wrapper
+
+
+def format_timing_report(timings: Dict[str, Any]) -> str:
+    """按开始时间列出每个节点的耗时,并汇总并行阶段
+
+    时间区间相互重叠的节点视为同一并行阶段,阶段耗时取决于其中最慢的节点.
+    """
+    if not timings:
+        return "无节点耗时记录"
+
+    items = sorted(timings.items(), key=lambda item: item[1]["start"])
+    origin = items[0][1]["start"]
+    finish = max(timing["end"] for _, timing in items)
+
+    lines = ["节点耗时(秒):",
+             f"{'节点':<30}{'开始':>8}{'结束':>8}{'耗时':>8}"]
+    for name, timing in items:
+        lines.append(f"{name:<30}{timing['start'] - origin:>8.2f}"
+                     f"{timing['end'] - origin:>8.2f}{timing['duration']:>8.2f}")
+
+    stages = []
+    for name, timing in items:
+        if stages and timing["start"] < stages[-1]["end"]:
+            stages[-1]["nodes"].append(name)
+            stages[-1]["end"] = max(stages[-1]["end"], timing["end"])
+        else:
+            stages.append({"nodes": [name], "start": timing["start"], "end": timing["end"]})
+
+    for stage in stages:
+        if len(stage["nodes"]) < 2:
+            continue
+        slowest = max(stage["nodes"], key=lambda node: timings[node]["duration"])
+        serial = sum(timings[node]["duration"] for node in stage["nodes"])
+        lines.append(
+            f"并行阶段 {', '.join(stage['nodes'])}: 耗时 {stage['end'] - stage['start']:.2f}"
+            f" (串行合计 {serial:.2f}), 最慢节点 {slowest} {timings[slowest]['duration']:.2f}")
+
+    lines.append(f"总耗时: {finish - origin:.2f}")
+    return "\n".join(lines)
+
 
 def show_workflow_status(agent_name: str, status: str = "processing"):
     """Display agent workflow status in a clean format.
@@ -1,13 +1,13 @@
+import asyncio
 from typing import Dict
 
 from langchain_core.messages import HumanMessage
 
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
-from src.tools.tech_calculator import calculate_macd, calculate_rsi, calculate_bollinger_bands, calculate_obv
-from src.tools.tech_calculator import calculate_trend_signals, calculate_mean_reversion_signals, calculate_momentum_signals
-from src.tools.tech_calculator import calculate_volatility_signals, calculate_stat_arb_signals, weighted_signal_combination,normalize_pandas
-from src.tools.tech_calculator import cal_signals
-from src.tools.tech_analyzer import get_tech_analyze
+from src.agents.state import AgentState, analysis_failed, node_update, show_agent_reasoning, show_workflow_status
+from src.tools.panel_indicators import build_price_panel, calculate_panel_indicators, calculate_panel_indicator_signals
+from src.tools.panel_indicators import calculate_panel_strategy_signals, combine_panel_signals
+from src.tools.panel_indicators import DEFAULT_STRATEGY_WEIGHTS, SIGNAL_LABELS
+from src.tools.tech_analyzer import get_tech_analyze, get_tech_analyze_async
 from src.prompts.signal_config import TECH_SIGNAL_TEXT,TECH_STRATEGY_TEXT
 
 from src.tools.api import prices_to_df
@@ -34,31 +34,37 @@ def technical_analyst_agent(state: AgentState):
 
     """
     show_workflow_status("Technical Analyst")
-    show_reasoning = state["metadata"]["show_reasoning"]
-    
     data = state["data"]
-    prices_dict = data["prices"]
-    end_date = data["end_date"]
-    report_dict={}
-    # Create the technical analyst message
-    for ticker,prices in prices_dict.items():
-        analysis_report = calculate_signals(prices)
-        report_dict[ticker]=analysis_report
-    message_text=get_tech_analyze(end_date,analysis_report,TECH_SIGNAL_TEXT,TECH_STRATEGY_TEXT)
+    # 所有股票组成一个面板,一次向量化计算全部指标
+    report_dict = calculate_batch_signals(data["prices"])
+    message_text=get_tech_analyze(data["end_date"],report_dict,TECH_SIGNAL_TEXT,TECH_STRATEGY_TEXT)
+    return _technical_output(state, report_dict, message_text)
+
+
+async def technical_analyst_agent_async(state: AgentState):
+    """technical_analyst_agent 的异步版本,LLM请求与其他分析师并发进行"""
+    show_workflow_status("Technical Analyst")
+    data = state["data"]
+    report_dict = await asyncio.to_thread(calculate_batch_signals, data["prices"])
+    message_text = await get_tech_analyze_async(
+        data["end_date"], report_dict, TECH_SIGNAL_TEXT, TECH_STRATEGY_TEXT)
+    return _technical_output(state, report_dict, message_text)
+
+
+def _technical_output(state: AgentState, report_dict: Dict, message_text) -> Dict:
     message = HumanMessage(
         content=json.dumps(message_text),
         name="technical_analyst_agent",
     )
 
-    if show_reasoning:
+    if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(
-            analysis_report, "Technical Analyst")
+            report_dict, "Technical Analyst")
 
     show_workflow_status("Technical Analyst", "completed")
-    return {
+    return node_update({
         "messages": [message],
-        "data": data,
-    }
+    }, failed=analysis_failed(message_text))
 
 
 def calculate_signals(prices: Dict) -> Dict:
@@ -71,7 +77,21 @@ def calculate_signals(prices: Dict) -> Dict:
     Returns:
         Dict: A dictionary containing the calculated signals and confidence levels.
     """
-    prices_df = prices_to_df(prices)
+    return calculate_batch_signals({"ticker": prices})["ticker"]
+
+
+def calculate_batch_signals(prices_dict: Dict) -> Dict:
+    """
+    Calculate trading signals for several tickers in one vectorized pass.
+
+    Args:
+        prices_dict (Dict): Mapping of ticker to price data.
+
+    Returns:
+        Dict: Mapping of ticker to the analysis report of calculate_signals.
+    """
+    prices_dfs = {ticker: prices_to_df(prices) for ticker, prices in prices_dict.items()}
+    panel = build_price_panel(prices_dfs)
     '''
     Indicators:
     MACD: Moving Average Convergence Divergence
@@ -79,17 +99,47 @@ def calculate_signals(prices: Dict) -> Dict:
     Bollinger Bands (Upper and Lower Bands)
     OBV: On-Balance Volume
     '''
+    indicators = calculate_panel_indicators(panel)
+    indicator_signals = calculate_panel_indicator_signals(panel, indicators)
+    strategy_signals = calculate_panel_strategy_signals(panel)
+    combined_signal = combine_panel_signals(strategy_signals, DEFAULT_STRATEGY_WEIGHTS)
+
+    report_dict = {}
+    for ticker, prices_df in prices_dfs.items():
+        report_dict[ticker] = build_analysis_report(
+            ticker, prices_df, indicators, indicator_signals,
+            strategy_signals, combined_signal)
+    return report_dict
+
+
+def build_analysis_report(ticker, prices_df, indicators, indicator_signals,
+                          strategy_signals, combined_signal) -> Dict:
+    """Assemble the analysis report of one ticker from the latest panel row"""
+    def latest(frame):
+        return frame[ticker].iloc[-1]
+
+    def label(frame):
+        return SIGNAL_LABELS[int(latest(frame))]
+
+    def strategy_report(name):
+        strategy = strategy_signals[name]
+        return {
+            "signal": label(strategy['signal']),
+            "confidence": f"{round(latest(strategy['confidence']) * 100)}%",
+            "metrics": {metric: float(latest(value))
+                        for metric, value in strategy['metrics'].items()}
+        }
 
-    macd_line, signal_line = calculate_macd(prices_df)
-    rsi = calculate_rsi(prices_df)
-    upper_band, lower_band = calculate_bollinger_bands(prices_df)
-    obv = calculate_obv(prices_df)
-    obv_slope = obv.diff().iloc[-5:].mean()
-    price_drop = (prices_df['close'].iloc[-1] -
-                  prices_df['close'].iloc[-5]) / prices_df['close'].iloc[-5]
-    
-    signals = cal_signals(prices_df,macd_line, signal_line, rsi, upper_band, lower_band, obv,obv_slope,price_drop)
+    signals = [label(indicator_signals[name]) for name in ('MACD', 'RSI', 'Bollinger', 'OBV')]
+    if latest(indicator_signals['price_drop']) > 0:
+        signals.append('bullish')
     print(f'计算signals:{signals}')
+
+    macd_line = indicators['macd'][ticker].iloc[len(indicators['macd']) - len(prices_df):]
+    macd_line = macd_line.set_axis(prices_df.index)
+    rsi = latest(indicators['rsi'])
+    obv_slope = latest(indicators['obv_slope'])
+
     # Add reasoning collection
     reasoning = {
         "MACD": {
@@ -98,40 +148,21 @@ def calculate_signals(prices: Dict) -> Dict:
             "details": f"MACD Line crossed {'above' if signals[0] == 'bullish' else 'below' if signals[0] == 'bearish' else 'neither above nor below'} Signal Line"
         },
         "RSI": {
-            'RSI': rsi.iloc[-1],
+            'RSI': rsi,
             "signal": signals[1],
-            "details": f"RSI is {rsi.iloc[-1]:.2f} ({'oversold' if signals[1] == 'bullish' else 'overbought' if signals[1] == 'bearish' else 'neutral'})"
+            "details": f"RSI is {rsi:.2f} ({'oversold' if signals[1] == 'bullish' else 'overbought' if signals[1] == 'bearish' else 'neutral'})"
         },
         "Bollinger": {
-            #"Upper Band": upper_band,
-            #"Lower Band": lower_band,
             "signal": signals[2],
             "details": f"Price is {'below lower band' if signals[2] == 'bullish' else 'above upper band' if signals[2] == 'bearish' else 'within bands'}"
         },
         "OBV": {
-            #"OBV": obv,
             "OBV_slope": obv_slope,
             "signal": signals[3],
             "details": f"OBV slope is {obv_slope:.2f} ({signals[3]})"
         }
     }
 
-    '''
-    # Determine overall signal
-    bullish_signals = signals.count('bullish')
-    bearish_signals = signals.count('bearish')
-
-    if bullish_signals > bearish_signals:
-        overall_signal = 'bullish'
-    elif bearish_signals > bullish_signals:
-        overall_signal = 'bearish'
-    else:
-        overall_signal = 'neutral'
-    
-    # Calculate confidence level based on the proportion of indicators agreeing
-    total_signals = len(signals)
-    confidence = max(bullish_signals, bearish_signals) / total_signals
-    '''
     # Generate the message content
     message_content = {
         "reasoning": {
@@ -143,59 +174,17 @@ def calculate_signals(prices: Dict) -> Dict:
         }
     }
 
-    trend_signals = calculate_trend_signals(prices_df)
-    mean_reversion_signals = calculate_mean_reversion_signals(prices_df)
-    momentum_signals = calculate_momentum_signals(prices_df)
-    volatility_signals = calculate_volatility_signals(prices_df)
-    stat_arb_signals = calculate_stat_arb_signals(prices_df)
-    strategy_weights = {
-        'trend': 0.30,
-        'mean_reversion': 0.25,  # Increased weight for mean reversion
-        'momentum': 0.25,
-        'volatility': 0.15,
-        'stat_arb': 0.05
-    }
-
-    combined_signal = weighted_signal_combination({
-        'trend': trend_signals,
-        'mean_reversion': mean_reversion_signals,
-        'momentum': momentum_signals,
-        'volatility': volatility_signals,
-        'stat_arb': stat_arb_signals
-    }, strategy_weights)
-
     analysis_report = {
         "technical_analyze_message": message_content,
-        "signal": combined_signal['signal'],
-        "confidence": f"{round(combined_signal['confidence'] * 100)}%",
+        "signal": label(combined_signal['signal']),
+        "confidence": f"{round(latest(combined_signal['confidence']) * 100)}%",
         "strategy_signals": {
-            "trend_following": {
-                "signal": trend_signals['signal'],
-                "confidence": f"{round(trend_signals['confidence'] * 100)}%",
-                "metrics": normalize_pandas(trend_signals['metrics'])
-            },
-
-            "mean_reversion": {
-                "signal": mean_reversion_signals['signal'],
-                "confidence": f"{round(mean_reversion_signals['confidence'] * 100)}%",
-                "metrics": normalize_pandas(mean_reversion_signals['metrics'])
-            },
-            "momentum": {
-                "signal": momentum_signals['signal'],
-                "confidence": f"{round(momentum_signals['confidence'] * 100)}%",
-                "metrics": normalize_pandas(momentum_signals['metrics'])
-            },
-            "volatility": {
-                "signal": volatility_signals['signal'],
-                "confidence": f"{round(volatility_signals['confidence'] * 100)}%",
-                "metrics": normalize_pandas(volatility_signals['metrics'])
-            },
-            "statistical_arbitrage": {
-                "signal": stat_arb_signals['signal'],
-                "confidence": f"{round(stat_arb_signals['confidence'] * 100)}%",
-                "metrics": normalize_pandas(stat_arb_signals['metrics'])
-            }
+            "trend_following": strategy_report('trend'),
+            "mean_reversion": strategy_report('mean_reversion'),
+            "momentum": strategy_report('momentum'),
+            "volatility": strategy_report('volatility'),
+            "statistical_arbitrage": strategy_report('stat_arb')
         }
     }
-    
+
     return analysis_report
@@ -1,17 +1,29 @@
 from langchain_core.messages import HumanMessage
-from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
+from src.agents.state import AgentState, analysis_failed, node_update, show_agent_reasoning, show_workflow_status
 import json
-from src.tools.valuation_analyzer import get_value_analyze
+from src.tools.valuation_analyzer import get_value_analyze, get_value_analyze_async
 from src.prompts.signal_config import VALUE_SIGNAL_TEXT
 
 
 def valuation_agent(state: AgentState):
     """Responsible for valuation analysis"""
     show_workflow_status("Valuation Agent")
-    show_reasoning = state["metadata"]["show_reasoning"]
     data = state["data"]
-    end_date = data["end_date"]
+    results = _valuation_results(data)
+    message_text=get_value_analyze(data["end_date"],results,VALUE_SIGNAL_TEXT)
+    return _valuation_output(state, results, message_text)
 
+
+async def valuation_agent_async(state: AgentState):
+    """valuation_agent 的异步版本,LLM请求与其他分析师并发进行"""
+    show_workflow_status("Valuation Agent")
+    data = state["data"]
+    results = _valuation_results(data)
+    message_text = await get_value_analyze_async(data["end_date"], results, VALUE_SIGNAL_TEXT)
+    return _valuation_output(state, results, message_text)
+
+
+def _valuation_results(data):
     results={}
     for ticker in data["ticker_list"]:
         metrics = data["financial_metrics"][ticker][0]
@@ -19,25 +31,26 @@ def valuation_agent(state: AgentState):
         previous_financial_line_item = data["financial_line_items"][ticker][1]
         market_cap = data["market_cap"][ticker]
         results[ticker]=valuation_analyse(metrics,current_financial_line_item,previous_financial_line_item,market_cap)
-    
+    return results
+
+
+def _valuation_output(state: AgentState, results, message_text):
     message_content = {"results": results}
-    message_text=get_value_analyze(end_date,results,VALUE_SIGNAL_TEXT)
     message = HumanMessage(
         content=json.dumps(message_text),
         name="valuation_agent",
     )
 
-    if show_reasoning:
+    if state["metadata"]["show_reasoning"]:
         show_agent_reasoning(message_content, "Valuation Analysis Agent")
 
     show_workflow_status("Valuation Agent", "completed")
-    return {
+    return node_update({
         "messages": [message],
         "data": {
-            **data,
             "valuation_analysis": message_content
         }
-    }
+    }, failed=analysis_failed(message_text))
 
 
 def calculate_owner_earnings_value(
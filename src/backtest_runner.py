@@ -0,0 +1,198 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.backtester import Backtester
+from src.tools.api import get_price_data
+from src.tools.performance import performance_metrics
+from src.tools.price_store import share_price_frames, attach_shared_prices
+from src.tools.signal_store import SignalStore
+from src.utils.throttle import RateLimiter, LLM_RATE_LIMIT, set_llm_rate_limiter
+
+logger = logging.getLogger('backtest_runner')
+
+# 回测进程数
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(min(8, os.cpu_count() or 1))))
+# 未配置 LLM_RATE_LIMIT 时,多进程回测使用的LLM请求上限(次/分钟)
+DEFAULT_BACKTEST_LLM_RATE = 60
+
+
+def _init_worker(limiter: RateLimiter):
+    """子进程初始化:所有进程共用父进程创建的LLM速率限制器"""
+    set_llm_rate_limiter(limiter)
+
+
+def _run_ticker(agent, ticker, price_data, start_date, end_date, capital,
+                num_of_news, mode, trade_fraction, price_field):
+    backtester = Backtester(
+        agent=agent,
+        ticker=ticker,
+        start_date=start_date,
+        end_date=end_date,
+        initial_capital=capital,
+        num_of_news=num_of_news,
+        signal_store=SignalStore() if mode != "live" else None,
+        price_data=price_data,
+        # 请求速率由全局LLM速率限制器控制
+        api_min_interval=0,
+        api_calls_per_minute=None,
+    )
+    if mode == "replay":
+        backtester.replay_backtest(trade_fraction=trade_fraction, price_field=price_field)
+    else:
+        backtester.run_backtest()
+
+    values = pd.DataFrame(backtester.portfolio_values)
+    if values.empty:
+        return pd.Series(dtype=float, name=ticker)
+    return values.set_index("Date")["Portfolio Value"].rename(ticker)
+
+
+def _backtest_ticker(agent, ticker, shm_name, span, *args):
+    """在子进程中回测一只股票,返回每日组合价值
+
+    Backtester 直接读取共享内存中的行情视图,子进程不复制行情数据.
+    """
+    shm, records = attach_shared_prices(shm_name, span)
+    try:
+        return _run_ticker(agent, ticker, records, *args)
+    finally:
+        del records
+        try:
+            shm.close()
+        except BufferError:
+            # 异常回溯仍引用着视图,由进程退出时释放
+            pass
+
+
+def run_portfolio_backtest(agent, ticker_list, start_date, end_date, initial_capital,
+                           num_of_news=5, mode="live", trade_fraction=None, price_field="open",
+                           workers=None, llm_rate_limit=None):
+    """多只股票的组合回测
+
+    行情在父进程中一次性获取后放入共享内存,子进程直接读取其中的视图,不复制;
+    行情在父进程中一次性获取后放入共享内存,子进程只读访问;
+    所有子进程共用一个LLM速率限制器.最后按日期合并为组合净值.
+
+    Args:
+        agent: 智能体函数(需可被子进程导入,如 run_hedge_fund)
+        ticker_list: 股票代码列表
+        start_date: 开始日期,格式:YYYY-MM-DD
+        end_date: 结束日期,格式:YYYY-MM-DD
+        initial_capital: 组合初始资金
+        num_of_news: 情感分析使用的新闻数量
+        mode: live / precompute / replay,含义与 backtester 命令行参数相同
+        trade_fraction: 回放时每次交易的比例
+        price_field: 回放时的成交价格字段
+        workers: 进程数,默认 BACKTEST_WORKERS
+        llm_rate_limit: LLM请求上限(次/分钟),默认取 LLM_RATE_LIMIT
+
+    Returns:
+        dict,包含:
+        - portfolio_value: 组合每日价值
+        - ticker_values: 各股票每日价值(DataFrame)
+        - metrics: 组合回测指标
+        - ticker_metrics: 各股票回测指标(DataFrame)
+        - errors: 回测失败的股票及错误信息
+    """
+    capital = initial_capital / len(ticker_list)
+    frames = {}
+    for ticker in ticker_list:
+        df = get_price_data(ticker, start_date, end_date)
+        if df is None or df.empty:
+            logger.warning(f"无法获取{ticker}的价格数据,跳过")
+            continue
+        frames[ticker] = df
+
+    rate = llm_rate_limit or LLM_RATE_LIMIT or DEFAULT_BACKTEST_LLM_RATE
+    limiter = RateLimiter(rate)
+    shm, index = share_price_frames(frames)
+    series, errors = [], {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers or BACKTEST_WORKERS,
+                                 initializer=_init_worker, initargs=(limiter,)) as pool:
+            futures = {
+                pool.submit(_backtest_ticker, agent, ticker, shm.name, index[ticker],
+                            start_date, end_date, capital, num_of_news, mode,
+                            trade_fraction, price_field): ticker
+                for ticker in frames
+            }
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    series.append(future.result())
+                    logger.info(f"{ticker} 回测完成")
+                except Exception as e:
+                    logger.error(f"{ticker} 回测失败: {e}")
+                    errors[ticker] = str(e)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    ticker_values = pd.concat(series, axis=1).sort_index() if series else pd.DataFrame()
+    ticker_values = ticker_values[[t for t in ticker_list if t in ticker_values.columns]]
+    # 跳过或失败的股票按持有现金计入组合
+    idle = (len(ticker_list) - len(ticker_values.columns)) * capital
+    portfolio_value = ticker_values.ffill().fillna(capital).sum(axis=1) + idle
+
+    return {
+        "portfolio_value": portfolio_value,
+        "ticker_values": ticker_values,
+        "metrics": performance_metrics(portfolio_value, initial_capital) if len(portfolio_value) else {},
+        "ticker_metrics": performance_metrics(ticker_values, capital) if len(ticker_values) else pd.DataFrame(),
+        "errors": errors,
+    }
+
+
+def format_portfolio_report(result) -> str:
+    """组合回测结果的文字报告"""
+    lines = ["各股票回测结果:",
+             f"{'代码':<8}{'总收益率':>10}{'夏普比率':>10}{'最大回撤':>10}"]
+    for ticker, row in result["ticker_metrics"].iterrows():
+        lines.append(f"{ticker:<8}{row['total_return']:>10.2%}{row['sharpe_ratio']:>10.2f}"
+                     f"{row['max_drawdown']:>10.2%}")
+    for ticker, error in result["errors"].items():
+        lines.append(f"{ticker:<8} 回测失败: {error}")
+
+    metrics = result["metrics"]
+    if metrics:
+        lines.append(f"组合: 总收益率 {metrics['total_return']:.2%}, "
+                     f"夏普比率 {metrics['sharpe_ratio']:.2f}, 最大回撤 {metrics['max_drawdown']:.2%}, "
+                     f"期末价值 {metrics['final_value']:,.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.main import run_hedge_fund
+
+    parser = argparse.ArgumentParser(description='多只股票并行回测')
+    parser.add_argument('--ticker_list', type=str, required=True,
+                        help='股票代码,逗号分隔 (例如: 600519,000001)')
+    parser.add_argument('--end-date', type=str,
+                        default=datetime.now().strftime('%Y-%m-%d'), help='结束日期，格式：YYYY-MM-DD')
+    parser.add_argument('--start-date', type=str, default=(datetime.now() -
+                        timedelta(days=90)).strftime('%Y-%m-%d'), help='开始日期，格式：YYYY-MM-DD')
+    parser.add_argument('--initial-capital', type=float,
+                        default=1000000, help='组合初始资金 (默认: 1000000)')
+    parser.add_argument('--num-of-news', type=int, default=5,
+                        help='Number of news articles to analyze for sentiment (default: 5)')
+    parser.add_argument('--mode', choices=['live', 'precompute', 'replay'], default='precompute')
+    parser.add_argument('--trade-fraction', type=float, default=None)
+    parser.add_argument('--price-field', type=str, default='open')
+    parser.add_argument('--workers', type=int, default=None, help='进程数')
+    parser.add_argument('--llm-rate-limit', type=float, default=None,
+                        help='所有进程合计的LLM请求上限(次/分钟)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    result = run_portfolio_backtest(
+        run_hedge_fund,
+        [ticker.strip() for ticker in args.ticker_list.split(",") if ticker.strip()],
+        args.start_date, args.end_date, args.initial_capital,
+        num_of_news=args.num_of_news, mode=args.mode, trade_fraction=args.trade_fraction,
+        price_field=args.price_field, workers=args.workers, llm_rate_limit=args.llm_rate_limit)
+    print(format_portfolio_report(result))
@@ -2,31 +2,32 @@ from datetime import datetime, timedelta
 import json
 import time
 import logging
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from src.tools.api import get_price_data
+from src.tools.signal_store import SignalStore, signal_config_hash
+from src.tools.performance import performance_metrics, trade_metrics
+from src.tools.report import BACKTEST_REPORT_DIR, show_performance_chart, write_backtest_report
+from src.tools.openrouter_config import model as llm_model, SAMPLING_PARAMS
 from src.main import run_hedge_fund
-import sys
-import matplotlib
 import os
 
-# 根据操作系统配置中文字体
-if sys.platform.startswith('win'):
-    # Windows系统
-    matplotlib.rc('font', family='Microsoft YaHei')
-elif sys.platform.startswith('linux'):
-    # Linux系统
-    matplotlib.rc('font', family='WenQuanYi Micro Hei')
-else:
-    # macOS系统
-    matplotlib.rc('font', family='PingFang SC')
-
-# 用来正常显示负号
-matplotlib.rcParams['axes.unicode_minus'] = False
+# 智能体每次决策使用的历史数据天数
+LOOKBACK_DAYS = 30
 
 
 class Backtester:
-    def __init__(self, agent, ticker, start_date, end_date, initial_capital, num_of_news):
+    """逐日回测
+
+    有两种运行方式:
+    - run_backtest: 逐日调用智能体并按其决策交易;传入 signal_store 时,
+      每日决策写入信号库,信号库中已有的日期直接读取而不再调用智能体
+    - replay_backtest: 只从信号库读取决策回放交易,可快速比较不同的成交价和仓位设置
+    """
+
+    def __init__(self, agent, ticker, start_date, end_date, initial_capital, num_of_news,
+                 signal_store: SignalStore = None, price_data: pd.DataFrame = None,
+                 api_min_interval: float = 6, api_calls_per_minute: int = 8):
         self.agent = agent
         self.ticker = ticker
         self.start_date = start_date
@@ -34,12 +35,27 @@ class Backtester:
         self.initial_capital = initial_capital
         self.portfolio = {"cash": initial_capital, "stock": 0}
         self.portfolio_values = []
+        # 成交记录,用于计算换手率和胜率
+        self.trades = []
         self.num_of_news = num_of_news
+        self.signal_store = signal_store
+        # 回测区间的日线行情,由 load_price_series 一次性加载;
+        # 传入 price_data 时直接使用,不再获取
+        self.price_data = price_data
+        self.trading_days = None
+        self._price_index = {}
+        self._prices = {}
+        # 决策受持仓影响,初始资金也计入配置
+        self.config_hash = signal_config_hash(
+            model=llm_model, sampling=SAMPLING_PARAMS, num_of_news=num_of_news,
+            lookback_days=LOOKBACK_DAYS, initial_capital=initial_capital)
         # 设置回测日志
         self.setup_backtest_logging()
         self.logger = self.setup_logging()
 
-        # 初始化 API 调用管理
+        # 初始化 API 调用管理;多进程回测时由全局LLM速率限制器控制,不再单独限制
+        self.api_min_interval = api_min_interval
+        self.api_calls_per_minute = api_calls_per_minute
         self._api_call_count = 0
         self._api_window_start = time.time()
         self._last_api_call = 0
@@ -76,7 +92,11 @@ class Backtester:
             raise
 
     def get_agent_decision(self, current_date, lookback_start, portfolio):
-        """获取智能体决策，包含 API 限制处理"""
+        """获取智能体决策，包含 API 限制处理
+
+        Returns:
+            dict: 决策结果;解析失败或重试耗尽时返回 None
+        """
         max_retries = 3
 
         # 检查并重置 API 时间窗口
@@ -86,7 +106,7 @@ class Backtester:
             self._api_window_start = current_time
 
         # 如果达到 API 限制，等待新的时间窗口
-        if self._api_call_count >= 8:  # 预留余量
+        if self.api_calls_per_minute and self._api_call_count >= self.api_calls_per_minute:  # 预留余量
             wait_time = 60 - (current_time - self._api_window_start)
             if wait_time > 0:
                 time.sleep(wait_time)
@@ -95,11 +115,11 @@ class Backtester:
 
         for attempt in range(max_retries):
             try:
-                # 确保调用间隔至少 6 秒
+                # 确保调用间隔至少 api_min_interval 秒
                 if self._last_api_call:
                     time_since_last_call = time.time() - self._last_api_call
-                    if time_since_last_call < 6:
-                        sleep_time = 6 - time_since_last_call
+                    if time_since_last_call < self.api_min_interval:
+                        sleep_time = self.api_min_interval - time_since_last_call
                         time.sleep(sleep_time)
 
                 # 更新调用时间和计数
@@ -108,7 +128,7 @@ class Backtester:
 
                 # 调用智能体并解析结果
                 result = self.agent(
-                    ticker=self.ticker,
+                    ticker_list=[self.ticker],
                     start_date=lookback_start,
                     end_date=current_date,
                     portfolio=portfolio,
@@ -148,10 +168,7 @@ class Backtester:
                     # 如果无法解析为 JSON，记录错误并返回默认决策
                     self.logger.warning(f"JSON解析错误: {str(e)}")
                     self.logger.warning(f"原始返回结果: {result}")
-                    return {
-                        "decision": {"action": "hold", "quantity": 0},
-                        "analyst_signals": {}
-                    }
+                    return None
 
             except Exception as e:
                 if "AFC is enabled" in str(e):
@@ -164,9 +181,60 @@ class Backtester:
                 self.logger.warning(
                     f"获取智能体决策失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
                 if attempt == max_retries - 1:
-                    return {"decision": {"action": "hold", "quantity": 0}, "analyst_signals": {}}
+                    return None
                 time.sleep(2 ** attempt)
 
+    def load_price_series(self):
+        """一次获取回测区间的日线行情
+
+        交易日以行情中实际存在的日期为准(自动跳过A股节假日),
+        各价格字段保存为数组,按日期索引查找.
+        """
+        if self.trading_days is not None:
+            return
+
+        df = self.price_data
+        if df is None:
+            df = get_price_data(self.ticker, self.start_date, self.end_date)
+        if df is None or len(df) == 0:
+            raise ValueError(f"无法获取{self.ticker}的价格数据")
+
+        fields = ["open", "close", "high", "low", "volume"]
+        if isinstance(df, np.ndarray):
+            # price_store 的记录数组(如共享内存中的视图),直接引用各字段,不复制
+            self.trading_days = list(pd.DatetimeIndex(df["date"]))
+            self._prices = {field: df[field] for field in fields if field in df.dtype.names}
+        else:
+            self.trading_days = list(pd.to_datetime(df["date"]).dt.normalize())
+            self._prices = {field: df[field].to_numpy(dtype=float)
+                            for field in fields if field in df.columns}
+        self._price_index = {date: i for i, date in enumerate(self.trading_days)}
+        self.logger.info(f"加载 {len(self.trading_days)} 个交易日的行情")
+
+    def price_on(self, date, field="open"):
+        """某个交易日的价格"""
+        return self._prices[field][self._price_index[pd.Timestamp(date).normalize()]]
+
+    def get_signal(self, current_date, lookback_start):
+        """获取当日决策,信号库中已有时直接读取,否则调用智能体并写入信号库
+
+        智能体决策失败时当日按持有处理,且不写入信号库,下次运行时重新获取.
+        """
+        output = self.signal_store.get(self.ticker, current_date, self.config_hash) \
+            if self.signal_store is not None else None
+        if output is not None:
+            return output
+
+        output = self.get_agent_decision(current_date, lookback_start, self.portfolio)
+        if output is None:
+            self.logger.warning(f"{current_date} 未能获取智能体决策,按持有处理")
+            return {"decision": {"action": "hold", "quantity": 0}, "analyst_signals": {}}
+        if self.signal_store is not None:
+            self.signal_store.put(self.ticker, current_date, self.config_hash, output,
+                                  portfolio={"cash": self.portfolio["cash"],
+                                             "stock": self.portfolio["stock"]})
+        return output
+
     def parse_decision_from_text(self, text):
         """从文本中解析交易决策"""
         text = text.lower()
@@ -249,63 +317,20 @@ class Backtester:
 
     def run_backtest(self):
         """运行回测"""
-        dates = pd.date_range(self.start_date, self.end_date, freq="B")
+        self.load_price_series()
 
         self.logger.info("\n开始回测...")
         print(f"{'日期':<12} {'代码':<6} {'操作':<6} {'数量':>8} {'价格':>8} {'现金':>12} {'持仓':>8} {'总值':>12} {'看多':>8} {'看空':>8} {'中性':>8}")
         print("-" * 110)
 
-        for current_date in dates:
-            lookback_start = (current_date - timedelta(days=30)
+        for current_date in self.trading_days:
+            lookback_start = (current_date - timedelta(days=LOOKBACK_DAYS)
                               ).strftime("%Y-%m-%d")
             current_date_str = current_date.strftime("%Y-%m-%d")
 
             # 获取智能体决策
-            output = self.get_agent_decision(
-                current_date_str, lookback_start, self.portfolio)
-
-            # 记录每个智能体的信号和分析结果
-            self.backtest_logger.info(f"\n交易日期: {current_date_str}")
-            if "analyst_signals" in output:
-                self.backtest_logger.info("\n各智能体分析结果:")
-                for agent_name, signal in output["analyst_signals"].items():
-                    self.backtest_logger.info(f"\n{agent_name}:")
-
-                    # 记录信号和置信度
-                    signal_str = f"- 信号: {signal.get('signal', 'unknown')}"
-                    if 'confidence' in signal:
-                        signal_str += f", 置信度: {signal.get('confidence', 0)*100:.0f}%"
-                    self.backtest_logger.info(signal_str)
-
-                    # 记录分析结果
-                    if 'analysis' in signal:
-                        self.backtest_logger.info("- 分析结果:")
-                        analysis = signal['analysis']
-                        if isinstance(analysis, dict):
-                            for key, value in analysis.items():
-                                self.backtest_logger.info(f"  {key}: {value}")
-                        elif isinstance(analysis, list):
-                            for item in analysis:
-                                self.backtest_logger.info(f"  • {item}")
-                        else:
-                            self.backtest_logger.info(f"  {analysis}")
-
-                    # 记录理由
-                    if 'reason' in signal:
-                        self.backtest_logger.info("- 决策理由:")
-                        reason = signal['reason']
-                        if isinstance(reason, list):
-                            for item in reason:
-                                self.backtest_logger.info(f"  • {item}")
-                        else:
-                            self.backtest_logger.info(f"  • {reason}")
-
-                    # 记录其他可能的指标
-                    for key, value in signal.items():
-                        if key not in ['signal', 'confidence', 'analysis', 'reason']:
-                            self.backtest_logger.info(f"- {key}: {value}")
-
-                self.backtest_logger.info("\n综合决策:")
+            output = self.get_signal(current_date_str, lookback_start)
+            self.log_agent_output(current_date_str, output)
 
             agent_decision = output.get(
                 "decision", {"action": "hold", "quantity": 0})
@@ -318,94 +343,151 @@ class Backtester:
             if "reason" in agent_decision:
                 self.backtest_logger.info(f"决策理由: {agent_decision['reason']}")
 
-            # 获取当前价格并执行交易
-            df = get_price_data(self.ticker, lookback_start, current_date_str)
-            if df is None or df.empty:
-                continue
-
-            current_price = df.iloc[-1]['open']
+            # 按当日开盘价执行交易
+            current_price = self.price_on(current_date, "open")
             executed_quantity = self.execute_trade(
                 action, quantity, current_price)
+            self.record_trade(current_date, action, executed_quantity, current_price)
+
+            self.record_portfolio_value(current_date, current_price)
+
+    def log_agent_output(self, current_date_str, output):
+        """记录每个智能体的信号和分析结果"""
+        self.backtest_logger.info(f"\n交易日期: {current_date_str}")
+        if "analyst_signals" in output:
+            self.backtest_logger.info("\n各智能体分析结果:")
+            for agent_name, signal in output["analyst_signals"].items():
+                self.backtest_logger.info(f"\n{agent_name}:")
+
+                # 记录信号和置信度
+                signal_str = f"- 信号: {signal.get('signal', 'unknown')}"
+                if 'confidence' in signal:
+                    signal_str += f", 置信度: {signal.get('confidence', 0)*100:.0f}%"
+                self.backtest_logger.info(signal_str)
+
+                # 记录分析结果
+                if 'analysis' in signal:
+                    self.backtest_logger.info("- 分析结果:")
+                    analysis = signal['analysis']
+                    if isinstance(analysis, dict):
+                        for key, value in analysis.items():
+                            self.backtest_logger.info(f"  {key}: {value}")
+                    elif isinstance(analysis, list):
+                        for item in analysis:
+                            self.backtest_logger.info(f"  • {item}")
+                    else:
+                        self.backtest_logger.info(f"  {analysis}")
+
+                # 记录理由
+                if 'reason' in signal:
+                    self.backtest_logger.info("- 决策理由:")
+                    reason = signal['reason']
+                    if isinstance(reason, list):
+                        for item in reason:
+                            self.backtest_logger.info(f"  • {item}")
+                    else:
+                        self.backtest_logger.info(f"  • {reason}")
+
+                # 记录其他可能的指标
+                for key, value in signal.items():
+                    if key not in ['signal', 'confidence', 'analysis', 'reason']:
+                        self.backtest_logger.info(f"- {key}: {value}")
+
+            self.backtest_logger.info("\n综合决策:")
+
+    def record_trade(self, current_date, action, quantity, price):
+        """记录实际成交的交易"""
+        if quantity > 0:
+            self.trades.append({"date": current_date, "action": action,
+                                "quantity": quantity, "price": price})
+
+    def record_portfolio_value(self, current_date, current_price):
+        """按当前价格更新组合总值并记录当日收益率"""
+        total_value = self.portfolio["cash"] + \
+            self.portfolio["stock"] * current_price
+        self.portfolio["portfolio_value"] = total_value
+
+        # 计算当日收益率
+        if len(self.portfolio_values) > 0:
+            daily_return = (
+                total_value / self.portfolio_values[-1]["Portfolio Value"] - 1) * 100
+        else:
+            daily_return = 0
+
+        # 记录组合价值和收益率
+        self.portfolio_values.append({
+            "Date": current_date,
+            "Portfolio Value": total_value,
+            "Daily Return": daily_return
+        })
+
+    def replay_backtest(self, trade_fraction=None, price_field="open"):
+        """只用信号库中的决策回放交易,不调用智能体
+
+        需要先用带 signal_store 的 run_backtest 生成信号;信号库中缺失的日期按持有处理.
+
+        Args:
+            trade_fraction: 每次交易的比例;None表示使用智能体给出的数量,
+                否则买入时动用该比例的现金,卖出时卖出该比例的持仓
+            price_field: 成交价格使用的字段,如 "open" 或 "close"
+        """
+        if self.signal_store is None:
+            raise ValueError("回放需要信号库")
+
+        self.load_price_series()
+        signals = self.signal_store.load_range(
+            self.ticker, self.config_hash, self.start_date, self.end_date)
+        self.logger.info(f"从信号库读取 {len(signals)}/{len(self.trading_days)} 个交易日的决策")
+
+        self.portfolio = {"cash": self.initial_capital, "stock": 0}
+        self.portfolio_values = []
+        self.trades = []
+        for current_date in self.trading_days:
+            current_price = self.price_on(current_date, price_field)
+            output = signals.get(current_date.strftime("%Y-%m-%d"), {})
+            agent_decision = output.get("decision", {"action": "hold", "quantity": 0})
+            action = agent_decision.get("action", "hold")
+            quantity = agent_decision.get("quantity", 0)
+            if trade_fraction is not None:
+                if action == "buy":
+                    quantity = int(self.portfolio["cash"] * trade_fraction // current_price)
+                elif action == "sell":
+                    quantity = int(self.portfolio["stock"] * trade_fraction)
+
+            executed_quantity = self.execute_trade(action, quantity, current_price)
+            self.record_trade(current_date, action, executed_quantity, current_price)
+            self.record_portfolio_value(current_date, current_price)
+
+        return self.portfolio_values
+
+    def analyze_performance(self, report_dir=None, plot=True, annotate=False):
+        """分析回测性能
+
+        Args:
+            report_dir: 报告目录,默认取 BACKTEST_REPORT_DIR;设置后把指标(JSON)、
+                每日净值(CSV)和图表(PNG,Agg后端)写入该目录,不弹出图表窗口
+            plot: 是否绘制图表,批量回测时可关闭以省去绘图开销
+            annotate: 是否在每个数据点上标注数值
+
+        Returns:
+            每日组合价值的 DataFrame
+        """
+        performance_df = pd.DataFrame(self.portfolio_values).set_index("Date")
+        report_dir = report_dir or BACKTEST_REPORT_DIR
 
-            # 更新组合总值
-            total_value = self.portfolio["cash"] + \
-                self.portfolio["stock"] * current_price
-            self.portfolio["portfolio_value"] = total_value
-
-            # 计算当日收益率
-            if len(self.portfolio_values) > 0:
-                daily_return = (
-                    total_value / self.portfolio_values[-1]["Portfolio Value"] - 1) * 100
-            else:
-                daily_return = 0
-
-            # 记录组合价值和收益率
-            self.portfolio_values.append({
-                "Date": current_date,
-                "Portfolio Value": total_value,
-                "Daily Return": daily_return
-            })
+        # 计算性能指标
+        metrics = performance_metrics(performance_df["Portfolio Value"], self.initial_capital)
+        metrics.update(trade_metrics(self.trades, performance_df["Portfolio Value"]))
 
-    def analyze_performance(self):
-        """分析回测性能"""
-        performance_df = pd.DataFrame(self.portfolio_values).set_index("Date")
+        if report_dir:
+            name = f"backtest_{self.ticker}_{self.start_date.replace('-', '')}_{self.end_date.replace('-', '')}"
+            paths = write_backtest_report(performance_df, metrics, self.initial_capital,
+                                          report_dir, name, plot=plot, annotate=annotate)
+            self.logger.info(f"回测报告已写入: {paths}")
+        elif plot:
+            show_performance_chart(performance_df, self.initial_capital, annotate=annotate)
 
-        # 计算累计收益率
-        performance_df["Cumulative Return"] = (
-            performance_df["Portfolio Value"] / self.initial_capital - 1) * 100
-
-        # 将金额转换为千元
-        performance_df["Portfolio Value (K)"] = performance_df["Portfolio Value"] / 1000
-
-        # 创建两个子图
-        fig, (ax1, ax2) = plt.subplots(
-            2, 1, figsize=(12, 10), height_ratios=[1, 1])
-        fig.suptitle("回测结果分析", fontsize=12)
-
-        # 绘制资金变化图
-        line1 = ax1.plot(performance_df.index,
-                         performance_df["Portfolio Value (K)"], label="组合价值", marker='o')
-        ax1.set_ylabel("组合价值 (千元)")
-        ax1.set_title("组合价值变化")
-        ax1.grid(True)
-
-        # 在数据点上添加标签
-        for x, y in zip(performance_df.index, performance_df["Portfolio Value (K)"]):
-            ax1.annotate(f'{y:.1f}K',
-                         (x, y),
-                         textcoords="offset points",
-                         xytext=(0, 10),
-                         ha='center',
-                         fontsize=8)
-
-        # 绘制收益率变化图
-        line2 = ax2.plot(performance_df.index,
-                         performance_df["Cumulative Return"], label="累计收益率", color='green', marker='o')
-        ax2.set_ylabel("累计收益率 (%)")
-        ax2.set_title("累计收益率变化")
-        ax2.grid(True)
-
-        # 在数据点上添加标签
-        for x, y in zip(performance_df.index, performance_df["Cumulative Return"]):
-            ax2.annotate(f'{y:.2f}%',
-                         (x, y),
-                         textcoords="offset points",
-                         xytext=(0, 10),
-                         ha='center',
-                         fontsize=8)
-
-        # 设置x轴标签
-        plt.xlabel("日期")
-
-        # 自动调整布局以防止标签重叠
-        plt.tight_layout()
-
-        # 显示图表
-        plt.show()
-
-        # 计算和打印性能指标
-        total_return = (
-            self.portfolio["portfolio_value"] - self.initial_capital) / self.initial_capital
+        total_return = metrics["total_return"]
         print(f"\n总收益率: {total_return * 100:.2f}%")
 
         # 记录最终回测结果
@@ -417,22 +499,19 @@ class Backtester:
             f"最终总值: {self.portfolio['portfolio_value']:,.2f}")
         self.backtest_logger.info(f"总收益率: {total_return * 100:.2f}%")
 
-        # 计算夏普比率
-        daily_returns = performance_df["Daily Return"] / 100  # 转换为小数
-        mean_daily_return = daily_returns.mean()
-        std_daily_return = daily_returns.std()
-        sharpe_ratio = (mean_daily_return / std_daily_return) * \
-            (252 ** 0.5) if std_daily_return != 0 else 0
-        # print(f"夏普比率: {sharpe_ratio:.2f}")
+        # 夏普比率
+        sharpe_ratio = metrics["sharpe_ratio"]
         self.backtest_logger.info(f"夏普比率: {sharpe_ratio:.2f}")
 
-        # 计算最大回撤
-        rolling_max = performance_df["Portfolio Value"].cummax()
-        drawdown = (performance_df["Portfolio Value"] / rolling_max - 1) * 100
-        max_drawdown = drawdown.min()
-        # print(f"最大回撤: {max_drawdown:.2f}%")
+        # 最大回撤
+        max_drawdown = metrics["max_drawdown"] * 100
         self.backtest_logger.info(f"最大回撤: {max_drawdown:.2f}%")
 
+        # 换手率和胜率
+        self.backtest_logger.info(f"成交笔数: {metrics['trade_count']}")
+        self.backtest_logger.info(f"换手率: {metrics['turnover']:.2f}")
+        self.backtest_logger.info(f"胜率: {metrics['hit_rate'] * 100:.2f}%")
+
         return performance_df
 
 
@@ -451,6 +530,17 @@ if __name__ == "__main__":
                         default=100000, help='初始资金 (默认: 100000)')
     parser.add_argument('--num-of-news', type=int, default=5,
                         help='Number of news articles to analyze for sentiment (default: 5)')
+    parser.add_argument('--mode', choices=['live', 'precompute', 'replay'], default='live',
+                        help='live: 逐日调用智能体; precompute: 逐日调用智能体并写入信号库; '
+                             'replay: 只用信号库中的决策回放交易')
+    parser.add_argument('--trade-fraction', type=float, default=None,
+                        help='回放时每次交易动用的资金/持仓比例 (默认使用智能体给出的数量)')
+    parser.add_argument('--price-field', type=str, default='open',
+                        help='回放时的成交价格字段 (默认: open)')
+    parser.add_argument('--report-dir', type=str, default=None,
+                        help='把回测指标、每日净值和图表写入该目录,不弹出图表窗口')
+    parser.add_argument('--no-plot', action='store_true', help='不绘制图表')
+    parser.add_argument('--annotate', action='store_true', help='在图表的每个数据点上标注数值')
 
     args = parser.parse_args()
 
@@ -461,11 +551,17 @@ if __name__ == "__main__":
         start_date=args.start_date,
         end_date=args.end_date,
         initial_capital=args.initial_capital,
-        num_of_news=args.num_of_news
+        num_of_news=args.num_of_news,
+        signal_store=SignalStore() if args.mode != 'live' else None
     )
 
     # 运行回测
-    backtester.run_backtest()
+    if args.mode == 'replay':
+        backtester.replay_backtest(
+            trade_fraction=args.trade_fraction, price_field=args.price_field)
+    else:
+        backtester.run_backtest()
 
     # 分析性能
-    performance_df = backtester.analyze_performance()
+    performance_df = backtester.analyze_performance(
+        report_dir=args.report_dir, plot=not args.no_plot, annotate=args.annotate)
@@ -1,18 +1,19 @@
 from datetime import datetime, timedelta
 import argparse
-from src.agents.valuation import valuation_agent
-from src.agents.state import AgentState
-from src.agents.sentiment import sentiment_agent
+from src.agents.valuation import valuation_agent_async
+from src.agents.state import AgentState, timed_node, format_timing_report
+from src.agents.sentiment import sentiment_agent_async
 from src.agents.risk_manager import risk_management_agent
-from src.agents.technicals import technical_analyst_agent
+from src.agents.technicals import technical_analyst_agent_async
 from src.agents.portfolio_manager import portfolio_management_agent
 from src.agents.market_data import market_data_agent
-from src.agents.fundamentals import fundamentals_agent
-from src.agents.researcher_bull import researcher_bull_agent
-from src.agents.researcher_bear import researcher_bear_agent
+from src.agents.fundamentals import fundamentals_agent_async
+from src.agents.researchers import researchers_agent_async
 from src.agents.debate_room import debate_room_agent
 from langgraph.graph import END, StateGraph
 from langchain_core.messages import HumanMessage
+from src.utils.async_runner import run_sync
+from src.utils.checkpoint import SQLiteSaver, memoized_node, run_thread_id
 import akshare as ak
 import pandas as pd
 #poetry run python -m src.main --ticker_list "[002155,600988,600489,600547,000975,300139]" --show-reasoning
@@ -46,25 +47,39 @@ def parse_ticker_list(ticker_str: str) -> list:
     
 ##### Run the Hedge Fund #####
 def run_hedge_fund(ticker_list: list, start_date: str, end_date: str, portfolio: dict, show_reasoning: bool = False, num_of_news: int = 5):
-    final_state = app.invoke(
-        {
+    data = {
+        "ticker_list": ticker_list,
+        "portfolio": portfolio,
+        "start_date": start_date,
+        "end_date": end_date,
+        "num_of_news": num_of_news,
+    }
+    # 相同参数的运行共用一个检查点线程,上次中途失败时从最后完成的节点继续
+    thread_id = run_thread_id(data)
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = run_sync(app.aget_state(config))
+    if snapshot.next:
+        print(f"从上次中断处继续运行: {', '.join(snapshot.next)}")
+        inputs = None
+    else:
+        checkpointer.delete_thread(thread_id)
+        inputs = {
             "messages": [
                 HumanMessage(
                     content="Make a trading decision based on the provided data.",
                 )
             ],
-            "data": {
-                "ticker_list": ticker_list,
-                "portfolio": portfolio,
-                "start_date": start_date,
-                "end_date": end_date,
-                "num_of_news": num_of_news,
-            },
+            "data": data,
             "metadata": {
                 "show_reasoning": show_reasoning,
             }
-        },
-    )
+        }
+
+    # 四个分析师节点是异步的,其LLM请求在同一事件循环中并发进行
+    final_state = run_sync(app.ainvoke(inputs, config))
+    # 运行完成后不再需要检查点,节点结果已由 memoized_node 缓存
+    checkpointer.delete_thread(thread_id)
+    print(format_timing_report(final_state.get("timings", {})))
     return final_state["messages"][-1].content
 
 
@@ -72,16 +87,20 @@ def run_hedge_fund(ticker_list: list, start_date: str, end_date: str, portfolio:
 workflow = StateGraph(AgentState)
 
 # Add nodes
-workflow.add_node("market_data_agent", market_data_agent)
-workflow.add_node("technical_analyst_agent", technical_analyst_agent)
-workflow.add_node("fundamentals_agent", fundamentals_agent)
-workflow.add_node("sentiment_agent", sentiment_agent)
-workflow.add_node("valuation_agent", valuation_agent)
-workflow.add_node("researcher_bull_agent", researcher_bull_agent)
-workflow.add_node("researcher_bear_agent", researcher_bear_agent)
-workflow.add_node("debate_room_agent", debate_room_agent)
-workflow.add_node("risk_management_agent", risk_management_agent)
-workflow.add_node("portfolio_management_agent", portfolio_management_agent)
+# 每个节点都记录耗时,运行结束后输出;输入未变化的节点直接复用上次结果
+nodes = {
+    "market_data_agent": market_data_agent,
+    "technical_analyst_agent": technical_analyst_agent_async,
+    "fundamentals_agent": fundamentals_agent_async,
+    "sentiment_agent": sentiment_agent_async,
+    "valuation_agent": valuation_agent_async,
+    "researchers_agent": researchers_agent_async,
+    "debate_room_agent": debate_room_agent,
+    "risk_management_agent": risk_management_agent,
+    "portfolio_management_agent": portfolio_management_agent,
+}
+for name, node in nodes.items():
+    workflow.add_node(name, timed_node(name, memoized_node(name, node)))
 
 # Define the workflow
 workflow.set_entry_point("market_data_agent")
@@ -93,19 +112,14 @@ workflow.add_edge("market_data_agent", "sentiment_agent")
 workflow.add_edge("market_data_agent", "valuation_agent")
 
 # Analysts to Researchers
-workflow.add_edge("technical_analyst_agent", "researcher_bull_agent")
-workflow.add_edge("fundamentals_agent", "researcher_bull_agent")
-workflow.add_edge("sentiment_agent", "researcher_bull_agent")
-workflow.add_edge("valuation_agent", "researcher_bull_agent")
-
-workflow.add_edge("technical_analyst_agent", "researcher_bear_agent")
-workflow.add_edge("fundamentals_agent", "researcher_bear_agent")
-workflow.add_edge("sentiment_agent", "researcher_bear_agent")
-workflow.add_edge("valuation_agent", "researcher_bear_agent")
+# 多空研究员合并为一个节点,两个LLM请求并发进行
+workflow.add_edge("technical_analyst_agent", "researchers_agent")
+workflow.add_edge("fundamentals_agent", "researchers_agent")
+workflow.add_edge("sentiment_agent", "researchers_agent")
+workflow.add_edge("valuation_agent", "researchers_agent")
 
 # Researchers to Debate Room
-workflow.add_edge("researcher_bull_agent", "debate_room_agent")
-workflow.add_edge("researcher_bear_agent", "debate_room_agent")
+workflow.add_edge("researchers_agent", "debate_room_agent")
 
 # Debate Room to Risk Management
 workflow.add_edge("debate_room_agent", "risk_management_agent")
@@ -114,7 +128,8 @@ workflow.add_edge("debate_room_agent", "risk_management_agent")
 workflow.add_edge("risk_management_agent", "portfolio_management_agent")
 workflow.add_edge("portfolio_management_agent", END)
 
-app = workflow.compile()
+checkpointer = SQLiteSaver()
+app = workflow.compile(checkpointer=checkpointer)
 
 # Add this at the bottom of the file
 if __name__ == "__main__":
@@ -32,7 +32,7 @@ FUND_REQ_TEXT="""
         """
 
 SENT_SYS_TEXT="""你是一个专业的A股市场分析师,擅长解读新闻对股票走势的影响.
-        你需要分析关于一组股票的新闻的情感倾向,并针对每个股票给出介于-1到1之间的分数:
+        你需要逐条分析新闻对相关股票的情感倾向,并针对每条新闻给出介于-1到1之间的分数:
         - 1表示极其积极(例如:重大利好消息、超预期业绩、行业政策支持)
         - 0.5到0.9表示积极(例如:业绩增长、新项目落地、获得订单)
         - 0.1到0.4表示轻微积极(例如:小额合同签订、日常经营正常)
@@ -57,10 +57,10 @@ SENT_SYS_TEXT="""你是一个专业的A股市场分析师,擅长解读新闻对
         4. A股市场的特殊反应规律"""
 
 SENT_REQ_TEXT="""
-        对比并计算每只的股票的情感倾向。使用股票情绪、交易理论等专业知识,避免模糊的回答，用词专业.
-        首先返回一列对情感倾向打分的数字,范围是-1到1,越接近1证明情感越积极,记作"情感:[,,,]".
-        之后,结合你所获得的新闻报道,用1000字分点列出做出该判断的理由,要求有理有据且表述明确,不要用模糊的词汇,
-        做出你觉得最可能的判断记作"原因:".
+        逐条给出每条新闻对其相关股票的情感倾向,使用股票情绪、交易理论等专业知识,避免模糊的回答，用词专业.
+        只返回一个JSON数组,不要返回其他内容,数组中每条新闻一项,格式为
+        {"id": 新闻编号, "score": -1到1之间的分数, "reason": "不超过50字的打分理由"},
+        例如:[{"id": 1, "score": 0.6, "reason": "年报营收超预期"}, {"id": 2, "score": -0.3, "reason": "涉及小额诉讼"}]
         """
 
 BULL_SYS_TEXT="""
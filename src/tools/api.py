@@ -1,39 +1,103 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import os
+import threading
+import time
 import pandas as pd
 import akshare as ak
 from datetime import datetime, timedelta
 import json
 import numpy as np
 from src.utils.logging_config import setup_logger
+from src.utils.throttle import host_slot
+from src.tools.price_store import load_price_history
+from src.tools.tech_calculator import calculate_rolling_hurst
 
 # 设置日志记录
 logger = setup_logger('api')
 
+# 全市场实时行情快照的缓存有效期(秒),可通过环境变量 SPOT_CACHE_TTL 配置
+SPOT_CACHE_TTL = float(os.getenv("SPOT_CACHE_TTL", "300"))
+
+# 进程内共享的行情快照缓存
+_spot_cache = {"data": None, "timestamp": 0.0}
+_spot_cache_lock = threading.Lock()
+
+
+def get_spot_snapshot(ttl: Optional[float] = None) -> pd.DataFrame:
+    """获取全市场实时行情快照,以'代码'列为索引
+
+    快照在进程内共享,同一个TTL窗口内只下载一次,
+    之后每只股票的查询都是O(1)的索引访问.
+
+    Args:
+        ttl: 缓存有效期(秒),为None时使用 SPOT_CACHE_TTL
+
+    Returns:
+        以股票代码为索引的DataFrame,获取失败时返回空DataFrame
+    """
+    if ttl is None:
+        ttl = SPOT_CACHE_TTL
+
+    # 下载期间持有锁,并发的调用方等待同一次下载而不是各自重复拉取
+    with _spot_cache_lock:
+        snapshot = _spot_cache["data"]
+        if snapshot is not None and time.time() - _spot_cache["timestamp"] < ttl:
+            return snapshot
+
+        logger.info("Fetching real-time quotes...")
+        with host_slot("eastmoney"):
+            realtime_data = ak.stock_zh_a_spot_em()
+        if realtime_data is None or realtime_data.empty:
+            logger.warning("No real-time quotes data available")
+            return pd.DataFrame()
+
+        snapshot = realtime_data.drop_duplicates(
+            subset="代码").set_index("代码")
+        _spot_cache["data"] = snapshot
+        _spot_cache["timestamp"] = time.time()
+        logger.info(f"✓ Real-time quotes fetched ({len(snapshot)} records)")
+        return snapshot
+
+
+def get_spot_quote(symbol: str, ttl: Optional[float] = None) -> Optional[pd.Series]:
+    """从行情快照中获取单只股票的实时行情
+
+    Args:
+        symbol: 股票代码
+        ttl: 缓存有效期(秒),为None时使用 SPOT_CACHE_TTL
+
+    Returns:
+        该股票的行情数据,未找到时返回None
+    """
+    snapshot = get_spot_snapshot(ttl)
+    if snapshot.empty or symbol not in snapshot.index:
+        return None
+    return snapshot.loc[symbol]
+
+
+def clear_spot_cache():
+    """清空行情快照缓存,下一次查询将重新下载"""
+    with _spot_cache_lock:
+        _spot_cache["data"] = None
+        _spot_cache["timestamp"] = 0.0
+
 
 def get_financial_metrics(symbol: str) -> Dict[str, Any]:
     """获取财务指标数据"""
     logger.info(f"Getting financial indicators for {symbol}...")
     try:
         # 获取实时行情数据(用于市值和估值比率)
-        logger.info("Fetching real-time quotes...")
-        realtime_data = ak.stock_zh_a_spot_em()
-        if realtime_data is None or realtime_data.empty:
-            logger.warning("No real-time quotes data available")
-            return [{}]
-
-        stock_data = realtime_data[realtime_data['代码'] == symbol]
-        if stock_data.empty:
+        stock_data = get_spot_quote(symbol)
+        if stock_data is None:
             logger.warning(f"No real-time quotes found for {symbol}")
             return [{}]
 
-        stock_data = stock_data.iloc[0]
-        logger.info("✓ Real-time quotes fetched")
-
         # 获取新浪财务指标
         logger.info("Fetching Sina financial indicators...")
         current_year = datetime.now().year
-        financial_data = ak.stock_financial_analysis_indicator(
-            symbol=symbol, start_year=str(current_year-1))
+        with host_slot("sina"):
+            financial_data = ak.stock_financial_analysis_indicator(
+                symbol=symbol, start_year=str(current_year-1))
         if financial_data is None or financial_data.empty:
             logger.warning("No financial indicator data available")
             return [{}]
@@ -50,8 +114,9 @@ def get_financial_metrics(symbol: str) -> Dict[str, Any]:
         # 获取利润表数据(用于计算 price_to_sales)
         logger.info("Fetching income statement...")
         try:
-            income_statement = ak.stock_financial_report_sina(
-                stock=f"sh{symbol}", symbol="利润表")
+            with host_slot("sina"):
+                income_statement = ak.stock_financial_report_sina(
+                    stock=f"sh{symbol}", symbol="利润表")
             if not income_statement.empty:
                 latest_income = income_statement.iloc[0]
                 logger.info("✓ Income statement fetched")
@@ -156,8 +221,9 @@ def get_financial_statements(symbol: str) -> Dict[str, Any]:
         # 获取资产负债表数据
         logger.info("Fetching balance sheet...")
         try:
-            balance_sheet = ak.stock_financial_report_sina(
-                stock=f"sh{symbol}", symbol="资产负债表")
+            with host_slot("sina"):
+                balance_sheet = ak.stock_financial_report_sina(
+                    stock=f"sh{symbol}", symbol="资产负债表")
             if not balance_sheet.empty:
                 latest_balance = balance_sheet.iloc[0]
                 previous_balance = balance_sheet.iloc[1] if len(
@@ -177,8 +243,9 @@ def get_financial_statements(symbol: str) -> Dict[str, Any]:
         # 获取利润表数据
         logger.info("Fetching income statement...")
         try:
-            income_statement = ak.stock_financial_report_sina(
-                stock=f"sh{symbol}", symbol="利润表")
+            with host_slot("sina"):
+                income_statement = ak.stock_financial_report_sina(
+                    stock=f"sh{symbol}", symbol="利润表")
             if not income_statement.empty:
                 latest_income = income_statement.iloc[0]
                 previous_income = income_statement.iloc[1] if len(
@@ -198,8 +265,9 @@ def get_financial_statements(symbol: str) -> Dict[str, Any]:
         # 获取现金流量表数据
         logger.info("Fetching cash flow statement...")
         try:
-            cash_flow = ak.stock_financial_report_sina(
-                stock=f"sh{symbol}", symbol="现金流量表")
+            with host_slot("sina"):
+                cash_flow = ak.stock_financial_report_sina(
+                    stock=f"sh{symbol}", symbol="现金流量表")
             if not cash_flow.empty:
                 latest_cash_flow = cash_flow.iloc[0]
                 previous_cash_flow = cash_flow.iloc[1] if len(
@@ -283,8 +351,10 @@ def get_market_data(symbol: str) -> Dict[str, Any]:
     """获取市场数据"""
     try:
         # 获取实时行情
-        realtime_data = ak.stock_zh_a_spot_em()
-        stock_data = realtime_data[realtime_data['代码'] == symbol].iloc[0]
+        stock_data = get_spot_quote(symbol)
+        if stock_data is None:
+            logger.warning(f"No real-time quotes found for {symbol}")
+            return {}
 
         return {
             "market_cap": float(stock_data.get("总市值", 0)),
@@ -300,6 +370,43 @@ def get_market_data(symbol: str) -> Dict[str, Any]:
         return {}
 
 
+def _hist_fetcher(symbol: str, adjust: str):
+    """返回从东方财富获取日线行情的函数,参数为开始和结束日期"""
+    def get_and_process_data(start_date, end_date):
+        """获取并处理数据,包括重命名列等操作"""
+        with host_slot("eastmoney"):
+            df = ak.stock_zh_a_hist(
+                symbol=symbol,
+                period="daily",
+                start_date=start_date.strftime("%Y%m%d"),
+                end_date=end_date.strftime("%Y%m%d"),
+                adjust=adjust
+            )
+
+        if df is None or df.empty:
+            return pd.DataFrame()
+
+        # 重命名列以匹配技术分析代理的需求
+        df = df.rename(columns={
+            "日期": "date",
+            "开盘": "open",
+            "最高": "high",
+            "最低": "low",
+            "收盘": "close",
+            "成交量": "volume",
+            "成交额": "amount",
+            "振幅": "amplitude",
+            "涨跌幅": "pct_change",
+            "涨跌额": "change_amount",
+            "换手率": "turnover"
+        })
+
+        # 确保日期列为datetime类型
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+    return get_and_process_data
+
+
 def get_price_history(symbol: str, start_date: str = None, end_date: str = None, adjust: str = "qfq") -> pd.DataFrame:
     """获取历史价格数据
 
@@ -362,40 +469,11 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
         logger.info(f"Start date: {start_date.strftime('%Y-%m-%d')}")
         logger.info(f"End date: {end_date.strftime('%Y-%m-%d')}")
 
-        def get_and_process_data(start_date, end_date):
-            """获取并处理数据,包括重命名列等操作"""
-            df = ak.stock_zh_a_hist(
-                symbol=symbol,
-                period="daily",
-                start_date=start_date.strftime("%Y%m%d"),
-                end_date=end_date.strftime("%Y%m%d"),
-                adjust=adjust
-            )
+        get_and_process_data = _hist_fetcher(symbol, adjust)
 
-            if df is None or df.empty:
-                return pd.DataFrame()
-
-            # 重命名列以匹配技术分析代理的需求
-            df = df.rename(columns={
-                "日期": "date",
-                "开盘": "open",
-                "最高": "high",
-                "最低": "low",
-                "收盘": "close",
-                "成交量": "volume",
-                "成交额": "amount",
-                "振幅": "amplitude",
-                "涨跌幅": "pct_change",
-                "涨跌额": "change_amount",
-                "换手率": "turnover"
-            })
-
-            # 确保日期列为datetime类型
-            df["date"] = pd.to_datetime(df["date"])
-            return df
-
-        # 获取历史行情数据
-        df = get_and_process_data(start_date, end_date)
+        # 获取历史行情数据(优先读取本地行情库,只下载缺失的日期)
+        df = load_price_history(
+            symbol, start_date, end_date, adjust, get_and_process_data)
 
         if df is None or df.empty:
             logger.warning(
@@ -411,7 +489,8 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
 
             # 扩大时间范围到2年
             start_date = end_date - timedelta(days=730)
-            df = get_and_process_data(start_date, end_date)
+            df = load_price_history(
+                symbol, start_date, end_date, adjust, get_and_process_data)
 
             if len(df) < min_required_days:
                 logger.warning(
@@ -460,66 +539,10 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
         df["atr_ratio"] = df["atr"] / df["close"]
 
         # 计算统计套利指标
-        # 1. 赫斯特指数 (使用过去120天的数据)
-        def calculate_hurst(series):
-            """
-            计算Hurst指数。
-
-            Args:
-                series: 价格序列
-
-            Returns:
-                float: Hurst指数,或在计算失败时返回np.nan
-            """
-            try:
-                series = series.dropna()
-                if len(series) < 30:  # 降低最小数据点要求
-                    return np.nan
-
-                # 使用对数收益率
-                log_returns = np.log(series / series.shift(1)).dropna()
-                if len(log_returns) < 30:  # 降低最小数据点要求
-                    return np.nan
-
-                # 使用更小的lag范围
-                # 减少lag范围到2-10天
-                lags = range(2, min(11, len(log_returns) // 4))
-
-                # 计算每个lag的标准差
-                tau = []
-                for lag in lags:
-                    # 计算滚动标准差
-                    std = log_returns.rolling(window=lag).std().dropna()
-                    if len(std) > 0:
-                        tau.append(np.mean(std))
-
-                # 基本的数值检查
-                if len(tau) < 3:  # 进一步降低最小要求
-                    return np.nan
-
-                # 使用对数回归
-                lags_log = np.log(list(lags))
-                tau_log = np.log(tau)
-
-                # 计算回归系数
-                reg = np.polyfit(lags_log, tau_log, 1)
-                hurst = reg[0] / 2.0
-
-                # 只保留基本的数值检查
-                if np.isnan(hurst) or np.isinf(hurst):
-                    return np.nan
-
-                return hurst
-
-            except Exception as e:
-                return np.nan
-
-        # 使用对数收益率计算Hurst指数
+        # 1. 赫斯特指数 (使用过去120天的数据,要求至少60个数据点)
         log_returns = np.log(df["close"] / df["close"].shift(1))
-        df["hurst_exponent"] = log_returns.rolling(
-            window=120,
-            min_periods=60  # 要求至少60个数据点
-        ).apply(calculate_hurst)
+        df["hurst_exponent"] = calculate_rolling_hurst(
+            log_returns, window=120, min_periods=60)
 
         # 2. 偏度 (20日)
         df["skewness"] = returns.rolling(window=20).skew()
@@ -587,21 +610,30 @@ def prices_to_df(prices):
         # 返回一个包含必要列的空DataFrame
         return pd.DataFrame(columns=['close', 'open', 'high', 'low', 'volume'])
 
-'''
 def get_price_data(
     ticker: str,
     start_date: str,
-    end_date: str
+    end_date: str,
+    adjust: str = "qfq"
 ) -> pd.DataFrame:
-    """获取股票价格数据
+    """获取股票日线行情(不计算技术指标)
+
+    直接读取本地行情库,只下载缺失的日期;回测等只需要价格的场景使用.
 
     Args:
         ticker: 股票代码
         start_date: 开始日期,格式:YYYY-MM-DD
         end_date: 结束日期,格式:YYYY-MM-DD
+        adjust: 复权类型,默认前复权
 
     Returns:
-        包含价格数据的DataFrame
+        按日期升序排列的DataFrame,包含 date、open、close、high、low、volume 等列
     """
-    return get_price_history(ticker, start_date, end_date)
-'''
\ No newline at end of file
+    yesterday = datetime.now() - timedelta(days=1)
+    end = min(datetime.strptime(end_date, "%Y-%m-%d"), yesterday)
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    try:
+        return load_price_history(ticker, start, end, adjust, _hist_fetcher(ticker, adjust))
+    except Exception as e:
+        logger.error(f"Error getting price data: {e}")
+        return pd.DataFrame()
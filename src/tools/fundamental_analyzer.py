@@ -1,7 +1,8 @@
 import os
 import json
 from datetime import datetime
-from src.tools.openrouter_config import get_chat_completion, logger as api_logger
+from src.tools.openrouter_config import get_chat_completion, get_chat_completion_async, logger as api_logger
+from src.tools.prompt_packer import compact_json, merge_results, run_chunked, run_chunked_async, split_for_messages
 from src.prompts.agent_config import FUND_SYS_TEXT,FUND_REQ_TEXT
 import time
 import pandas as pd
@@ -20,6 +21,28 @@ def get_fundmt_analyze(end_date:str,stock_fundmt_dict: dict,signal_text: str) ->
     if not stock_fundmt_dict:
         return 0.0
 
+    def analyze(chunk):
+        return parse_fundmt_result(get_chat_completion(build_fundmt_messages(end_date, chunk, signal_text)))
+
+    # 超出token预算时按股票分块并行请求,再合并各块的结果
+    chunks = split_for_messages(stock_fundmt_dict, lambda chunk: build_fundmt_messages(end_date, chunk, signal_text))
+    return merge_results(run_chunked(chunks, analyze), chunks)
+
+
+async def get_fundmt_analyze_async(end_date:str,stock_fundmt_dict: dict,signal_text: str) -> float:
+    """get_fundmt_analyze 的异步版本,与其他分析师的LLM请求并发进行"""
+    if not stock_fundmt_dict:
+        return 0.0
+
+    async def analyze(chunk):
+        return parse_fundmt_result(await get_chat_completion_async(build_fundmt_messages(end_date, chunk, signal_text)))
+
+    chunks = split_for_messages(stock_fundmt_dict, lambda chunk: build_fundmt_messages(end_date, chunk, signal_text))
+    return merge_results(await run_chunked_async(chunks, analyze), chunks)
+
+
+def build_fundmt_messages(end_date:str,stock_fundmt_dict: dict,signal_text: str) -> list:
+    """构造基本面分析的对话消息"""
     stock_list=stock_fundmt_dict.keys()
 
     # 准备系统消息
@@ -30,13 +53,16 @@ def get_fundmt_analyze(end_date:str,stock_fundmt_dict: dict,signal_text: str) ->
 
     user_message = {
         "role": "user", #prompt
-        "content": f"""提供股票列表{stock_list},股票基本面信息\n\n{stock_fundmt_dict}\n\n,{FUND_REQ_TEXT}
+        "content": f"""提供股票列表{stock_list},股票基本面信息\n\n{compact_json(stock_fundmt_dict)}\n\n,{FUND_REQ_TEXT}
         """
     }
 
+    return [system_message, user_message]
+
+
+def parse_fundmt_result(result):
+    """从LLM原始响应中提取基本面分析内容"""
     try:
-        # 获取基本面分析结果
-        result = get_chat_completion([system_message, user_message])
         if result is None:
             print("Error: PI error occurred, LLM returned None")
             return 0.0
@@ -1,198 +1,231 @@
 import os
 import sys
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import akshare as ak
 import requests
 from bs4 import BeautifulSoup
-from src.tools.openrouter_config import get_chat_completion, logger as api_logger
+from src.tools.openrouter_config import get_chat_completion, get_chat_completion_async, logger as api_logger
 from src.prompts.agent_config import SENT_SYS_TEXT,SENT_REQ_TEXT
+from src.tools.news_store import news_store
+from src.tools.prompt_packer import LLM_PROMPT_TOKEN_BUDGET, estimate_message_tokens, estimate_tokens, truncate_text
+from src.utils.sqlite_cache import SQLiteCache, make_cache_key
+from src.utils.throttle import host_slot
 import time
+import asyncio
 import pandas as pd
 import re
 
+# 单条新闻的情感得分缓存: 键为新闻链接(及提示词)的哈希
+SENTIMENT_CACHE_PATH = os.getenv(
+    "SENTIMENT_CACHE_PATH", os.path.join("src", "data", "sentiment_cache.sqlite"))
+sentiment_cache = SQLiteCache(
+    SENTIMENT_CACHE_PATH,
+    ttl=float(os.getenv("SENTIMENT_CACHE_TTL", str(30 * 24 * 3600))),
+    max_entries=int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "50000")),
+)
+# 每次LLM请求打分的新闻条数
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "10"))
+# 单条新闻正文写入提示词的token上限,超出部分截断,只保留导语部分
+SENTIMENT_ARTICLE_TOKENS = int(os.getenv("SENTIMENT_ARTICLE_TOKENS", "300"))
+# 平均得分超过该阈值判为看多/看空
+SENTIMENT_SIGNAL_THRESHOLD = 0.2
+
+# 距上次抓取超过该秒数时重新抓取新闻
+NEWS_REFRESH_INTERVAL = float(os.getenv("NEWS_REFRESH_INTERVAL", "3600"))
+
 #问题在于捕获的信息和股价相关性过强,如股价上涨在其他信息中也能体现,应加入宏观新闻等.
 
-def get_stock_news(symbol: str, max_news: int = 10) -> list:
+def get_stock_news(symbol: str, max_news: int = 10, as_of: str = None) -> list:
     """获取并处理个股新闻
 
+    新闻保存在按股票只追加的新闻库中(见 news_store).距上次抓取超过
+    NEWS_REFRESH_INTERVAL 时重新抓取,只入库比已有新闻更新的条目.
+
     Args:
         symbol (str): 股票代码,如 "300059"
-        max_news (int, optional): 获取的新闻条数,默认为10条.最大支持100条.
+        max_news (int, optional): 获取的新闻条数,默认为10条.
+        as_of (str, optional): 分析日期,格式 YYYY-MM-DD.main.py 把实盘运行的 end_date
+            设为昨天,因此为昨天或之后时视为实盘运行,抓取并返回包括今天在内的最新新闻;
+            更早的日期视为回测,只查询新闻库中该日期(含)之前发布的新闻,不再抓取
 
     Returns:
-        list: 新闻列表,每条新闻包含标题、内容、发布时间等信息
+        list: 新闻列表(按发布时间倒序),每条新闻包含标题、内容、发布时间等信息
     """
+    if _is_live(as_of):
+        last_fetched = news_store.last_fetched(symbol)
+        if last_fetched is None or time.time() - last_fetched > NEWS_REFRESH_INTERVAL:
+            fetch_stock_news(symbol)
+        else:
+            print(f"使用新闻库中的{symbol}新闻")
+        return news_store.query(symbol, limit=max_news)
 
-    # 设置pandas显示选项,确保显示完整内容
-    pd.set_option('display.max_columns', None)
-    pd.set_option('display.max_rows', None)
-    pd.set_option('display.max_colwidth', None)
-    pd.set_option('display.width', None)
-
-    # 限制最大新闻条数
-    max_news = min(max_news, 100)
+    return news_store.query(symbol, as_of=as_of, limit=max_news)
 
-    # 获取当前日期
-    today = datetime.now().strftime("%Y-%m-%d")
 
-    # 构建新闻文件路径
-    # project_root = os.path.dirname(os.path.dirname(
-    #     os.path.dirname(os.path.abspath(__file__))))
-    news_dir = os.path.join("src", "data", "stock_news")
-    print(f"新闻保存目录: {news_dir}")
+def _is_live(as_of: str = None) -> bool:
+    """as_of 为空或不早于昨天时为实盘运行"""
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    return as_of is None or as_of[:10] >= yesterday
 
-    # 确保目录存在
-    try:
-        os.makedirs(news_dir, exist_ok=True)
-        print(f"成功创建或确认目录存在: {news_dir}")
-    except Exception as e:
-        print(f"创建目录失败: {e}")
-        return []
 
-    news_file = os.path.join(news_dir, f"{symbol}_news.json")
-    print(f"新闻文件路径: {news_file}")
-
-    # 检查是否需要更新新闻
-    need_update = True
-    if os.path.exists(news_file):
-        try:
-            with open(news_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("date") == today:
-                    cached_news = data.get("news", [])
-                    if len(cached_news) >= max_news:
-                        print(f"使用缓存的新闻数据: {news_file}")
-                        return cached_news[:max_news]
-                    else:
-                        print(
-                            f"缓存的新闻数量({len(cached_news)})不足,需要获取更多新闻({max_news}条)")
-        except Exception as e:
-            print(f"读取缓存文件失败: {e}")
+def fetch_stock_news(symbol: str) -> int:
+    """从东方财富抓取个股新闻,把新闻库中还没有的新闻入库
 
+    Returns:
+        int: 新入库的新闻条数
+    """
     print(f'开始获取{symbol}的新闻数据...')
-
     try:
-        # 获取新闻列表
-        news_df = ak.stock_news_em(symbol=symbol)
-        if news_df is None or len(news_df) == 0:
-            print(f"未获取到{symbol}的新闻数据")
-            return []
-
-        print(f"成功获取到{len(news_df)}条新闻")
-
-        # 实际可获取的新闻数量
-        available_news_count = len(news_df)
-        if available_news_count < max_news:
-            print(f"警告:实际可获取的新闻数量({available_news_count})少于请求的数量({max_news})")
-            max_news = available_news_count
-
-        # 获取指定条数的新闻(考虑到可能有些新闻内容为空,多获取50%)
-        news_list = []
-        for _, row in news_df.head(int(max_news * 1.5)).iterrows():
-            try:
-                # 获取新闻内容
-                content = row["新闻内容"] if "新闻内容" in row and not pd.isna(
-                    row["新闻内容"]) else ""
-                if not content:
-                    content = row["新闻标题"]
-
-                # 只去除首尾空白字符
-                content = content.strip()
-                if len(content) < 10:  # 内容太短的跳过
-                    continue
-
-                # 获取关键词
-                keyword = row["关键词"] if "关键词" in row and not pd.isna(
-                    row["关键词"]) else ""
-
-                # 添加新闻
-                news_item = {
-                    "title": row["新闻标题"].strip(),
-                    "content": content,
-                    "publish_time": row["发布时间"],
-                    "source": row["文章来源"].strip(),
-                    "url": row["新闻链接"].strip(),
-                    "keyword": keyword.strip()
-                }
-                news_list.append(news_item)
-                print(f"成功添加新闻: {news_item['title']}")
+        with host_slot("eastmoney"):
+            news_df = ak.stock_news_em(symbol=symbol)
+    except Exception as e:
+        print(f"获取新闻数据时出错: {e}")
+        return 0
 
-            except Exception as e:
-                print(f"处理单条新闻时出错: {e}")
-                continue
+    # 已入库的新闻由新闻库按链接和标题去重
+    news_list = news_frame_to_records(news_df)
+    added = news_store.append(symbol, news_list)
+    news_store.touch(symbol)
+    print(f"获取到{0 if news_df is None else len(news_df)}条新闻,新增{added}条")
+    return added
 
-        # 按发布时间排序
-        news_list.sort(key=lambda x: x["publish_time"], reverse=True)
 
-        # 只保留指定条数的有效新闻
-        news_list = news_list[:max_news]
+def news_frame_to_records(news_df: pd.DataFrame) -> list:
+    """把 ak.stock_news_em 的结果转换为新闻字典列表
 
-        # 保存到文件
-        try:
-            save_data = {
-                "date": today,
-                "news": news_list
-            }
-            with open(news_file, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, ensure_ascii=False, indent=2)
-            print(f"成功保存{len(news_list)}条新闻到文件: {news_file}")
-        except Exception as e:
-            print(f"保存新闻数据到文件时出错: {e}")
-
-        return news_list
-
-    except Exception as e:
-        print(f"获取新闻数据时出错: {e}")
+    内容为空时使用标题,去掉过短的新闻.
+    """
+    if news_df is None or len(news_df) == 0:
         return []
 
-
-def get_news_sentiment(symbol_list,news_dict: dict, num_of_news: int = 10) -> float:
-    """分析新闻情感得分
+    def column(name):
+        if name in news_df.columns:
+            return news_df[name].fillna("").astype(str).str.strip()
+        return pd.Series("", index=news_df.index)
+
+    title = column("新闻标题")
+    content = column("新闻内容")
+    content = content.where(content != "", title)
+    records = pd.DataFrame({
+        "title": title,
+        "content": content,
+        "publish_time": column("发布时间"),
+        "source": column("文章来源"),
+        "url": column("新闻链接"),
+        "keyword": column("关键词"),
+    })
+    # 内容太短的跳过
+    records = records[records["content"].str.len() >= 10]
+    return records.sort_values("publish_time", ascending=False).to_dict("records")
+
+
+def get_news_sentiment(symbol_list, news_dict: dict, num_of_news: int = 10) -> dict:
+    """逐条新闻分析情感得分,并按股票汇总
+
+    每条新闻的得分按新闻链接缓存,只有尚未打分的新闻才会发送给LLM,
+    每日重新运行时只需分析新增的新闻.
 
     Args:
-        news_dict (list): 新闻字典,包含多个股票的新闻列表
-        symbol_list (str): 股票代码列表,如 "300059"
-        num_of_news (int): 用于分析的新闻数量,默认为10条
+        symbol_list (list): 股票代码列表,如 ["300059"]
+        news_dict (dict): 新闻字典,{股票代码: 新闻列表}
+        num_of_news (int): 每只股票用于分析的新闻数量,默认为10条
 
     Returns:
-        float: 情感得分,范围[-1, 1],-1最消极,1最积极
+        dict: {"sentiment_scores": {股票代码: 汇总结果}},见 aggregate_news_sentiment
     """
     if not news_dict:
-        return 0.0
-
-    # # 获取项目根目录
-    # project_root = os.path.dirname(os.path.dirname(
-    #     os.path.dirname(os.path.abspath(__file__))))
+        return aggregate_news_sentiment(symbol_list, [], {})
 
-    # 检查是否有缓存的情感分析结果
-    cache_file = "src/data/sentiment_cache.json"
-    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    articles = _select_articles(news_dict, num_of_news)
+    scores, pending = _lookup_article_scores(articles)
+    for batch in _batches(pending):
+        result = get_chat_completion(build_sentiment_messages(batch))
+        scores.update(_store_article_scores(batch, parse_sentiment_result(result, len(batch))))
+    return aggregate_news_sentiment(symbol_list, articles, scores)
 
-    # 生成新闻内容的唯一标识
-    news_key = "|".join([
-        f"{symbol}|{news['title']}|{news['content'][:100]}|{news['publish_time']}"
-        for symbol, news_list in news_dict.items() 
-        for news in news_list[:num_of_news]  
-    ])
 
-    # 检查缓存
-    if os.path.exists(cache_file):
-        print("发现情感分析缓存文件")
+async def get_news_sentiment_async(symbol_list, news_dict: dict, num_of_news: int = 10) -> dict:
+    """get_news_sentiment 的异步版本,各批新闻的LLM请求并发进行"""
+    if not news_dict:
+        return aggregate_news_sentiment(symbol_list, [], {})
+
+    articles = _select_articles(news_dict, num_of_news)
+    scores, pending = _lookup_article_scores(articles)
+    batches = _batches(pending)
+    results = await asyncio.gather(*[
+        get_chat_completion_async(build_sentiment_messages(batch)) for batch in batches])
+    for batch, result in zip(batches, results):
+        scores.update(_store_article_scores(batch, parse_sentiment_result(result, len(batch))))
+    return aggregate_news_sentiment(symbol_list, articles, scores)
+
+
+def _select_articles(news_dict: dict, num_of_news: int) -> list:
+    """参与分析的新闻,每项为 (股票代码, 新闻, 缓存键)"""
+    return [(symbol, news, _article_cache_key(symbol, news))
+            for symbol, news_list in news_dict.items()
+            for news in news_list[:num_of_news]]
+
+
+def _article_cache_key(symbol: str, news: dict) -> str:
+    """单条新闻的缓存键;没有链接时使用标题和发布时间.提示词变化时缓存随之失效"""
+    article = news.get('url') or [news['title'], news['publish_time']]
+    return make_cache_key("article_sentiment", SENT_SYS_TEXT, SENT_REQ_TEXT, symbol, article)
+
+
+def _lookup_article_scores(articles: list):
+    """返回 ({缓存键: 得分}, 尚未打分的新闻)"""
+    scores, pending = {}, []
+    for article in articles:
+        key = article[2]
+        if key in scores:
+            continue
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-                if news_key in cache:
-                    print("使用缓存的情感分析结果")
-                    return cache[news_key]
-                print("未找到匹配的情感分析缓存")
+            cached = sentiment_cache.get(key)
         except Exception as e:
             print(f"读取情感分析缓存出错: {e}")
-            cache = {}
-    else:
-        print("未找到情感分析缓存文件,将创建新文件")
-        cache = {}
+            cached = None
+        if cached is None:
+            pending.append(article)
+            scores[key] = None
+        else:
+            scores[key] = json.loads(cached)
+    print(f"情感分析: {len(articles)}条新闻,其中{len(pending)}条需要分析")
+    return {key: score for key, score in scores.items() if score is not None}, pending
+
+
+def _batches(articles: list) -> list:
+    """把新闻分批,每批不超过 SENTIMENT_BATCH_SIZE 条,提示词不超过 LLM_PROMPT_TOKEN_BUDGET"""
+    overhead = estimate_message_tokens(build_sentiment_messages([]))
+    batches, batch, used = [], [], overhead
+    for article in articles:
+        size = estimate_tokens(_format_article(len(batch) + 1, article[0], article[1])) + 1
+        if batch and (len(batch) >= SENTIMENT_BATCH_SIZE or used + size > LLM_PROMPT_TOKEN_BUDGET):
+            batches.append(batch)
+            batch, used = [], overhead
+        batch.append(article)
+        used += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _store_article_scores(batch: list, parsed: dict) -> dict:
+    """把一批新闻的得分写入缓存;LLM没有给出得分的新闻不缓存,下次重新分析"""
+    scores = {}
+    for index, (_, _, key) in enumerate(batch, start=1):
+        if index not in parsed:
+            continue
+        scores[key] = parsed[index]
+        try:
+            sentiment_cache.set(key, json.dumps(parsed[index], ensure_ascii=False))
+        except Exception as e:
+            print(f"写入情感分析缓存出错: {e}")
+    return scores
 
+
+def build_sentiment_messages(batch: list) -> list:
+    """构造一批新闻的情感分析对话消息,新闻按1开始编号"""
     # 准备系统消息
     system_message = {
         "role": "system",
@@ -201,35 +234,83 @@ def get_news_sentiment(symbol_list,news_dict: dict, num_of_news: int = 10) -> fl
 
     # 准备新闻内容
     news_content = "\n\n".join([
-        f"相关股票:{symbol}\n"
-        f"标题:{news['title']}\n"
-        f"来源:{news['source']}\n"
-        f"时间:{news['publish_time']}\n"
-        f"内容:{news['content']}"
-        for symbol, news_list in news_dict.items()  # 遍历所有股票
-        for news in news_list[:num_of_news]  # 使用指定数量的新闻
+        _format_article(index, symbol, news)
+        for index, (symbol, news, _) in enumerate(batch, start=1)
     ])
 
     user_message = {
         "role": "user", #prompt
         "content": f"""
-        分析以下A股上市公司{symbol_list}相关新闻:\n\n{news_content}\n\n
+        分析以下A股上市公司相关新闻:\n\n{news_content}\n\n
         {SENT_REQ_TEXT}"""
     }
 
+    return [system_message, user_message]
+
+
+def _format_article(index: int, symbol: str, news: dict) -> str:
+    """提示词中的一条新闻,正文截断到 SENTIMENT_ARTICLE_TOKENS"""
+    return (f"新闻编号:{index}\n"
+            f"相关股票:{symbol}\n"
+            f"标题:{news['title']}\n"
+            f"来源:{news['source']}\n"
+            f"时间:{news['publish_time']}\n"
+            f"内容:{truncate_text(news['content'], SENTIMENT_ARTICLE_TOKENS)}")
+
+
+def parse_sentiment_result(result, count: int) -> dict:
+    """从LLM原始响应中提取每条新闻的得分
+
+    Returns:
+        dict: {新闻编号: {"score": 得分, "reason": 理由}},解析失败的新闻不包含在内
+    """
     try:
-        # 获取LLM分析结果
-        result = get_chat_completion([system_message, user_message])
         if result is None:
             print("Error: PI error occurred, LLM returned None")
-            return 0.0
+            return {}
 
-        # 提取数字结果
         result_dict = json.loads(result)
         content_value = result_dict['choices'][0]['message']['content']
-
-        return {"sentiment_reason": content_value}
+        # 去掉可能包裹在外的代码块标记等内容
+        items = json.loads(content_value[content_value.index('['):content_value.rindex(']') + 1])
+
+        parsed = {}
+        for position, item in enumerate(items, start=1):
+            index = int(item.get("id", position))
+            if 1 <= index <= count:
+                parsed[index] = {
+                    "score": max(-1.0, min(1.0, float(item["score"]))),
+                    "reason": str(item.get("reason", "")),
+                }
+        return parsed
 
     except Exception as e:
         print(f"Error analyzing news sentiment: {e}")
-        return 0.0  # 出错时返回中性分数
+        return {}
+
+
+def aggregate_news_sentiment(symbol_list, articles: list, scores: dict) -> dict:
+    """按股票汇总每条新闻的得分
+
+    Returns:
+        dict: {"sentiment_scores": {股票代码: {
+            "score": 已打分新闻的平均得分,没有时为0,
+            "signal": bullish / bearish / neutral,
+            "news_count": 新闻数, "scored_count": 已打分的新闻数,
+            "articles": [{"title", "publish_time", "score", "reason"}]}}}
+    """
+    summary = {}
+    for symbol in symbol_list:
+        items = [(news, scores[key]) for s, news, key in articles if s == symbol and key in scores]
+        news_count = sum(1 for s, _, _ in articles if s == symbol)
+        score = sum(item["score"] for _, item in items) / len(items) if items else 0.0
+        summary[symbol] = {
+            "score": round(score, 4),
+            "signal": "bullish" if score > SENTIMENT_SIGNAL_THRESHOLD
+            else "bearish" if score < -SENTIMENT_SIGNAL_THRESHOLD else "neutral",
+            "news_count": news_count,
+            "scored_count": len(items),
+            "articles": [{"title": news["title"], "publish_time": news["publish_time"], **item}
+                         for news, item in items],
+        }
+    return {"sentiment_scores": summary}
@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+# 个股新闻库,每只股票一个只追加的JSONL文件
+NEWS_STORE_DIR = os.getenv("NEWS_STORE_DIR", os.path.join("src", "data", "stock_news"))
+
+# 计算标题哈希前去掉的空白和标点,转载稿常只在这些字符上有差异
+_TITLE_NOISE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def title_hash(title: str) -> str:
+    """标题归一化后的哈希,用于识别不同链接的同一篇转载新闻"""
+    return hashlib.sha1(_TITLE_NOISE.sub("", title).lower().encode("utf-8")).hexdigest()
+
+
+def _end_of_day(as_of: str) -> str:
+    """只有日期时视为当日收盘后,即包含当天发布的全部新闻"""
+    return f"{as_of} 23:59:59" if len(as_of) == 10 else as_of
+
+
+class _SymbolIndex:
+    """一只股票已入库新闻的内存索引"""
+
+    def __init__(self):
+        self.articles = []
+        self.urls = set()
+        self.titles = set()
+        self.size = 0
+
+    def add(self, article: dict):
+        self.articles.append(article)
+        if article.get("url"):
+            self.urls.add(article["url"])
+        self.titles.add(title_hash(article["title"]))
+
+    def contains(self, article: dict) -> bool:
+        return (bool(article.get("url")) and article["url"] in self.urls) or \
+            title_hash(article["title"]) in self.titles
+
+
+class NewsStore:
+    """按股票保存新闻的只追加存储
+
+    每只股票一个 {symbol}_news.jsonl 文件,每行一条新闻.按链接去重,
+    不同链接但标题相同的转载新闻也只保留最先入库的一条.
+    旧版的 {symbol}_news.json 在第一次读取时导入.
+
+    Args:
+        directory: 存储目录
+    """
+
+    def __init__(self, directory: str = NEWS_STORE_DIR):
+        self.directory = directory
+        self._indexes: Dict[str, _SymbolIndex] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{symbol}_news.jsonl")
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _load(self, symbol: str) -> _SymbolIndex:
+        """读取(或增量读取)文件到内存索引;调用方需持有该股票的锁"""
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            self._migrate_legacy(symbol)
+
+        index = self._indexes.get(symbol)
+        if index is None:
+            index = self._indexes[symbol] = _SymbolIndex()
+        if not os.path.exists(path):
+            return index
+
+        size = os.path.getsize(path)
+        if size < index.size:
+            # 文件被替换,重新读取
+            index = self._indexes[symbol] = _SymbolIndex()
+        if size != index.size:
+            # 其他进程追加的内容
+            with open(path, "rb") as f:
+                f.seek(index.size)
+                data = f.read(size - index.size)
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.decode("utf-8").splitlines():
+                if line.strip():
+                    index.add(json.loads(line))
+            index.size += len(complete)
+        return index
+
+    def _migrate_legacy(self, symbol: str):
+        """导入旧版按日覆盖的 {symbol}_news.json"""
+        legacy = os.path.join(self.directory, f"{symbol}_news.json")
+        if not os.path.exists(legacy):
+            return
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                news = json.load(f).get("news", [])
+        except Exception as e:
+            print(f"读取旧版新闻文件失败: {e}")
+            return
+        self._append(symbol, _SymbolIndex(), news)
+
+    def _append(self, symbol: str, index: _SymbolIndex, articles: List[dict]) -> int:
+        """写入不在 index 中的新闻;index 不修改,写入的内容由下一次 _load 读取"""
+        batch = _SymbolIndex()
+        for article in sorted(articles, key=lambda x: x["publish_time"]):
+            if not index.contains(article) and not batch.contains(article):
+                batch.add(article)
+        new = batch.articles
+        if new:
+            os.makedirs(self.directory, exist_ok=True)
+            lines = "".join(json.dumps(a, ensure_ascii=False) + "\n" for a in new)
+            # 一次写入整块内容,避免与其他进程的追加交错
+            with open(self._path(symbol), "a", encoding="utf-8") as f:
+                f.write(lines)
+        return len(new)
+
+    def append(self, symbol: str, articles: List[dict]) -> int:
+        """追加新闻,已存在的链接或标题跳过,返回新增条数"""
+        with self._lock(symbol):
+            index = self._load(symbol)
+            added = self._append(symbol, index, articles)
+            self._load(symbol)
+            return added
+
+    def latest_publish_time(self, symbol: str) -> Optional[str]:
+        """已入库新闻中最新的发布时间,没有新闻时返回None"""
+        with self._lock(symbol):
+            articles = self._load(symbol).articles
+            return max((a["publish_time"] for a in articles), default=None)
+
+    def touch(self, symbol: str):
+        """记录一次抓取(即使没有新闻),修改时间用作上次抓取时间"""
+        with self._lock(symbol):
+            self._load(symbol)
+            path = self._path(symbol)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "a", encoding="utf-8"):
+                os.utime(path)
+
+    def last_fetched(self, symbol: str) -> Optional[float]:
+        path = self._path(symbol)
+        return os.path.getmtime(path) if os.path.exists(path) else None
+
+    def query(self, symbol: str, as_of: Optional[str] = None, start: Optional[str] = None,
+              limit: Optional[int] = None) -> List[dict]:
+        """按发布时间倒序返回新闻
+
+        Args:
+            symbol: 股票代码
+            as_of: 只返回此时间(含)之前发布的新闻,YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS
+            start: 只返回此时间(含)之后发布的新闻
+            limit: 最多返回的条数
+        """
+        with self._lock(symbol):
+            articles = list(self._load(symbol).articles)
+        end = _end_of_day(as_of) if as_of else None
+        selected = [a for a in articles
+                    if (end is None or a["publish_time"] <= end)
+                    and (start is None or a["publish_time"] >= start)]
+        selected.sort(key=lambda x: x["publish_time"], reverse=True)
+        return selected[:limit] if limit is not None else selected
+
+
+news_store = NewsStore()
@@ -1,11 +1,17 @@
 import os
 import time
-import requests
+import asyncio
+import weakref
+import threading
+import importlib.util
+import httpx
 import json
 from dotenv import load_dotenv
 from dataclasses import dataclass
 import backoff
 from src.utils.logging_config import setup_logger, SUCCESS_ICON, ERROR_ICON, WAIT_ICON
+from src.utils.sqlite_cache import SQLiteCache, make_cache_key
+from src.utils.throttle import acquire_llm_slot, acquire_llm_slot_async
 
 # 设置日志记录
 logger = setup_logger('api_calls')
@@ -50,6 +56,148 @@ if not model:
     model = "gemini-1.5-flash"
     logger.info(f"{WAIT_ICON} 使用默认模型: {model}")
 
+# 同时进行的LLM请求数上限,以及单次请求超时时间(秒)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+# 连接池大小(保持长连接),安装了 h2 时默认启用 HTTP/2
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "8"))
+LLM_HTTP2 = (os.getenv("LLM_HTTP2", "1") == "1"
+             and importlib.util.find_spec("h2") is not None)
+
+# 模块级同步客户端,所有线程共享同一个连接池
+_sync_client = None
+_sync_client_lock = threading.Lock()
+
+# 每个事件循环一个异步客户端(连接池)和并发信号量
+_async_clients = weakref.WeakKeyDictionary()
+
+# 采样参数,同时参与响应缓存的键
+SAMPLING_PARAMS = {
+    "temperature":  0.5,  # 温度参数
+    "presence_penalty": 0,  # 存在惩罚
+    "frequency_penalty":0,  # 频率惩罚
+    "top_p":1  # Top-p 采样
+}
+
+# LLM响应缓存: 相同的 模型+消息+采样参数 直接返回之前的响应
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+llm_cache = SQLiteCache(
+    os.getenv("LLM_CACHE_PATH", os.path.join("src", "data", "llm_cache.sqlite")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+    max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024),
+)
+
+
+def _client_options(max_connections):
+    """同步和异步客户端共用的连接池、超时和HTTP/2配置"""
+    return {
+        "timeout": httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=max(1, max_connections),
+            max_keepalive_connections=max(1, max_connections),
+        ),
+        "http2": LLM_HTTP2,
+    }
+
+
+def _get_sync_client() -> httpx.Client:
+    """获取模块级同步客户端,首次调用时创建"""
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(**_client_options(LLM_POOL_SIZE))
+        return _sync_client
+
+
+def close_http_client():
+    """关闭同步客户端的连接池,下次请求时重新创建"""
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+def _build_request(model, contents):
+    """构造请求头和请求体"""
+    data = {
+        "messages": [
+            {
+                "role": "system",
+                "content": "你是一个顶尖的股票分析师"  # 系统消息
+            },
+            {
+                "role": "user",
+                "content": contents  # 用户消息
+            }
+        ],
+        "stream": False,  # 是否流式返回
+        "model": model,  # 模型名称
+        **SAMPLING_PARAMS
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}",
+    }
+    return headers, data
+
+
+def _build_prompt(messages):
+    """把对话消息转换为单段提示词和配置"""
+    prompt = ""
+    system_instruction = None
+
+    for message in messages:
+        role = message["role"]
+        content = message["content"]
+        if role == "system":
+            system_instruction = content
+        elif role == "user":
+            prompt += f"User: {content}\n"
+        elif role == "assistant":
+            prompt += f"Assistant: {content}\n"
+
+    # 准备配置
+    config = {}
+    if system_instruction:
+        config['system_instruction'] = system_instruction
+    return prompt.strip(), config
+
+
+def _cache_key(model, prompt):
+    """按完整请求体(模型、消息、采样参数)计算缓存键"""
+    _, data = _build_request(model, prompt)
+    return make_cache_key(data)
+
+
+def _cache_lookup(model, prompt, use_cache):
+    if not use_cache or LLM_CACHE_BYPASS:
+        return None
+    try:
+        cached = llm_cache.get(_cache_key(model, prompt))
+    except Exception as e:
+        logger.warning(f"{ERROR_ICON} 读取LLM缓存失败: {e}")
+        return None
+    if cached is not None:
+        logger.info(f"{SUCCESS_ICON} 命中LLM响应缓存")
+    return cached
+
+
+def _cache_store(model, prompt, text, use_cache):
+    if not use_cache:
+        return
+    try:
+        llm_cache.set(_cache_key(model, prompt), text)
+    except Exception as e:
+        logger.warning(f"{ERROR_ICON} 写入LLM缓存失败: {e}")
+
+
+def get_llm_cache_stats() -> dict:
+    """LLM响应缓存的命中统计"""
+    return llm_cache.stats()
+
 
 @backoff.on_exception(
     backoff.expo,
@@ -64,30 +212,10 @@ def generate_content_with_retry(model, contents, config=None):
             logger.info(f"{WAIT_ICON} Calling XiaoAI API...")
             logger.debug(f"Request content: {contents}")
 
-            data = {
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "你是一个顶尖的股票分析师"  # 系统消息
-                    },
-                    {
-                        "role": "user",
-                        "content": contents  # 用户消息
-                    }
-                ],
-                "stream": False,  # 是否流式返回
-                "model": model,  # 模型名称
-                "temperature":  0.5,  # 温度参数
-                "presence_penalty": 0,  # 存在惩罚
-                "frequency_penalty":0,  # 频率惩罚
-                "top_p":1  # Top-p 采样
-            }
-            headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            }
+            headers, data = _build_request(model, contents)
 
-            response = requests.post(base_url, headers=headers, json=data)
+            acquire_llm_slot()
+            response = _get_sync_client().post(base_url, headers=headers, json=data)
             response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
 
 
@@ -99,7 +227,7 @@ def generate_content_with_retry(model, contents, config=None):
                 logger.error(f"{ERROR_ICON} 无法解析 JSON 响应: {response.text}")
                 raise
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"{ERROR_ICON} API request failed: {e}")
         raise
     except json.JSONDecodeError as e:
@@ -111,8 +239,12 @@ def generate_content_with_retry(model, contents, config=None):
 
 
 
-def get_chat_completion(messages, model=None, max_retries=2, initial_retry_delay=1):
-    """Gets chat completion results, including retry logic."""
+def get_chat_completion(messages, model=None, max_retries=2, initial_retry_delay=1, use_cache=True):
+    """Gets chat completion results, including retry logic.
+
+    use_cache=False (或环境变量 LLM_CACHE_BYPASS=1 时) 跳过缓存直接请求,
+    后者仍会用新响应刷新缓存.
+    """
     try:
         if model is None:
             model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
@@ -120,31 +252,18 @@ def get_chat_completion(messages, model=None, max_retries=2, initial_retry_delay
         logger.info(f"{WAIT_ICON} 使用模型: {model}")
         logger.debug(f"消息内容: {messages}")
 
+        # 转换消息格式
+        prompt, config = _build_prompt(messages)
+        cached = _cache_lookup(model, prompt, use_cache)
+        if cached is not None:
+            return cached
+
         for attempt in range(max_retries):
             try:
-                # 转换消息格式
-                prompt = ""
-                system_instruction = None
-
-                for message in messages:
-                    role = message["role"]
-                    content = message["content"]
-                    if role == "system":
-                        system_instruction = content
-                    elif role == "user":
-                        prompt += f"User: {content}\n"
-                    elif role == "assistant":
-                        prompt += f"Assistant: {content}\n"
-
-                # 准备配置
-                config = {}
-                if system_instruction:
-                    config['system_instruction'] = system_instruction
-
                 # 调用 API
                 response = generate_content_with_retry(
                     model=model,
-                    contents=prompt.strip(),
+                    contents=prompt,
                     config=config
                 )
 
@@ -165,6 +284,7 @@ def get_chat_completion(messages, model=None, max_retries=2, initial_retry_delay
 
                 logger.debug(f"API 原始响应: {response.text}")
                 logger.info(f"{SUCCESS_ICON} 成功获取响应")
+                _cache_store(model, prompt, response.text, use_cache)
                 return completion.choices[0].message.content
 
             except Exception as e:
@@ -181,3 +301,107 @@ def get_chat_completion(messages, model=None, max_retries=2, initial_retry_delay
     except Exception as e:
         logger.error(f"{ERROR_ICON} get_chat_completion 发生错误: {str(e)}")
         return None
+
+
+def _get_async_client():
+    """获取当前事件循环的异步客户端和并发信号量,首次调用时创建"""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = httpx.AsyncClient(**_client_options(LLM_MAX_CONCURRENCY))
+        entry = (client, asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY)))
+        _async_clients[loop] = entry
+    return entry
+
+
+async def aclose_async_client():
+    """关闭当前事件循环的异步客户端"""
+    entry = _async_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[0].aclose()
+
+
+@backoff.on_exception(
+    backoff.expo,
+    (Exception),
+    max_tries=5,
+    max_time=300,
+    giveup=lambda e: "AFC is enabled" not in str(e)
+)
+async def generate_content_with_retry_async(model, contents, config=None):
+    """generate_content_with_retry 的异步版本,复用连接池,重试等待不阻塞事件循环"""
+    try:
+        logger.info(f"{WAIT_ICON} Calling XiaoAI API (async)...")
+        logger.debug(f"Request content: {contents}")
+
+        headers, data = _build_request(model, contents)
+        client, semaphore = _get_async_client()
+        async with semaphore:
+            await acquire_llm_slot_async()
+            response = await client.post(base_url, headers=headers, json=data)
+        response.raise_for_status()
+
+        logger.info(f"{SUCCESS_ICON} API call successful")
+        logger.debug(f"Response: {response.text[:500]}...")
+        return response
+
+    except httpx.HTTPError as e:
+        logger.error(f"{ERROR_ICON} API request failed: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"{ERROR_ICON} An unexpected error occurred: {e}")
+        raise
+
+
+async def get_chat_completion_async(messages, model=None, max_retries=2, initial_retry_delay=1, use_cache=True):
+    """get_chat_completion 的异步版本,多个调用可在同一事件循环中并发进行"""
+    try:
+        if model is None:
+            model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+        logger.info(f"{WAIT_ICON} 使用模型: {model}")
+        logger.debug(f"消息内容: {messages}")
+
+        # 转换消息格式
+        prompt, config = _build_prompt(messages)
+        cached = _cache_lookup(model, prompt, use_cache)
+        if cached is not None:
+            return cached
+
+        for attempt in range(max_retries):
+            try:
+                response = await generate_content_with_retry_async(
+                    model=model,
+                    contents=prompt,
+                    config=config
+                )
+
+                if response is None:
+                    logger.warning(
+                        f"{ERROR_ICON} 尝试 {attempt + 1}/{max_retries}: API 返回空值")
+                    if attempt < max_retries - 1:
+                        retry_delay = initial_retry_delay * (2 ** attempt)
+                        logger.info(f"{WAIT_ICON} 等待 {retry_delay} 秒后重试...")
+                        await asyncio.sleep(retry_delay)
+                        continue
+                    return None
+
+                logger.debug(f"API 原始响应: {response.text}")
+                logger.info(f"{SUCCESS_ICON} 成功获取响应")
+                _cache_store(model, prompt, response.text, use_cache)
+                return response.text
+
+            except Exception as e:
+                logger.error(
+                    f"{ERROR_ICON} 尝试 {attempt + 1}/{max_retries} 失败: {str(e)}")
+                if attempt < max_retries - 1:
+                    retry_delay = initial_retry_delay * (2 ** attempt)
+                    logger.info(f"{WAIT_ICON} 等待 {retry_delay} 秒后重试...")
+                    await asyncio.sleep(retry_delay)
+                else:
+                    logger.error(f"{ERROR_ICON} 最终错误: {str(e)}")
+                    return None
+
+    except Exception as e:
+        logger.error(f"{ERROR_ICON} get_chat_completion_async 发生错误: {str(e)}")
+        return None
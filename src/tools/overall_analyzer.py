@@ -1,7 +1,8 @@
 import os
 import json
 from datetime import datetime
-from src.tools.openrouter_config import get_chat_completion, logger as api_logger
+from src.tools.openrouter_config import get_chat_completion, get_chat_completion_async, logger as api_logger
+from src.tools.prompt_packer import LLM_PROMPT_TOKEN_BUDGET, compact_json, estimate_tokens, fit_fields
 from src.prompts.agent_config import BULL_SYS_TEXT,BULL_REQ_TEXT,BEAR_SYS_TEXT,BEAR_REQ_TEXT,DEBATE_SYS_TEXT,DEBATE_REQ_TEXT
 import time
 import pandas as pd
@@ -11,6 +12,29 @@ def get_bullish_analyze(end_date:str,stock_list:list,reasoning_dict: dict) :
     if not reasoning_dict:
         return 0.0
 
+    result = get_chat_completion(build_bull_messages(stock_list,reasoning_dict))
+    return parse_overall_result(result)
+
+
+async def get_bullish_analyze_async(end_date:str,stock_list:list,reasoning_dict: dict) :
+    """get_bullish_analyze 的异步版本,与空方研究员的LLM请求并发进行"""
+    if not reasoning_dict:
+        return 0.0
+
+    result = await get_chat_completion_async(build_bull_messages(stock_list,reasoning_dict))
+    return parse_overall_result(result)
+
+
+def _fit_reasoning(reasoning_dict: dict, sys_text: str, req_text: str) -> str:
+    """各分析师的结论压缩到token预算内,超出时截断最长的几段理由"""
+    # 模板中除结论外的文字另留200个token
+    overhead = estimate_tokens(sys_text) + estimate_tokens(req_text) + 200
+    return compact_json(fit_fields(reasoning_dict, LLM_PROMPT_TOKEN_BUDGET - overhead))
+
+
+def build_bull_messages(stock_list:list,reasoning_dict: dict) -> list:
+    """构造多方研究员的对话消息"""
+
     # 准备系统消息
     system_message = {
         "role": "system",
@@ -20,30 +44,34 @@ def get_bullish_analyze(end_date:str,stock_list:list,reasoning_dict: dict) :
     user_message = {
         "role": "user", #prompt
         "content": f"""
-        分析以下A股上市公司{stock_list}相关综合指标,\n\n{reasoning_dict}\n\n
+        分析以下A股上市公司{stock_list}相关综合指标,\n\n{_fit_reasoning(reasoning_dict, BULL_SYS_TEXT, BULL_REQ_TEXT)}\n\n
         {BULL_REQ_TEXT}"""
     }
 
-    try:
-        result = get_chat_completion([system_message, user_message])
-        if result is None:
-            print("Error: PI error occurred, LLM returned None")
-            return 0.0
+    return [system_message, user_message]
+
 
-        result_dict = json.loads(result)
-        content_value = result_dict['choices'][0]['message']['content']
-        
-        return content_value
-    
-    except Exception as e:
-        print(f"Error analyzing fundamental: {e}")
-        return 0.0
-    
 def get_bearish_analyze(end_date:str,stock_list:list,reasoning_dict: dict) :
 
     if not reasoning_dict:
         return 0.0
 
+    result = get_chat_completion(build_bear_messages(stock_list,reasoning_dict))
+    return parse_overall_result(result)
+
+
+async def get_bearish_analyze_async(end_date:str,stock_list:list,reasoning_dict: dict) :
+    """get_bearish_analyze 的异步版本,与多方研究员的LLM请求并发进行"""
+    if not reasoning_dict:
+        return 0.0
+
+    result = await get_chat_completion_async(build_bear_messages(stock_list,reasoning_dict))
+    return parse_overall_result(result)
+
+
+def build_bear_messages(stock_list:list,reasoning_dict: dict) -> list:
+    """构造空方研究员的对话消息"""
+
     # 准备系统消息
     system_message = {
         "role": "system",
@@ -53,13 +81,17 @@ def get_bearish_analyze(end_date:str,stock_list:list,reasoning_dict: dict) :
     user_message = {
         "role": "user", #prompt
         "content": f"""
-        分析以下A股上市公司{stock_list}相关综合指标,对比并计算每只的股票的未来价格:\n\n{reasoning_dict}\n\n
+        分析以下A股上市公司{stock_list}相关综合指标,对比并计算每只的股票的未来价格:\n\n{_fit_reasoning(reasoning_dict, BEAR_SYS_TEXT, BEAR_REQ_TEXT)}\n\n
         {BEAR_REQ_TEXT}"""
 
     }
 
+    return [system_message, user_message]
+
+
+def parse_overall_result(result):
+    """从LLM原始响应中提取回答内容"""
     try:
-        result = get_chat_completion([system_message, user_message])
         if result is None:
             print("Error: PI error occurred, LLM returned None")
             return 0.0
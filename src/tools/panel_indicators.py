@@ -0,0 +1,529 @@
+import math
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.tools.tech_calculator import calculate_obv_array
+
+# 数值信号与文字信号的对应关系
+SIGNAL_LABELS = {1: 'bullish', 0: 'neutral', -1: 'bearish'}
+
+DEFAULT_STRATEGY_WEIGHTS = {
+    'trend': 0.30,
+    'mean_reversion': 0.25,
+    'momentum': 0.25,
+    'volatility': 0.15,
+    'stat_arb': 0.05
+}
+
+# Thresholds of the strategy signals (see panel_strategy_signals); the
+# defaults are the values used by tech_calculator
+DEFAULT_STRATEGY_PARAMS = {
+    'mean_reversion_z': 2.0,        # |z-score| beyond which price is stretched
+    'mean_reversion_band': 0.2,     # position in the Bollinger band (and 1 - band)
+    'momentum_threshold': 0.05,     # |weighted momentum| needed for a signal
+    'momentum_volume': 1.0,         # volume / 21-day average needed to confirm
+    'volatility_band': 0.2,         # volatility regime below 1 - band / above 1 + band
+    'volatility_z': 1.0,            # |volatility z-score| needed for a signal
+    'stat_arb_hurst': 0.4,          # Hurst exponent below which prices mean-revert
+    'stat_arb_skew': 1.0,           # |skewness| needed for a signal
+}
+
+PANEL_FIELDS = ("open", "close", "high", "low", "volume")
+
+
+def build_price_panel(
+    prices_dict: Dict[str, pd.DataFrame],
+    fields: Iterable[str] = PANEL_FIELDS
+) -> Dict[str, pd.DataFrame]:
+    """
+    Stack per-ticker price frames into wide (bar x ticker) panels.
+
+    Every ticker is aligned on its most recent bar: the last row of the
+    panel is the latest bar of each ticker, and shorter histories are padded
+    with NaN at the top. Rolling windows therefore see exactly the bars they
+    would see on the single-ticker frame, even when tickers were suspended
+    on different days. The per-cell trading dates are kept in panel['date']
+    when the frames carry a date column.
+
+    Args:
+        prices_dict: Mapping of ticker to DataFrame with OHLCV columns
+        fields: Columns to stack
+
+    Returns:
+        Dict of field name to DataFrame (RangeIndex rows, ticker columns)
+    """
+    frames = {ticker: df if isinstance(df, pd.DataFrame) else pd.DataFrame(df)
+              for ticker, df in prices_dict.items()}
+    tickers = list(frames)
+    length = max((len(df) for df in frames.values()), default=0)
+
+    panel = {}
+    for field in fields:
+        data = np.full((length, len(tickers)), np.nan)
+        for column, df in enumerate(frames.values()):
+            if len(df) and field in df.columns:
+                values = df[field]
+                if values.dtype == object:
+                    values = pd.to_numeric(values, errors='coerce')
+                data[length - len(df):, column] = values.values
+        panel[field] = pd.DataFrame(data, columns=tickers)
+
+    if any("date" in df.columns for df in frames.values()):
+        dates = np.full((length, len(tickers)), np.datetime64("NaT"), dtype="datetime64[ns]")
+        for column, df in enumerate(frames.values()):
+            if len(df) and "date" in df.columns:
+                dates[length - len(df):, column] = pd.to_datetime(df["date"]).values
+        panel["date"] = pd.DataFrame(dates, columns=tickers)
+
+    return panel
+
+
+def panel_rolling(
+    frame: pd.DataFrame,
+    window: int,
+    how: str = 'mean',
+    min_periods: int = None
+) -> pd.DataFrame:
+    """
+    Rolling statistic for every column in a single pass.
+
+    DataFrame.rolling loops over the columns in Python, which dominates the
+    cost for wide panels. Here the columns are laid end to end in one Series,
+    separated by `window` NaN rows so no window spans two tickers, and the
+    statistic is computed by one call of the same pandas kernel.
+
+    Args:
+        frame: (bar x ticker) panel
+        window: Window size
+        how: Name of the Rolling method ('mean', 'sum', 'std', 'skew', ...)
+        min_periods: Minimum number of observations, defaults to window
+
+    Returns:
+        pd.DataFrame: Same shape as frame
+    """
+    rows, columns = frame.shape
+    padded = np.full((rows + window, columns), np.nan)
+    padded[window:] = frame.values
+    flat = pd.Series(padded.ravel(order='F'))
+    result = getattr(flat.rolling(window, min_periods=min_periods), how)()
+    result = result.values.reshape((rows + window, columns), order='F')[window:]
+    return pd.DataFrame(result, index=frame.index, columns=frame.columns)
+
+
+def panel_ema(close: pd.DataFrame, window: int) -> pd.DataFrame:
+    return close.ewm(span=window, adjust=False).mean()
+
+
+def panel_macd(close: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    macd_line = panel_ema(close, 12) - panel_ema(close, 26)
+    signal_line = macd_line.ewm(span=9, adjust=False).mean()
+    return macd_line, signal_line
+
+
+def panel_rsi(close: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+    valid = close.notna()
+    delta = close.diff()
+    # 填充位置保持NaN,避免补齐的空行被当作零涨跌参与滚动均值
+    gain = delta.where(delta > 0, 0).fillna(0).where(valid)
+    loss = (-delta.where(delta < 0, 0)).fillna(0).where(valid)
+    avg_gain = panel_rolling(gain, period)
+    avg_loss = panel_rolling(loss, period)
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def panel_bollinger_bands(
+    close: pd.DataFrame,
+    window: int = 20
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    sma = panel_rolling(close, window)
+    std_dev = panel_rolling(close, window, 'std')
+    return sma + (std_dev * 2), sma - (std_dev * 2)
+
+
+def _true_range(high: pd.DataFrame, low: pd.DataFrame, close: pd.DataFrame) -> pd.DataFrame:
+    prev_close = close.shift()
+    # fmax忽略NaN,与逐行 max(axis=1) 的 skipna 行为一致
+    true_range = np.fmax(np.fmax((high - low).values, (high - prev_close).abs().values),
+                         (low - prev_close).abs().values)
+    return pd.DataFrame(true_range, index=close.index, columns=close.columns)
+
+
+def panel_adx(
+    high: pd.DataFrame,
+    low: pd.DataFrame,
+    close: pd.DataFrame,
+    period: int = 14
+) -> Dict[str, pd.DataFrame]:
+    """
+    Average Directional Index for every column, same formulas as calculate_adx
+
+    Returns:
+        Dict with 'adx', '+di' and '-di' panels
+    """
+    tr = _true_range(high, low, close)
+    up_move = high - high.shift()
+    down_move = low.shift() - low
+
+    valid = high.notna()
+    plus_dm = up_move.where((up_move > down_move) & (up_move > 0), 0).where(valid)
+    minus_dm = down_move.where((down_move > up_move) & (down_move > 0), 0).where(valid)
+
+    tr_ewm = tr.ewm(span=period).mean()
+    plus_di = 100 * (plus_dm.ewm(span=period).mean() / tr_ewm)
+    minus_di = 100 * (minus_dm.ewm(span=period).mean() / tr_ewm)
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di)
+    adx = dx.ewm(span=period).mean()
+
+    return {'adx': adx, '+di': plus_di, '-di': minus_di}
+
+
+def panel_ichimoku(
+    high: pd.DataFrame,
+    low: pd.DataFrame,
+    close: pd.DataFrame
+) -> Dict[str, pd.DataFrame]:
+    tenkan_sen = (panel_rolling(high, 9, 'max') + panel_rolling(low, 9, 'min')) / 2
+    kijun_sen = (panel_rolling(high, 26, 'max') + panel_rolling(low, 26, 'min')) / 2
+    senkou_span_a = ((tenkan_sen + kijun_sen) / 2).shift(26)
+    senkou_span_b = ((panel_rolling(high, 52, 'max') +
+                      panel_rolling(low, 52, 'min')) / 2).shift(26)
+    chikou_span = close.shift(-26)
+
+    return {
+        'tenkan_sen': tenkan_sen,
+        'kijun_sen': kijun_sen,
+        'senkou_span_a': senkou_span_a,
+        'senkou_span_b': senkou_span_b,
+        'chikou_span': chikou_span
+    }
+
+
+def panel_atr(
+    high: pd.DataFrame,
+    low: pd.DataFrame,
+    close: pd.DataFrame,
+    period: int = 14,
+    min_periods: int = 7
+) -> pd.DataFrame:
+    return panel_rolling(_true_range(high, low, close), period, min_periods=min_periods)
+
+
+def panel_obv(close: pd.DataFrame, volume: pd.DataFrame) -> pd.DataFrame:
+    obv = calculate_obv_array(close.values, volume.values)
+    return pd.DataFrame(obv, index=close.index, columns=close.columns).where(close.notna())
+
+
+def panel_hurst_exponent(close: pd.DataFrame, max_lag: int = 10) -> pd.DataFrame:
+    """
+    Expanding Hurst exponent for every column: row t holds the value
+    calculate_hurst_exponent returns for the history up to and including t.
+
+    The standard deviation of the lagged return differences is accumulated
+    with running sums, so the whole (bar x ticker) panel is evaluated in
+    O(bars * tickers * lags).
+
+    Args:
+        close: Close price panel
+        max_lag: Upper bound (exclusive) of the lag range
+
+    Returns:
+        pd.DataFrame: Hurst exponent clipped to [0, 1], 0.5 when there are
+        fewer than 2 * max_lag returns
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.log(close.values / close.shift(1).values)
+    return_count = np.cumsum(~np.isnan(returns), axis=0)
+
+    lags = np.arange(2, max_lag)
+    x = np.log(lags)
+    x_centered = x - x.mean()
+
+    # 回归斜率 = sum(xc * log_tau) / sum(xc^2),逐个lag累加避免保存所有中间结果
+    slope = np.zeros(returns.shape)
+    for lag, weight in zip(lags, x_centered):
+        diff = np.full(returns.shape, np.nan)
+        diff[lag:] = returns[lag:] - returns[:-lag]
+        valid = ~np.isnan(diff)
+        count = np.cumsum(valid, axis=0)
+        total = np.cumsum(np.where(valid, diff, 0.0), axis=0)
+        total_sq = np.cumsum(np.where(valid, diff * diff, 0.0), axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / count
+            variance = np.maximum(total_sq / count - mean * mean, 0.0)
+        tau = np.fmax(np.sqrt(np.sqrt(variance)), 1e-8)
+        slope += weight * np.log(tau)
+    slope /= np.dot(x_centered, x_centered)
+
+    hurst = np.where(return_count >= max_lag * 2, np.clip(slope, 0.0, 1.0), 0.5)
+    return pd.DataFrame(hurst, index=close.index, columns=close.columns)
+
+
+def calculate_panel_indicators(panel: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Compute the indicator set used by the technical analyst for all tickers
+
+    Args:
+        panel: Output of build_price_panel
+
+    Returns:
+        Dict of indicator name to (bar x ticker) DataFrame
+    """
+    close, high, low, volume = panel['close'], panel['high'], panel['low'], panel['volume']
+
+    macd_line, signal_line = panel_macd(close)
+    upper_band, lower_band = panel_bollinger_bands(close)
+    obv = panel_obv(close, volume)
+    adx = panel_adx(high, low, close, 14)
+
+    indicators = {
+        'macd': macd_line,
+        'macd_signal': signal_line,
+        'rsi': panel_rsi(close),
+        'bb_upper': upper_band,
+        'bb_lower': lower_band,
+        'obv': obv,
+        # 最近5个交易日OBV变化的均值
+        'obv_slope': panel_rolling(obv.diff(), 5, min_periods=1),
+        # 相对4个交易日前的涨跌幅
+        'price_drop': (close - close.shift(4)) / close.shift(4),
+        'adx': adx['adx'],
+        '+di': adx['+di'],
+        '-di': adx['-di'],
+        'atr': panel_atr(high, low, close),
+    }
+    indicators.update(panel_ichimoku(high, low, close))
+    return indicators
+
+
+def _as_frame(values, like: pd.DataFrame, valid: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(values, index=like.index, columns=like.columns).where(valid)
+
+
+def _strategy(signal, confidence, metrics: Dict[str, pd.DataFrame], valid: pd.DataFrame) -> Dict:
+    return {
+        'signal': _as_frame(signal, valid, valid),
+        'confidence': _as_frame(confidence, valid, valid),
+        'metrics': {name: value.where(valid) for name, value in metrics.items()},
+    }
+
+
+def _direction(bullish: pd.DataFrame, bearish: pd.DataFrame) -> np.ndarray:
+    return np.select([bullish.values, bearish.values], [1.0, -1.0], 0.0)
+
+
+def calculate_panel_indicator_signals(
+    panel: Dict[str, pd.DataFrame],
+    indicators: Dict[str, pd.DataFrame]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Vectorized cal_signals: MACD cross, RSI, Bollinger, OBV and price drop
+    signals (1 bullish, 0 neutral, -1 bearish) for every bar and ticker.
+    'price_drop' is 1 where the oversold price drop signal fires, else 0.
+    """
+    close = panel['close']
+    valid = close.notna()
+    macd_line, signal_line = indicators['macd'], indicators['macd_signal']
+    rsi = indicators['rsi']
+    price_drop = indicators['price_drop']
+    obv_slope = indicators['obv_slope']
+
+    macd = _direction(
+        (macd_line.shift() < signal_line.shift()) & (macd_line > signal_line),
+        (macd_line.shift() > signal_line.shift()) & (macd_line < signal_line))
+    rsi_signal = _direction(rsi < 30, rsi > 70)
+    bollinger = _direction(close < indicators['bb_lower'], close > indicators['bb_upper'])
+    obv = _direction(obv_slope > 0, obv_slope < 0)
+    drop = (((price_drop < -0.05) & (rsi < 40)) |
+            ((price_drop < -0.03) & (rsi < 45))).astype(float)
+
+    return {
+        'MACD': _as_frame(macd, close, valid),
+        'RSI': _as_frame(rsi_signal, close, valid),
+        'Bollinger': _as_frame(bollinger, close, valid),
+        'OBV': _as_frame(obv, close, valid),
+        'price_drop': _as_frame(drop, close, valid),
+    }
+
+
+def calculate_panel_strategy_inputs(panel: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Indicator panels behind the five strategies, before any threshold is
+    applied. Computing these is the expensive part of
+    calculate_panel_strategy_signals; parameter sweeps compute them once and
+    call panel_strategy_signals for every parameter set.
+
+    Args:
+        panel: Output of build_price_panel
+
+    Returns:
+        Dict of indicator name to (bar x ticker) DataFrame
+    """
+    close, high, low, volume = panel['close'], panel['high'], panel['low'], panel['volume']
+    returns = close / close.shift(1) - 1
+
+    ema_21 = panel_ema(close, 21)
+    adx = panel_adx(high, low, close, 14)['adx']
+
+    ma_50 = panel_rolling(close, 50)
+    std_50 = panel_rolling(close, 50, 'std')
+    bb_upper, bb_lower = panel_bollinger_bands(close)
+
+    mom_1m = panel_rolling(returns, 21, 'sum', min_periods=5).fillna(0)
+    mom_3m = panel_rolling(returns, 63, 'sum', min_periods=42).fillna(mom_1m)
+    mom_6m = panel_rolling(returns, 126, 'sum', min_periods=63).fillna(mom_3m)
+
+    hist_vol = panel_rolling(returns, 21, 'std', min_periods=10) * math.sqrt(252)
+    vol_ma = panel_rolling(hist_vol, 42, min_periods=21)
+    vol_std = panel_rolling(hist_vol, 42, 'std', min_periods=21)
+
+    return {
+        'valid': close.notna(),
+        'short_trend': panel_ema(close, 8) > ema_21,
+        'medium_trend': ema_21 > panel_ema(close, 55),
+        'adx': adx,
+        'trend_strength': adx / 100.0,
+        'z_score': (close - ma_50) / std_50,
+        'price_vs_bb': (close - bb_lower) / (bb_upper - bb_lower),
+        'rsi_14': panel_rsi(close, 14),
+        'rsi_28': panel_rsi(close, 28),
+        'momentum_1m': mom_1m,
+        'momentum_3m': mom_3m,
+        'momentum_6m': mom_6m,
+        'momentum_score': 0.2 * mom_1m + 0.3 * mom_3m + 0.5 * mom_6m,
+        'volume_momentum': volume / panel_rolling(volume, 21, min_periods=10),
+        'historical_volatility': hist_vol,
+        'volatility_regime': (hist_vol / vol_ma).fillna(1.0),
+        'volatility_z_score': ((hist_vol - vol_ma) / vol_std.replace(0, np.nan)).fillna(0.0),
+        'atr_ratio': panel_atr(high, low, close, period=14, min_periods=7) / close,
+        'hurst_exponent': panel_hurst_exponent(close, max_lag=10),
+        'skewness': panel_rolling(returns, 42, 'skew', min_periods=21).fillna(0.0),
+        'kurtosis': panel_rolling(returns, 42, 'kurt', min_periods=21).fillna(3.0),
+    }
+
+
+def panel_strategy_signals(
+    inputs: Dict[str, pd.DataFrame],
+    params: Dict[str, float] = None
+) -> Dict[str, Dict]:
+    """
+    Apply the strategy thresholds to precomputed strategy inputs.
+
+    Args:
+        inputs: Output of calculate_panel_strategy_inputs
+        params: Overrides for DEFAULT_STRATEGY_PARAMS
+
+    Returns:
+        See calculate_panel_strategy_signals
+    """
+    p = {**DEFAULT_STRATEGY_PARAMS, **(params or {})}
+    x = inputs
+    valid = x['valid']
+
+    # Trend following
+    short_trend, medium_trend = x['short_trend'], x['medium_trend']
+    signal = _direction(short_trend & medium_trend, ~short_trend & ~medium_trend)
+    trend = _strategy(signal, np.where(signal != 0, x['trend_strength'], 0.5),
+                      {'adx': x['adx'], 'trend_strength': x['trend_strength']}, valid)
+
+    # Mean reversion
+    z_score, price_vs_bb = x['z_score'], x['price_vs_bb']
+    z, band = p['mean_reversion_z'], p['mean_reversion_band']
+    signal = _direction((z_score < -z) & (price_vs_bb < band),
+                        (z_score > z) & (price_vs_bb > 1 - band))
+    mean_reversion = _strategy(
+        signal, np.where(signal != 0, np.minimum(z_score.abs() / 4, 1.0), 0.5),
+        {'z_score': z_score, 'price_vs_bb': price_vs_bb,
+         'rsi_14': x['rsi_14'], 'rsi_28': x['rsi_28']}, valid)
+
+    # Momentum
+    momentum_score = x['momentum_score']
+    volume_confirmation = x['volume_momentum'] > p['momentum_volume']
+    signal = _direction((momentum_score > p['momentum_threshold']) & volume_confirmation,
+                        (momentum_score < -p['momentum_threshold']) & volume_confirmation)
+    momentum = _strategy(
+        signal, np.where(signal != 0, np.minimum(momentum_score.abs() * 5, 1.0), 0.5),
+        {name: x[name] for name in ('momentum_1m', 'momentum_3m', 'momentum_6m',
+                                    'volume_momentum')}, valid)
+
+    # Volatility
+    vol_regime, vol_z_score = x['volatility_regime'], x['volatility_z_score']
+    band, z = p['volatility_band'], p['volatility_z']
+    signal = _direction((vol_regime < 1 - band) & (vol_z_score < -z),
+                        (vol_regime > 1 + band) & (vol_z_score > z))
+    volatility = _strategy(
+        signal, np.where(signal != 0, np.minimum(vol_z_score.abs() / 3, 1.0), 0.5),
+        {name: x[name] for name in ('historical_volatility', 'volatility_regime',
+                                    'volatility_z_score', 'atr_ratio')}, valid)
+
+    # Statistical arbitrage
+    hurst, skew = x['hurst_exponent'], x['skewness']
+    mean_reverting = hurst < p['stat_arb_hurst']
+    signal = _direction(mean_reverting & (skew > p['stat_arb_skew']),
+                        mean_reverting & (skew < -p['stat_arb_skew']))
+    stat_arb = _strategy(
+        signal, np.where(signal != 0, (0.5 - hurst) * 2, 0.5),
+        {name: x[name] for name in ('hurst_exponent', 'skewness', 'kurtosis')}, valid)
+
+    return {
+        'trend': trend,
+        'mean_reversion': mean_reversion,
+        'momentum': momentum,
+        'volatility': volatility,
+        'stat_arb': stat_arb,
+    }
+
+
+def calculate_panel_strategy_signals(
+    panel: Dict[str, pd.DataFrame],
+    params: Dict[str, float] = None
+) -> Dict[str, Dict]:
+    """
+    Vectorized trend, mean reversion, momentum, volatility and statistical
+    arbitrage strategies. Row t of every output equals what the matching
+    calculate_*_signals function returns for the history ending at t.
+
+    Args:
+        panel: Output of build_price_panel
+        params: Overrides for DEFAULT_STRATEGY_PARAMS
+
+    Returns:
+        Dict of strategy name to {'signal', 'confidence', 'metrics'},
+        signals encoded as 1 / 0 / -1 (NaN before a ticker's first bar)
+    """
+    return panel_strategy_signals(calculate_panel_strategy_inputs(panel), params)
+
+
+def combine_panel_signals(
+    strategy_signals: Dict[str, Dict],
+    weights: Dict[str, float] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Vectorized weighted_signal_combination over whole panels
+
+    Returns:
+        Dict with 'signal' (1 / 0 / -1), 'confidence' and the signed
+        'score' panels
+    """
+    weights = weights or DEFAULT_STRATEGY_WEIGHTS
+    weighted_sum = 0
+    total_confidence = 0
+    for strategy, weight in weights.items():
+        signal = strategy_signals[strategy]['signal']
+        confidence = strategy_signals[strategy]['confidence']
+        weighted_sum = weighted_sum + signal * weight * confidence
+        total_confidence = total_confidence + weight * confidence
+
+    like = strategy_signals[next(iter(weights))]['signal']
+    valid = like.notna()
+    final_score = np.where(total_confidence > 0, weighted_sum / total_confidence, 0.0)
+    final_score = pd.DataFrame(final_score, index=like.index, columns=like.columns)
+    signal = _direction(final_score > 0.2, final_score < -0.2)
+
+    return {
+        'signal': _as_frame(signal, like, valid),
+        'confidence': final_score.abs().where(valid),
+        'score': final_score.where(valid),
+    }
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# 年化使用的交易日数
+TRADING_DAYS_PER_YEAR = 252
+
+
+def performance_metrics(values, initial_capital: float):
+    """计算净值曲线的回测指标,口径与 Backtester.analyze_performance 一致
+
+    Args:
+        values: 组合价值,Series 或 DataFrame(每列一条净值曲线,开头的NaN视为尚未开始)
+        initial_capital: 初始资金
+
+    Returns:
+        Series 输入返回 dict,DataFrame 输入返回以列名为索引的 DataFrame,包含:
+        - total_return: 总收益率
+        - sharpe_ratio: 夏普比率(按日收益率年化,无风险利率取0)
+        - max_drawdown: 最大回撤(负数)
+        - final_value: 期末价值
+    """
+    daily_returns = values.pct_change(fill_method=None).fillna(0)
+    mean = daily_returns.mean()
+    std = daily_returns.std()
+    if isinstance(values, pd.DataFrame):
+        sharpe = pd.Series(np.where(std != 0, mean / std.where(std != 0, 1), 0.0), index=values.columns)
+        final_value = values.ffill().iloc[-1]
+    else:
+        sharpe = mean / std if std != 0 else 0.0
+        final_value = values.iloc[-1]
+    sharpe = sharpe * TRADING_DAYS_PER_YEAR ** 0.5
+
+    drawdown = values / values.cummax() - 1
+    metrics = {
+        "total_return": final_value / initial_capital - 1,
+        "sharpe_ratio": sharpe,
+        "max_drawdown": drawdown.min(),
+        "final_value": final_value,
+    }
+    if isinstance(values, pd.DataFrame):
+        return pd.DataFrame(metrics)
+    return {key: float(value) for key, value in metrics.items()}
+
+
+def trade_metrics(trades, values) -> dict:
+    """计算成交相关的回测指标
+
+    Args:
+        trades: 成交记录列表,每条包含 action("buy"/"sell")、quantity 和 price
+        values: 组合每日价值(Series)
+
+    Returns:
+        dict,包含:
+        - trade_count: 成交笔数
+        - turnover: 换手率,总成交额 / 平均组合价值
+        - hit_rate: 胜率,卖出价高于持仓平均成本的卖出笔数占卖出笔数的比例(没有卖出时为0)
+    """
+    traded_value = 0.0
+    shares, cost_basis = 0, 0.0
+    sells, wins = 0, 0
+    for trade in trades:
+        quantity, price = trade["quantity"], trade["price"]
+        traded_value += quantity * price
+        if trade["action"] == "buy":
+            cost_basis = (cost_basis * shares + quantity * price) / (shares + quantity)
+            shares += quantity
+        else:
+            sells += 1
+            wins += price > cost_basis
+            shares -= quantity
+
+    average_value = float(values.mean()) if len(values) else 0.0
+    return {
+        "trade_count": len(trades),
+        "turnover": traded_value / average_value if average_value else 0.0,
+        "hit_rate": wins / sells if sells else 0.0,
+    }
@@ -0,0 +1,308 @@
+import os
+import glob
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Tuple
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logging_config import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 设置日志记录
+logger = setup_logger('price_store')
+
+# 本地行情库目录,每个 股票代码/复权类型 一个分区
+PRICE_STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR", os.path.join("src", "data", "price_store"))
+
+PRICE_FIELDS = ["open", "close", "high", "low", "volume", "amount",
+                "amplitude", "pct_change", "change_amount", "turnover"]
+PRICE_DTYPE = np.dtype([("date", "datetime64[D]")] +
+                       [(field, "f8") for field in PRICE_FIELDS])
+
+_partition_locks = {}
+_partition_locks_lock = threading.Lock()
+
+
+def _thread_lock(symbol: str, adjust: str) -> threading.Lock:
+    key = (symbol, adjust)
+    with _partition_locks_lock:
+        if key not in _partition_locks:
+            _partition_locks[key] = threading.Lock()
+        return _partition_locks[key]
+
+
+@contextmanager
+def _partition_lock(symbol: str, adjust: str):
+    """分区的读-合并-写锁,同时在线程间和进程间互斥(如回测进程池、并行的定时任务)"""
+    os.makedirs(PRICE_STORE_DIR, exist_ok=True)
+    lock_path = os.path.join(PRICE_STORE_DIR, f"{_partition_name(symbol, adjust)}.lock")
+    with _thread_lock(symbol, adjust), open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            # LK_LOCK 每秒重试一次,10次仍未取得锁时抛出 OSError,继续等待
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _partition_name(symbol: str, adjust: str) -> str:
+    return f"{symbol}_{adjust or 'none'}"
+
+
+def _meta_path(symbol: str, adjust: str) -> str:
+    return os.path.join(PRICE_STORE_DIR, f"{_partition_name(symbol, adjust)}.json")
+
+
+def _read_partition(symbol: str, adjust: str):
+    """读取分区数据(内存映射)及其覆盖的日期区间
+
+    元数据文件记录当前版本的数据文件名,读取时以元数据为准,
+    不会读到与元数据不匹配的数据.
+    """
+    meta_path = _meta_path(symbol, adjust)
+    if not os.path.exists(meta_path):
+        return None, None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        records = np.load(os.path.join(PRICE_STORE_DIR, meta["data"]), mmap_mode="r")
+        return records, meta
+    except Exception as e:
+        logger.warning(f"读取本地行情分区失败 {meta_path}: {e}")
+        return None, None
+
+
+def _write_partition(symbol: str, adjust: str, records: np.ndarray, meta: dict):
+    """写入新版本的数据文件,再用一次替换元数据文件切换到新版本
+
+    元数据的替换是唯一的提交点,其他进程要么看到完整的旧版本,要么看到完整的新版本.
+    旧版本的数据文件随后删除;仍被内存映射时(Windows)删除失败,留待下次写入时清理.
+    """
+    os.makedirs(PRICE_STORE_DIR, exist_ok=True)
+    name = _partition_name(symbol, adjust)
+    data_name = f"{name}.{os.getpid()}_{time.time_ns()}.npy"
+    with open(os.path.join(PRICE_STORE_DIR, data_name), 'wb') as f:
+        np.save(f, records)
+
+    meta_path = _meta_path(symbol, adjust)
+    tmp_meta_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_meta_path, 'w', encoding='utf-8') as f:
+        json.dump({**meta, "data": data_name}, f)
+    os.replace(tmp_meta_path, meta_path)
+
+    for stale in glob.glob(os.path.join(glob.escape(PRICE_STORE_DIR), f"{glob.escape(name)}.*.npy")):
+        if os.path.basename(stale) != data_name:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def _frame_to_records(df: pd.DataFrame) -> np.ndarray:
+    records = np.zeros(len(df), dtype=PRICE_DTYPE)
+    if df.empty:
+        return records
+    records["date"] = pd.to_datetime(df["date"]).values.astype("datetime64[D]")
+    for field in PRICE_FIELDS:
+        if field in df.columns:
+            records[field] = pd.to_numeric(df[field], errors="coerce").values
+        else:
+            records[field] = np.nan
+    return records
+
+
+def _records_to_frame(records: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame({field: np.asarray(records[field]) for field in PRICE_FIELDS})
+    df.insert(0, "date", pd.to_datetime(np.asarray(records["date"])))
+    return df
+
+
+def _merge_records(*parts: np.ndarray) -> np.ndarray:
+    """合并多段记录,按日期排序,同一日期保留最后出现的记录"""
+    merged = np.concatenate([np.asarray(part) for part in parts])
+    if len(merged) == 0:
+        return merged
+    order = np.argsort(merged["date"], kind="stable")
+    merged = merged[order]
+    # 保留每个日期最后一条记录
+    keep = np.append(merged["date"][1:] != merged["date"][:-1], True)
+    return merged[keep]
+
+
+def _same_bar(stored: np.ndarray, fetched: np.ndarray, date: np.datetime64) -> bool:
+    """比较同一交易日的收盘价,用于检测复权因子是否变化"""
+    stored_rows = stored[stored["date"] == date]
+    fetched_rows = fetched[fetched["date"] == date]
+    if len(stored_rows) == 0 or len(fetched_rows) == 0:
+        return True
+    return bool(np.isclose(stored_rows["close"][0], fetched_rows["close"][0],
+                           rtol=1e-6, equal_nan=True))
+
+
+def load_price_history(
+    symbol: str,
+    start_date: datetime,
+    end_date: datetime,
+    adjust: str,
+    fetch: Callable[[datetime, datetime], pd.DataFrame],
+) -> pd.DataFrame:
+    """从本地行情库读取日线数据,只从远端获取缺失的日期区间
+
+    分区记录了已覆盖的日期区间(包括没有交易的节假日),
+    请求区间超出覆盖范围时只下载首尾缺失的部分.
+    增量下载时会带上与已存数据重叠的一个交易日,
+    若该日收盘价不一致(复权因子变化),则整体重新下载.
+    远端返回空数据时不扩展覆盖区间,下次读取时重新下载.
+
+    Args:
+        symbol: 股票代码
+        start_date: 开始日期
+        end_date: 结束日期
+        adjust: 复权类型
+        fetch: 从远端获取数据的函数,参数为开始和结束日期,
+               返回包含 date 及 PRICE_FIELDS 列的DataFrame
+
+    Returns:
+        按日期升序排列的DataFrame,包含 date 及 PRICE_FIELDS 列
+    """
+    start = np.datetime64(pd.Timestamp(start_date).date(), "D")
+    end = np.datetime64(pd.Timestamp(end_date).date(), "D")
+
+    def fetch_records(fetch_start: np.datetime64, fetch_end: np.datetime64) -> np.ndarray:
+        df = fetch(pd.Timestamp(fetch_start).to_pydatetime(),
+                   pd.Timestamp(fetch_end).to_pydatetime())
+        if df is None or df.empty:
+            return np.zeros(0, dtype=PRICE_DTYPE)
+        return _frame_to_records(df)
+
+    with _partition_lock(symbol, adjust):
+        records, meta = _read_partition(symbol, adjust)
+
+        if records is None:
+            logger.info(f"本地行情库无 {symbol} 数据,下载完整区间")
+            records = fetch_records(start, end)
+            cover_start, cover_end = start, end
+            changed = len(records) > 0
+        else:
+            cover_start = np.datetime64(meta["start"], "D")
+            cover_end = np.datetime64(meta["end"], "D")
+            changed = False
+            parts = [records]
+
+            if start < cover_start:
+                # 包含已存数据的第一个交易日,用于校验复权价格
+                head_end = records["date"][0] if len(records) else cover_start
+                logger.info(f"补充下载 {symbol} 前段数据: {start} 至 {head_end}")
+                head = fetch_records(start, head_end)
+                if len(head) == 0:
+                    logger.warning(f"{symbol} 前段数据为空,暂不扩展覆盖区间")
+                elif len(records) and not _same_bar(records, head, records["date"][0]):
+                    parts = None
+                    changed = True
+                else:
+                    parts.insert(0, head)
+                    cover_start = start
+                    changed = True
+
+            if parts is not None and end > cover_end:
+                # 包含已存数据的最后一个交易日,用于校验复权价格
+                tail_start = records["date"][-1] if len(records) else cover_end
+                logger.info(f"增量下载 {symbol} 数据: {tail_start} 至 {end}")
+                tail = fetch_records(tail_start, end)
+                if len(tail) == 0:
+                    logger.warning(f"{symbol} 增量数据为空,暂不扩展覆盖区间")
+                elif len(records) and not _same_bar(records, tail, records["date"][-1]):
+                    parts = None
+                    changed = True
+                else:
+                    parts.append(tail)
+                    cover_end = end
+                    changed = True
+
+            if parts is None:
+                logger.info(f"{symbol} 复权价格已变化,重新下载完整区间")
+                refetched = fetch_records(min(start, cover_start), max(end, cover_end))
+                if len(refetched):
+                    records = refetched
+                    cover_start, cover_end = min(start, cover_start), max(end, cover_end)
+                else:
+                    # 重新下载失败时保留原有数据
+                    changed = False
+            elif changed:
+                records = _merge_records(*parts)
+            # 释放对旧分区文件的内存映射,之后才能替换该文件
+            parts = None
+
+        if changed:
+            _write_partition(symbol, adjust, records, {
+                "start": str(cover_start),
+                "end": str(cover_end),
+            })
+
+    dates = records["date"]
+    lo = np.searchsorted(dates, start, side="left")
+    hi = np.searchsorted(dates, end, side="right")
+    return _records_to_frame(records[lo:hi])
+
+
+def share_price_frames(frames: Dict[str, pd.DataFrame]):
+    """把多只股票的日线数据放入一块共享内存,供进程池中的子进程只读访问
+
+    Args:
+        frames: {股票代码: 包含 date 及 PRICE_FIELDS 列的DataFrame}
+
+    Returns:
+        (SharedMemory, 索引),索引为 {股票代码: (起始行, 结束行)};
+        使用完毕后由调用方 close() 并 unlink()
+    """
+    parts = {symbol: _frame_to_records(df) for symbol, df in frames.items()}
+    index = {}
+    offset = 0
+    for symbol, records in parts.items():
+        index[symbol] = (offset, offset + len(records))
+        offset += len(records)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1) * PRICE_DTYPE.itemsize)
+    table = np.ndarray((offset,), dtype=PRICE_DTYPE, buffer=shm.buf)
+    for symbol, records in parts.items():
+        start, stop = index[symbol]
+        table[start:stop] = records
+    return shm, index
+
+
+def attach_shared_prices(shm_name: str, span: Tuple[int, int]):
+    """在子进程中访问 share_price_frames 放入共享内存的一只股票的数据
+
+    Returns:
+        (SharedMemory, 记录数组),记录数组是共享内存的视图,不复制数据;
+        释放对视图(及其字段)的全部引用后才能 close() 共享内存
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    start, stop = span
+    table = np.ndarray((stop,), dtype=PRICE_DTYPE, buffer=shm.buf)
+    return shm, table[start:stop]
@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import math
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# 单次LLM请求的输入token预算(估算值)
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "12000"))
+# 数值保留的小数位数
+PROMPT_FLOAT_DIGITS = 4
+
+# 中文字符(含全角标点)约1个token,其余字符约4个一个token
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+# 分析师回答中的 '结果:[股票代码:分数,...]' 与 '原因:' 标记
+_SCORE_LIST = re.compile(r"结果\s*[:：]\s*\[([^\]]*)\]")
+_REASON_MARK = re.compile(r"原因\s*[:：]\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数,不依赖具体模型的分词器"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def estimate_message_tokens(messages: List[dict]) -> int:
+    """估算对话消息的token数,每条消息另计4个token的格式开销"""
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages)
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """把文本截断到约 max_tokens 个token,截断处加省略号"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + "…"
+
+
+def _compact(value):
+    """去掉空值字段,数值保留 PROMPT_FLOAT_DIGITS 位小数,转换为可JSON序列化的类型"""
+    if isinstance(value, dict):
+        items = ((str(k), _compact(v)) for k, v in value.items())
+        return {k: v for k, v in items if v is not None and v != "" and v != [] and v != {}}
+    if isinstance(value, (list, tuple)):
+        return [_compact(v) for v in value]
+    if isinstance(value, pd.DataFrame):
+        return _compact(value.to_dict(orient="list"))
+    if isinstance(value, pd.Series):
+        return _compact(value.tolist())
+    if isinstance(value, np.ndarray):
+        return _compact(value.tolist())
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        if not np.isfinite(value):
+            return None
+        return round(float(value), PROMPT_FLOAT_DIGITS)
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def compact_json(value) -> str:
+    """紧凑的JSON文本,代替直接把 dict 的 repr 写入提示词"""
+    return json.dumps(_compact(value), ensure_ascii=False, separators=(",", ":"))
+
+
+def _string_leaves(value, path=()):
+    """嵌套结构中所有字符串叶子的 (路径, 文本)"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _string_leaves(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _string_leaves(item, path + (index,))
+    elif isinstance(value, str):
+        yield path, value
+
+
+def _replace_leaves(value, replaced: dict, path=()):
+    """按路径替换字符串叶子,保留原有的嵌套结构"""
+    if isinstance(value, dict):
+        return {key: _replace_leaves(item, replaced, path + (key,)) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_replace_leaves(item, replaced, path + (index,)) for index, item in enumerate(value)]
+    return replaced.get(path, value)
+
+
+def fit_fields(data: dict, max_tokens: int) -> dict:
+    """截断 data 中最长的文本,使 compact_json(data) 不超过约 max_tokens 个token
+
+    只截断字符串叶子,嵌套的 dict/list 结构保持不变;较短的文本保持不变,
+    超出部分由最长的几段文本平均分摊.
+    """
+    data = _compact(data)
+    total = estimate_tokens(compact_json(data))
+    if total <= max_tokens:
+        return data
+
+    texts = dict(_string_leaves(data))
+    sizes = {path: estimate_tokens(text) for path, text in texts.items()}
+    # 除文本内容外的键名、数值、引号等开销
+    available = max_tokens - (total - sum(sizes.values()))
+    share, remaining = {}, sorted(sizes, key=sizes.get)
+    while remaining:
+        cap = max(available // len(remaining), 0)
+        path = remaining[0]
+        if sizes[path] <= cap:
+            share[path] = sizes[path]
+            available -= sizes[path]
+            remaining.pop(0)
+        else:
+            for path in remaining:
+                share[path] = cap
+            break
+    return _replace_leaves(data, {path: truncate_text(texts[path], share[path])
+                                  for path in texts if sizes[path] > share[path]})
+
+
+def split_by_budget(items: Dict, overhead_tokens: int, budget: int = None) -> List[Dict]:
+    """把 {股票代码: 数据} 按token预算顺序拆成若干块
+
+    每块的 overhead_tokens(提示词其余部分)加上各项数据的估算token数不超过 budget;
+    单项数据本身超出预算时单独成块.
+    """
+    budget = budget or LLM_PROMPT_TOKEN_BUDGET
+    chunks, chunk, used = [], {}, overhead_tokens
+    for key, value in items.items():
+        size = estimate_tokens(compact_json({key: value}))
+        if chunk and used + size > budget:
+            chunks.append(chunk)
+            chunk, used = {}, overhead_tokens
+        chunk[key] = value
+        used += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _merge_texts(texts: list) -> str:
+    """合并多个 '结果:[...] 原因:...' 格式的回答"""
+    scores, reasons = [], []
+    for text in texts:
+        match = _SCORE_LIST.search(text) if isinstance(text, str) else None
+        if match is None:
+            return "\n\n".join(str(text) for text in texts)
+        scores += [item.strip() for item in re.split(r"[,，]", match.group(1)) if item.strip()]
+        rest = text[match.end():]
+        reasons.append(_REASON_MARK.split(rest, maxsplit=1)[-1].strip())
+    return f"结果:[{','.join(scores)}]\n原因:" + "\n\n".join(reason for reason in reasons if reason)
+
+
+def merge_results(results: list, chunks: list = None):
+    """合并各块的分析结果;全部失败时返回0.0
+
+    同名字段中各块的 '结果:[...]' 合并为一个分数列表,'原因:' 按块顺序合并为一段;
+    不是这种格式的文本按块顺序拼接.
+
+    部分块失败时,结果中的 "missing_tickers" 列出这些块中没有得到分析的股票代码,
+    以免下游把部分结果当作全部股票的分析.
+    """
+    valid = [result for result in results if isinstance(result, dict)]
+    if not valid:
+        return 0.0
+    merged = {}
+    for key in dict.fromkeys(key for result in valid for key in result):
+        values = [result[key] for result in valid if key in result]
+        merged[key] = values[0] if len(values) == 1 else _merge_texts(values)
+    missing = [key for chunk, result in zip(chunks or [], results)
+               if not isinstance(result, dict) for key in chunk]
+    if missing:
+        merged["missing_tickers"] = missing
+    return merged
+
+
+def run_chunked(chunks: list, analyze: Callable) -> list:
+    """对每块调用 analyze;多于一块时并行发出请求"""
+    if len(chunks) <= 1:
+        return [analyze(chunk) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        return list(executor.map(analyze, chunks))
+
+
+async def run_chunked_async(chunks: list, analyze) -> list:
+    """run_chunked 的异步版本,analyze 为协程函数"""
+    return list(await asyncio.gather(*[analyze(chunk) for chunk in chunks]))
+
+
+def split_for_messages(items: Dict, build_messages: Callable, budget: int = None) -> List[Dict]:
+    """按 build_messages(部分数据) 生成的提示词大小拆分 items,见 split_by_budget"""
+    return split_by_budget(items, estimate_message_tokens(build_messages({})), budget)
@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+
+import pandas as pd
+
+# 设置后 Backtester.analyze_performance 把报告写入该目录,不再弹出图表窗口
+BACKTEST_REPORT_DIR = os.getenv("BACKTEST_REPORT_DIR", "")
+
+_fonts_configured = False
+
+
+def _configure_fonts():
+    """根据操作系统配置中文字体;在第一次绘图时才导入 matplotlib"""
+    global _fonts_configured
+    import matplotlib
+    if _fonts_configured:
+        return matplotlib
+
+    if sys.platform.startswith('win'):
+        # Windows系统
+        matplotlib.rc('font', family='Microsoft YaHei')
+    elif sys.platform.startswith('linux'):
+        # Linux系统
+        matplotlib.rc('font', family='WenQuanYi Micro Hei')
+    else:
+        # macOS系统
+        matplotlib.rc('font', family='PingFang SC')
+
+    # 用来正常显示负号
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    _fonts_configured = True
+    return matplotlib
+
+
+def _draw_performance(fig, performance_df: pd.DataFrame, initial_capital: float, annotate: bool):
+    """在 fig 上绘制组合价值和累计收益率两个子图"""
+    value_k = performance_df["Portfolio Value"] / 1000
+    cumulative_return = (performance_df["Portfolio Value"] / initial_capital - 1) * 100
+
+    ax1, ax2 = fig.subplots(2, 1, height_ratios=[1, 1])
+    fig.suptitle("回测结果分析", fontsize=12)
+
+    # 数据点较多时不画标记
+    marker = 'o' if len(performance_df) <= 120 else None
+    ax1.plot(performance_df.index, value_k, label="组合价值", marker=marker)
+    ax1.set_ylabel("组合价值 (千元)")
+    ax1.set_title("组合价值变化")
+    ax1.grid(True)
+
+    ax2.plot(performance_df.index, cumulative_return, label="累计收益率", color='green', marker=marker)
+    ax2.set_ylabel("累计收益率 (%)")
+    ax2.set_title("累计收益率变化")
+    ax2.set_xlabel("日期")
+    ax2.grid(True)
+
+    # 每个数据点一个文字标签,数据点多时开销大,默认不画
+    if annotate:
+        for x, y in zip(performance_df.index, value_k):
+            ax1.annotate(f'{y:.1f}K', (x, y), textcoords="offset points",
+                         xytext=(0, 10), ha='center', fontsize=8)
+        for x, y in zip(performance_df.index, cumulative_return):
+            ax2.annotate(f'{y:.2f}%', (x, y), textcoords="offset points",
+                         xytext=(0, 10), ha='center', fontsize=8)
+
+    fig.tight_layout()
+
+
+def save_performance_chart(performance_df: pd.DataFrame, initial_capital: float, path: str,
+                           annotate: bool = False):
+    """用 Agg 后端把回测图表写入PNG文件,不依赖显示设备,也不影响 pyplot 的全局状态"""
+    _configure_fonts()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(12, 10))
+    FigureCanvasAgg(fig)
+    _draw_performance(fig, performance_df, initial_capital, annotate)
+    fig.savefig(path, dpi=100)
+
+
+def show_performance_chart(performance_df: pd.DataFrame, initial_capital: float,
+                           annotate: bool = False):
+    """在窗口中显示回测图表(阻塞直到窗口关闭)"""
+    _configure_fonts()
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(12, 10))
+    _draw_performance(fig, performance_df, initial_capital, annotate)
+    plt.show()
+
+
+def write_backtest_report(performance_df: pd.DataFrame, metrics: dict, initial_capital: float,
+                          report_dir: str, name: str, plot: bool = True,
+                          annotate: bool = False) -> dict:
+    """把回测结果写入 report_dir
+
+    - {name}_metrics.json: 回测指标
+    - {name}_equity.csv: 每日组合价值、收益率和累计收益率
+    - {name}_equity.png: 组合价值和累计收益率图表(plot=False 时不生成)
+
+    Returns:
+        {"metrics": 路径, "equity": 路径, "chart": 路径或None}
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    paths = {
+        "metrics": os.path.join(report_dir, f"{name}_metrics.json"),
+        "equity": os.path.join(report_dir, f"{name}_equity.csv"),
+        "chart": os.path.join(report_dir, f"{name}_equity.png") if plot else None,
+    }
+
+    with open(paths["metrics"], "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2, default=float)
+
+    equity = performance_df.copy()
+    equity["Cumulative Return"] = (equity["Portfolio Value"] / initial_capital - 1) * 100
+    equity.to_csv(paths["equity"], encoding="utf-8")
+
+    if plot:
+        save_performance_chart(performance_df, initial_capital, paths["chart"], annotate)
+    return paths
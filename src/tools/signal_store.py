@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from src.utils.sqlite_cache import make_cache_key
+
+# 回测信号库,保存每个交易日的智能体决策
+SIGNAL_STORE_PATH = os.getenv(
+    "SIGNAL_STORE_PATH", os.path.join("src", "data", "signal_store.sqlite"))
+
+
+def signal_config_hash(**config) -> str:
+    """影响智能体决策的配置(模型、采样参数、新闻数量等)的哈希,取前16位"""
+    return make_cache_key("signals", config)[:16]
+
+
+class SignalStore:
+    """按 (股票代码, 日期, 配置哈希) 保存智能体决策的SQLite信号库
+
+    第一阶段逐日运行智能体并写入信号,第二阶段只读取信号回放交易.
+
+    Args:
+        path: SQLite文件路径
+    """
+
+    def __init__(self, path: str = SIGNAL_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS signals (
+                    ticker TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    config_hash TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    portfolio TEXT,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (ticker, date, config_hash)
+                )""")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, ticker: str, date: str, config_hash: str) -> Optional[Dict]:
+        """读取某日的智能体输出,不存在时返回None"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT output FROM signals WHERE ticker = ? AND date = ? AND config_hash = ?",
+                    (ticker, date, config_hash)).fetchone()
+            finally:
+                conn.close()
+        return json.loads(row[0]) if row else None
+
+    def put(self, ticker: str, date: str, config_hash: str, output: Dict,
+            portfolio: Optional[Dict] = None):
+        """写入某日的智能体输出及决策时的持仓"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO signals VALUES (?, ?, ?, ?, ?, ?)",
+                    (ticker, date, config_hash, json.dumps(output, ensure_ascii=False, default=str),
+                     json.dumps(portfolio, default=float) if portfolio is not None else None,
+                     time.time()))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def load_range(self, ticker: str, config_hash: str,
+                   start_date: str, end_date: str) -> Dict[str, Dict]:
+        """一次读取区间内全部信号,返回 {日期: 智能体输出}"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT date, output FROM signals WHERE ticker = ? AND config_hash = ? "
+                    "AND date >= ? AND date <= ? ORDER BY date",
+                    (ticker, config_hash, start_date, end_date)).fetchall()
+            finally:
+                conn.close()
+        return {date: json.loads(output) for date, output in rows}
@@ -1,7 +1,8 @@
 import os
 import json
 from datetime import datetime
-from src.tools.openrouter_config import get_chat_completion, logger as api_logger
+from src.tools.openrouter_config import get_chat_completion, get_chat_completion_async, logger as api_logger
+from src.tools.prompt_packer import compact_json, merge_results, run_chunked, run_chunked_async, split_for_messages
 import time
 import pandas as pd
 import re
@@ -18,6 +19,29 @@ def get_tech_analyze(end_date:str,stock_tech_dict: dict,signal_text: str,strateg
     """
     if not stock_tech_dict:
         return 0.0
+
+    def analyze(chunk):
+        return parse_tech_result(get_chat_completion(build_tech_messages(end_date, chunk, signal_text, strategy_text)))
+
+    # 超出token预算时按股票分块并行请求,再合并各块的结果
+    chunks = split_for_messages(stock_tech_dict, lambda chunk: build_tech_messages(end_date, chunk, signal_text, strategy_text))
+    return merge_results(run_chunked(chunks, analyze), chunks)
+
+
+async def get_tech_analyze_async(end_date:str,stock_tech_dict: dict,signal_text: str,strategy_text:str) -> float:
+    """get_tech_analyze 的异步版本,与其他分析师的LLM请求并发进行"""
+    if not stock_tech_dict:
+        return 0.0
+
+    async def analyze(chunk):
+        return parse_tech_result(await get_chat_completion_async(build_tech_messages(end_date, chunk, signal_text, strategy_text)))
+
+    chunks = split_for_messages(stock_tech_dict, lambda chunk: build_tech_messages(end_date, chunk, signal_text, strategy_text))
+    return merge_results(await run_chunked_async(chunks, analyze), chunks)
+
+
+def build_tech_messages(end_date:str,stock_tech_dict: dict,signal_text: str,strategy_text:str) -> list:
+    """构造技术分析的对话消息"""
     
     stock_list=stock_tech_dict.keys()
 
@@ -50,7 +74,7 @@ def get_tech_analyze(end_date:str,stock_tech_dict: dict,signal_text: str,strateg
     user_message = {
         "role": "user", #prompt
         "content": f"""
-        分析以下A股上市公司{stock_list}相关新闻,对比并计算每只的股票的技术指标:\n\n{stock_tech_dict}\n\n
+        分析以下A股上市公司{stock_list}相关新闻,对比并计算每只的股票的技术指标:\n\n{compact_json(stock_tech_dict)}\n\n
         使用股票技术指标、交易理论等专业知识,避免模糊的回答，用词专业.
         首先返回一列对技术指标综合打分的数字,范围是-1到1,越接近1证明上涨概率越大,记作'结果:[股票列表:分数]',例如'结果:[股票代码1:0.8,股票代码2:-0.5]'.
         之后,结合你所获得的技术指标和相关解释,用1000字分点列出做出该判断的理由,要求有理有据且表述明确,不要用模糊的词汇,
@@ -58,9 +82,12 @@ def get_tech_analyze(end_date:str,stock_tech_dict: dict,signal_text: str,strateg
         """
     }
 
+    return [system_message, user_message]
+
+
+def parse_tech_result(result):
+    """从LLM原始响应中提取技术分析内容"""
     try:
-        # 获取技术分析结果
-        result = get_chat_completion([system_message, user_message])
         if result is None:
             print("Error: PI error occurred, LLM returned None")
             return 0.0
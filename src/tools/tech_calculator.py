@@ -271,10 +271,8 @@ def cal_signals(prices_df,macd_line, signal_line, rsi, upper_band, lower_band, o
     #price drop signal
     if price_drop < -0.05 and rsi.iloc[-1] < 40:  # 5% drop and RSI below 40
         signals.append('bullish')
-        confidence += 0.2  # Increase confidence for oversold conditions
     elif price_drop < -0.03 and rsi.iloc[-1] < 45:  # 3% drop and RSI below 45
         signals.append('bullish')
-        confidence += 0.1
        
     return signals
 
@@ -497,7 +495,8 @@ def calculate_hurst_exponent(price_series: pd.Series, max_lag: int = 10) -> floa
     """
     try:
         # 使用对数收益率而不是价格
-        returns = np.log(price_series / price_series.shift(1)).dropna()
+        # 使用数组按位置错位相减,Series相减会按索引对齐而得到全零
+        returns = np.log(price_series / price_series.shift(1)).dropna().values
 
         # 如果数据不足,返回0.5(随机游走)
         if len(returns) < max_lag * 2:
@@ -523,14 +522,154 @@ def calculate_hurst_exponent(price_series: pd.Series, max_lag: int = 10) -> floa
         return 0.5
 
 
+def calculate_rolling_hurst(
+    log_returns: pd.Series,
+    window: int = 120,
+    min_periods: int = 60,
+    max_lag: int = 11
+) -> pd.Series:
+    """
+    Vectorized rolling Hurst exponent, equivalent to applying the per-window
+    estimator (dropna -> log ratio of consecutive values -> mean rolling std
+    for lags 2..max_lag-1 -> log-log regression slope / 2) with
+    rolling(window, min_periods).apply, but computed for all windows at once.
+
+    Every statistic needed by a window only depends on runs of consecutive
+    valid values, so the rolling std for each lag is computed once on the
+    whole series with strided window views, averaged per window through
+    cumulative sums, and the regression is solved in closed form for all
+    windows together.
+
+    Args:
+        log_returns: Log return series (may contain NaN)
+        window: Rolling window size
+        min_periods: Minimum number of valid observations per window
+        max_lag: Upper bound (exclusive) of the lag range
+
+    Returns:
+        pd.Series: Hurst exponent per row, NaN where it cannot be estimated
+    """
+    values = np.asarray(log_returns, dtype=float)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if n == 0:
+        return pd.Series(result, index=log_returns.index)
+
+    positions = np.arange(n)
+    window_starts = positions - window + 1
+
+    # Windows evaluated by rolling().apply (enough valid observations)
+    valid = ~np.isnan(values)
+    valid_count = np.concatenate(([0], np.cumsum(valid)))
+    counts = valid_count[positions + 1] - valid_count[np.maximum(window_starts, 0)]
+
+    # Log ratio of consecutive valid values; NaN results are dropped like
+    # dropna() in the per-window estimator, +/-inf values are kept
+    y = values[valid]
+    y_pos = positions[valid]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio_log = np.log(y[1:] / y[:-1])
+    keep = ~np.isnan(ratio_log)
+    z = ratio_log[keep]
+    z_first = y_pos[:-1][keep]  # position of the earlier value of each pair
+    z_last = y_pos[1:][keep]    # position of the later value of each pair
+
+    # Range [a, b) of z entries that fall inside each window
+    a = np.searchsorted(z_first, window_starts, side='left')
+    b = np.searchsorted(z_last, positions, side='right')
+    m = np.maximum(b - a, 0)
+
+    lags = np.arange(2, max_lag)
+    tau = np.full((n, len(lags)), np.nan)
+    lag_used = np.zeros((n, len(lags)), dtype=bool)
+    lag_missing = np.zeros(n, dtype=bool)
+    lag_limit = np.minimum(max_lag, m // 4)
+
+    for k, lag in enumerate(lags):
+        used = lag < lag_limit
+        lag_used[:, k] = used
+        if len(z) < lag:
+            lag_missing |= used
+            continue
+
+        # Rolling std (ddof=1) of every run of `lag` consecutive z values
+        with np.errstate(invalid='ignore'):
+            stds = np.lib.stride_tricks.sliding_window_view(z, lag).std(axis=1, ddof=1)
+        finite = np.isfinite(stds)
+        std_sum = np.concatenate(([0.0], np.cumsum(np.where(finite, stds, 0.0))))
+        std_count = np.concatenate(([0], np.cumsum(finite)))
+
+        # Rolling windows of this lag inside [a, b) start at j in [a, b - lag]
+        lo = np.minimum(a, len(stds))
+        hi = np.clip(b - lag + 1, lo, len(stds))
+        window_count = std_count[hi] - std_count[lo]
+        window_sum = std_sum[hi] - std_sum[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tau[:, k] = window_sum / window_count
+
+        # A lag without any valid std makes the per-window regression fail
+        lag_missing |= used & (window_count == 0)
+
+    # Batched least squares of log(tau) on log(lag) over the used lags
+    x = np.log(lags.astype(float))
+    lag_total = lag_used.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_tau = np.log(tau)
+        x_mean = (lag_used * x).sum(axis=1) / lag_total
+        y_mean = np.where(lag_used, log_tau, 0.0).sum(axis=1) / lag_total
+        dx = np.where(lag_used, x - x_mean[:, None], 0.0)
+        dy = np.where(lag_used, log_tau - y_mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    hurst = slope / 2.0
+
+    ok = (
+        (counts >= min_periods)
+        & (counts >= 30)
+        & (m >= 30)
+        & (lag_total >= 3)
+        & ~lag_missing
+        & np.isfinite(hurst)
+    )
+    result[ok] = hurst[ok]
+    return pd.Series(result, index=log_returns.index)
+
+
+def calculate_obv_array(close, volume) -> np.ndarray:
+    """
+    On-Balance Volume along axis 0 as a single cumulative sum of
+    sign(close diff) * volume. Accepts 1-D series or 2-D (date x ticker)
+    arrays, so OBV for a whole universe comes from one call.
+
+    Args:
+        close: Close prices, shape (n,) or (n, tickers)
+        volume: Volumes with the same shape as close
+
+    Returns:
+        np.ndarray: OBV values with the same shape as close, starting at 0
+    """
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    obv = np.zeros(close.shape)
+    if len(close) < 2:
+        return obv
+
+    diff = np.diff(close, axis=0)
+    direction = (diff > 0).astype(float) - (diff < 0)
+    # Unchanged (or missing) closes carry the previous OBV forward
+    flows = np.where(direction != 0, direction * volume[1:], 0.0)
+    np.cumsum(flows, axis=0, out=obv[1:])
+    return obv
+
+
 def calculate_obv(prices_df: pd.DataFrame) -> pd.Series:
-    obv = [0]
-    for i in range(1, len(prices_df)):
-        if prices_df['close'].iloc[i] > prices_df['close'].iloc[i - 1]:
-            obv.append(obv[-1] + prices_df['volume'].iloc[i])
-        elif prices_df['close'].iloc[i] < prices_df['close'].iloc[i - 1]:
-            obv.append(obv[-1] - prices_df['volume'].iloc[i])
-        else:
-            obv.append(obv[-1])
-    prices_df['OBV'] = obv
-    return prices_df['OBV']
\ No newline at end of file
+    """
+    Calculate On-Balance Volume without modifying prices_df
+
+    Args:
+        prices_df: DataFrame with close and volume columns
+
+    Returns:
+        pd.Series: OBV values named 'OBV'
+    """
+    obv = calculate_obv_array(prices_df['close'], prices_df['volume'])
+    return pd.Series(obv, index=prices_df.index, name='OBV')
@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END, StateGraph
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.agents.state import AgentState, format_timing_report, get_messages, timed_node
+from src.utils.async_runner import run_sync
+
+NODE_NAMES = ["market_data_agent", "technical_analyst_agent", "fundamentals_agent",
+              "sentiment_agent", "valuation_agent", "researchers_agent", "debate_room_agent",
+              "risk_management_agent", "portfolio_management_agent"]
+ANALYSTS = NODE_NAMES[1:5]
+
+
+def make_node(name, copy_state):
+    """模拟节点:copy_state=True 时按旧写法返回完整的消息列表和数据字典"""
+    def node(state):
+        message = HumanMessage(content="x" * 2000, name=name)
+        if name == "researchers_agent":
+            get_messages(state, *ANALYSTS)
+        if copy_state:
+            return {"messages": state["messages"] + [message],
+                    "data": {**state["data"], name: {"reasoning": "x"}}}
+        return {"messages": [message], "data": {name: {"reasoning": "x"}}}
+    return node
+
+
+def build_graph(copy_state=False):
+    workflow = StateGraph(AgentState)
+    for name in NODE_NAMES:
+        workflow.add_node(name, make_node(name, copy_state))
+    workflow.set_entry_point("market_data_agent")
+    for analyst in ANALYSTS:
+        workflow.add_edge("market_data_agent", analyst)
+        workflow.add_edge(analyst, "researchers_agent")
+    for upstream, downstream in zip(NODE_NAMES[5:], NODE_NAMES[6:]):
+        workflow.add_edge(upstream, downstream)
+    workflow.add_edge(NODE_NAMES[-1], END)
+    return workflow.compile()
+
+
+def initial_state(prices=None):
+    return {
+        "messages": [HumanMessage(content="Make a trading decision based on the provided data.")],
+        "data": {"ticker_list": ["600519"], "prices": prices or {}},
+        "metadata": {"show_reasoning": False},
+    }
+
+
+def test_messages_appended_once():
+    """每个节点的消息只出现一次,数据字典按增量合并"""
+    state = build_graph().invoke(initial_state())
+    names = [msg.name for msg in state["messages"]]
+    assert names.count(None) == 1
+    assert sorted(n for n in names if n) == sorted(NODE_NAMES)
+    assert state["data"]["ticker_list"] == ["600519"]
+    assert all(name in state["data"] for name in NODE_NAMES)
+
+    debate, = get_messages(state, "debate_room_agent")
+    assert debate.name == "debate_room_agent"
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_timings_merged_across_parallel_nodes(asynchronous):
+    """同步和异步节点的耗时都写入 timings,并行的分析师节点按阶段汇总"""
+    def make_timed(name):
+        if name in ANALYSTS and asynchronous:
+            async def node(state):
+                await asyncio.sleep(0.05)
+                return {"messages": [HumanMessage(content="x", name=name)]}
+        elif name in ANALYSTS:
+            def node(state):
+                time.sleep(0.05)
+                return {"messages": [HumanMessage(content="x", name=name)]}
+        else:
+            def node(state):
+                return {"messages": [HumanMessage(content="x", name=name)]}
+        return timed_node(name, node)
+
+    workflow = StateGraph(AgentState)
+    for name in NODE_NAMES:
+        workflow.add_node(name, make_timed(name))
+    workflow.set_entry_point("market_data_agent")
+    for analyst in ANALYSTS:
+        workflow.add_edge("market_data_agent", analyst)
+        workflow.add_edge(analyst, "researchers_agent")
+    for upstream, downstream in zip(NODE_NAMES[5:], NODE_NAMES[6:]):
+        workflow.add_edge(upstream, downstream)
+    workflow.add_edge(NODE_NAMES[-1], END)
+
+    app = workflow.compile()
+    state = run_sync(app.ainvoke(initial_state())) if asynchronous else app.invoke(initial_state())
+    timings = state["timings"]
+    assert sorted(timings) == sorted(NODE_NAMES)
+    assert all(timings[name]["duration"] >= 0.04 for name in ANALYSTS)
+    # 四个分析师并行执行
+    assert max(timings[name]["start"] for name in ANALYSTS) < \
+        min(timings[name]["end"] for name in ANALYSTS)
+
+    report = format_timing_report(timings)
+    stage = next(line for line in report.splitlines() if line.startswith("并行阶段"))
+    assert sorted(stage.split(":")[0][len("并行阶段 "):].split(", ")) == sorted(ANALYSTS)
+
+
+def test_timing_report_format():
+    timings = {
+        "market_data_agent": {"start": 10.0, "end": 11.0, "duration": 1.0},
+        "technical_analyst_agent": {"start": 11.0, "end": 14.0, "duration": 3.0},
+        "sentiment_agent": {"start": 11.5, "end": 13.0, "duration": 1.5},
+        "portfolio_management_agent": {"start": 14.0, "end": 14.5, "duration": 0.5},
+    }
+    assert format_timing_report(timings).splitlines() == [
+        "节点耗时(秒):",
+        f"{'节点':<30}{'开始':>8}{'结束':>8}{'耗时':>8}",
+        f"{'market_data_agent':<30}{'0.00':>8}{'1.00':>8}{'1.00':>8}",
+        f"{'technical_analyst_agent':<30}{'1.00':>8}{'4.00':>8}{'3.00':>8}",
+        f"{'sentiment_agent':<30}{'1.50':>8}{'3.00':>8}{'1.50':>8}",
+        f"{'portfolio_management_agent':<30}{'4.00':>8}{'4.50':>8}{'0.50':>8}",
+        "并行阶段 technical_analyst_agent, sentiment_agent: 耗时 3.00 (串行合计 4.50), "
+        "最慢节点 technical_analyst_agent 3.00",
+        "总耗时: 4.50",
+    ]
+    assert format_timing_report({}) == "无节点耗时记录"
+
+
+def run_backtest(app, days, prices):
+    """模拟回测:每个交易日运行一次工作流,返回耗时和内存峰值"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    total_messages = 0
+    for _ in range(days):
+        state = app.invoke(initial_state(prices))
+        total_messages += len(state["messages"])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, total_messages
+
+
+if __name__ == "__main__":
+    days = 250
+    dates = pd.date_range("2023-01-01", periods=250)
+    prices = {f"{600000 + i}": pd.DataFrame(np.random.rand(250, 5), index=dates,
+                                           columns=["open", "high", "low", "close", "volume"])
+              for i in range(20)}
+
+    for label, copy_state in [("整表返回", True), ("增量返回", False)]:
+        elapsed, peak, total = run_backtest(build_graph(copy_state), days, prices)
+        print(f"{label}: {days}个交易日 耗时 {elapsed:.2f}s, 内存峰值 {peak / 1e6:.1f}MB, "
+              f"每日消息数 {total // days}")
@@ -0,0 +1,131 @@
+import os
+
+import pandas as pd
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END, StateGraph
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.agents.state import AgentState, FailedUpdate, analysis_failed
+from src.utils import checkpoint
+from src.utils.checkpoint import SQLiteSaver, memoized_node, run_thread_id
+from src.utils.sqlite_cache import SQLiteCache
+from src.utils.async_runner import run_sync
+
+
+def build_app(saver, calls, fail_at=None, memo=False):
+    """market_data -> analyst -> decision 三个节点的简化工作流"""
+    def market_data(state):
+        calls.append("market_data")
+        return {"data": {"prices": pd.DataFrame({"close": [1.0, 2.0]})}}
+
+    async def analyst(state):
+        calls.append("analyst")
+        if fail_at == "analyst":
+            # LLM请求失败时节点返回默认结论,工作流照常继续
+            return FailedUpdate({"messages": [HumanMessage(content="neutral", name="analyst")]})
+        return {"messages": [HumanMessage(content="bullish", name="analyst")]}
+
+    def decision(state):
+        calls.append("decision")
+        if fail_at == "decision":
+            raise RuntimeError("LLM error")
+        close = state["data"]["prices"]["close"].iloc[-1]
+        return {"messages": [HumanMessage(content=f"buy at {close}", name="decision")]}
+
+    workflow = StateGraph(AgentState)
+    for name, node in [("market_data", market_data), ("analyst", analyst), ("decision", decision)]:
+        workflow.add_node(name, memoized_node(name, node) if memo else node)
+    workflow.set_entry_point("market_data")
+    workflow.add_edge("market_data", "analyst")
+    workflow.add_edge("analyst", "decision")
+    workflow.add_edge("decision", END)
+    return workflow.compile(checkpointer=saver)
+
+
+def initial_state():
+    return {
+        "messages": [HumanMessage(content="start")],
+        "data": {"ticker_list": ["600519"], "end_date": "2024-01-02"},
+        "metadata": {},
+    }
+
+
+def test_resume_after_failure(tmp_path):
+    """节点失败后用新的 checkpointer 实例继续,已完成的节点不再运行"""
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": run_thread_id(initial_state()["data"])}}
+    calls = []
+
+    with pytest.raises(RuntimeError):
+        run_sync(build_app(SQLiteSaver(path), calls, fail_at="decision").ainvoke(initial_state(), config))
+    assert calls == ["market_data", "analyst", "decision"]
+
+    calls.clear()
+    app = build_app(SQLiteSaver(path), calls)
+    assert run_sync(app.aget_state(config)).next == ("decision",)
+    state = run_sync(app.ainvoke(None, config))
+    assert calls == ["decision"]
+    assert state["messages"][-1].content == "buy at 2.0"
+    assert [msg.name for msg in state["messages"]] == [None, "analyst", "decision"]
+
+
+def test_memoized_nodes_skip_on_rerun(tmp_path, monkeypatch):
+    """相同输入的节点直接复用结果,输入变化时重新运行"""
+    monkeypatch.setattr(checkpoint, "node_memo", SQLiteCache(str(tmp_path / "memo.sqlite")))
+    calls = []
+
+    for thread in ["first", "second"]:
+        app = build_app(SQLiteSaver(str(tmp_path / "checkpoints.sqlite")), calls, memo=True)
+        state = run_sync(app.ainvoke(initial_state(), {"configurable": {"thread_id": thread}}))
+        assert state["messages"][-1].content == "buy at 2.0"
+    assert calls == ["market_data", "analyst", "decision"]
+
+    changed = initial_state()
+    changed["data"]["end_date"] = "2024-01-03"
+    run_sync(app.ainvoke(changed, {"configurable": {"thread_id": "third"}}))
+    assert calls[3:] == ["market_data", "analyst", "decision"]
+
+
+def test_sentiment_not_memoized(tmp_path, monkeypatch):
+    """情感分析依赖不断新增的新闻,每次运行都重新执行"""
+    monkeypatch.setattr(checkpoint, "node_memo", SQLiteCache(str(tmp_path / "memo.sqlite")))
+    calls = []
+
+    def sentiment_agent(state):
+        calls.append(len(calls))
+        return {"messages": [HumanMessage(content=f"news {len(calls)}", name="sentiment_agent")]}
+
+    node = memoized_node("sentiment_agent", sentiment_agent)
+    assert node is sentiment_agent
+    for _ in range(2):
+        node(initial_state())
+    assert calls == [0, 1]
+
+
+def test_failed_updates_not_memoized(tmp_path, monkeypatch):
+    """节点失败时返回的默认结果不缓存,再次运行时重新执行并缓存成功的结果"""
+    monkeypatch.setattr(checkpoint, "node_memo", SQLiteCache(str(tmp_path / "memo.sqlite")))
+    calls = []
+    saver = SQLiteSaver(str(tmp_path / "checkpoints.sqlite"))
+
+    app = build_app(saver, calls, fail_at="analyst", memo=True)
+    state = run_sync(app.ainvoke(initial_state(), {"configurable": {"thread_id": "first"}}))
+    assert [msg.content for msg in state["messages"]][1] == "neutral"
+    assert calls == ["market_data", "analyst", "decision"]
+
+    app = build_app(saver, calls, memo=True)
+    state = run_sync(app.ainvoke(initial_state(), {"configurable": {"thread_id": "second"}}))
+    assert [msg.content for msg in state["messages"]][1] == "bullish"
+    assert calls[3:] == ["analyst", "decision"]
+
+    run_sync(app.ainvoke(initial_state(), {"configurable": {"thread_id": "third"}}))
+    assert calls[5:] == []
+
+
+def test_analysis_failed():
+    assert analysis_failed(0.0) and analysis_failed(None)
+    assert analysis_failed({"technical_reason": "x", "missing_tickers": ["600519"]})
+    assert not analysis_failed({"technical_reason": "x"})
+    assert not analysis_failed("多方观点")
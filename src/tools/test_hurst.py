@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.tools.tech_calculator import calculate_rolling_hurst
+
+
+def reference_hurst(series):
+    """逐窗口计算Hurst指数的原始实现(rolling().apply使用),作为对照"""
+    try:
+        series = series.dropna()
+        if len(series) < 30:
+            return np.nan
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_returns = np.log(series / series.shift(1)).dropna()
+        if len(log_returns) < 30:
+            return np.nan
+
+        lags = range(2, min(11, len(log_returns) // 4))
+        tau = []
+        for lag in lags:
+            std = log_returns.rolling(window=lag).std().dropna()
+            if len(std) > 0:
+                tau.append(np.mean(std))
+
+        if len(tau) < 3:
+            return np.nan
+
+        reg = np.polyfit(np.log(list(lags)), np.log(tau), 1)
+        hurst = reg[0] / 2.0
+        if np.isnan(hurst) or np.isinf(hurst):
+            return np.nan
+        return hurst
+
+    except Exception:
+        return np.nan
+
+
+def generate_log_returns(days, seed=0, tick=True):
+    """生成模拟收盘价的对数收益率,tick=True时按分价位取整(会出现零收益)"""
+    rng = np.random.default_rng(seed)
+    close = pd.Series(5 * np.exp(np.cumsum(rng.normal(0, 0.02, days))))
+    if tick:
+        close = close.round(2)
+    return np.log(close / close.shift(1))
+
+
+def test_rolling_hurst_matches_reference():
+    """向量化实现与逐窗口实现结果一致"""
+    for seed, tick in [(0, False), (1, True)]:
+        log_returns = generate_log_returns(400, seed=seed, tick=tick)
+        expected = log_returns.rolling(
+            window=120, min_periods=60).apply(reference_hurst)
+        actual = calculate_rolling_hurst(log_returns, window=120, min_periods=60)
+
+        assert (expected.isna() == actual.isna()).all()
+        np.testing.assert_allclose(
+            actual.dropna().values, expected.dropna().values, rtol=1e-9, atol=1e-12)
+
+
+def benchmark_rolling_hurst():
+    """对比2年和10年历史数据上两种实现的耗时"""
+    for label, days in [("2年", 2 * 252), ("10年", 10 * 252)]:
+        log_returns = generate_log_returns(days)
+
+        start = time.perf_counter()
+        log_returns.rolling(window=120, min_periods=60).apply(reference_hurst)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        calculate_rolling_hurst(log_returns, window=120, min_periods=60)
+        vectorized_time = time.perf_counter() - start
+
+        print(f"{label}({days}个交易日): 逐窗口 {reference_time:.3f}s, "
+              f"向量化 {vectorized_time * 1000:.2f}ms, "
+              f"加速 {reference_time / vectorized_time:.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark_rolling_hurst()
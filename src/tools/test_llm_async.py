@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import asyncio
+
+import httpx
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.tools import openrouter_config
+from src.utils.sqlite_cache import SQLiteCache
+
+
+def make_client(delay, active):
+    """模拟LLM接口:每个请求耗时delay秒,并记录同时进行的请求数"""
+    async def handler(request):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(delay)
+        active["now"] -= 1
+        body = {"choices": [{"message": {"content": json.loads(request.content)["messages"][1]["content"]}}]}
+        return httpx.Response(200, json=body)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def run_completions(count, limit, delay):
+    active = {"now": 0, "max": 0}
+    loop = asyncio.get_running_loop()
+    openrouter_config._async_clients[loop] = (make_client(delay, active), asyncio.Semaphore(limit))
+    messages = [[{"role": "user", "content": f"question {i}"}] for i in range(count)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(openrouter_config.get_chat_completion_async(m) for m in messages))
+    elapsed = time.perf_counter() - start
+
+    await openrouter_config.aclose_async_client()
+    return results, elapsed, active["max"]
+
+
+def test_async_completions_overlap(monkeypatch, tmp_path):
+    """多个请求并发进行,总耗时接近单个请求"""
+    monkeypatch.setattr(openrouter_config, "llm_cache", SQLiteCache(str(tmp_path / "llm.sqlite")))
+    monkeypatch.setattr(openrouter_config, "base_url", "http://llm.test/v1/chat/completions")
+    results, elapsed, max_active = asyncio.run(run_completions(4, limit=4, delay=0.2))
+
+    assert [json.loads(r)["choices"][0]["message"]["content"] for r in results] == [
+        f"User: question {i}" for i in range(4)]
+    assert max_active == 4
+    assert elapsed < 0.5
+
+
+def test_async_concurrency_cap(monkeypatch, tmp_path):
+    """并发请求数不超过上限"""
+    monkeypatch.setattr(openrouter_config, "llm_cache", SQLiteCache(str(tmp_path / "llm.sqlite")))
+    monkeypatch.setattr(openrouter_config, "base_url", "http://llm.test/v1/chat/completions")
+    _, elapsed, max_active = asyncio.run(run_completions(4, limit=2, delay=0.2))
+
+    assert max_active == 2
+    assert elapsed >= 0.4
+
+
+def researcher_state():
+    from langchain_core.messages import HumanMessage
+    names = ["technical_analyst_agent", "fundamentals_agent", "sentiment_agent", "valuation_agent"]
+    return {
+        "messages": [HumanMessage(content=json.dumps({"signal": name}), name=name) for name in names],
+        "data": {"end_date": "2024-01-02", "ticker_list": ["600519"]},
+        "metadata": {"show_reasoning": False},
+    }
+
+
+def test_researchers_run_concurrently(monkeypatch):
+    """多空研究员的请求并发进行,其中一方超时时被取消"""
+    from src.agents import researchers
+    cancelled = []
+
+    def fake_analyze(delay, text):
+        async def analyze(end_date, stock_list, reasoning_dict):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(text)
+                raise
+            return text
+        return analyze
+
+    monkeypatch.setattr(researchers, "get_bullish_analyze_async", fake_analyze(0.2, "bull"))
+    monkeypatch.setattr(researchers, "get_bearish_analyze_async", fake_analyze(0.2, "bear"))
+    start = time.perf_counter()
+    result = asyncio.run(researchers.researchers_agent_async(researcher_state()))
+    assert time.perf_counter() - start < 0.35
+    bull, bear = [json.loads(m.content) for m in result["messages"]]
+    assert bull["reasoning"].endswith("bull") and bear["reasoning"].endswith("bear")
+
+    monkeypatch.setattr(researchers, "RESEARCHER_TIMEOUT", 0.1)
+    monkeypatch.setattr(researchers, "get_bearish_analyze_async", fake_analyze(1.0, "bear"))
+    monkeypatch.setattr(researchers, "get_bullish_analyze_async", fake_analyze(0.0, "bull"))
+    start = time.perf_counter()
+    result = asyncio.run(researchers.researchers_agent_async(researcher_state()))
+    assert time.perf_counter() - start < 0.5
+    bull, bear = [json.loads(m.content) for m in result["messages"]]
+    assert bull["reasoning"].endswith("bull")
+    assert bear["reasoning"].endswith(researchers.TIMEOUT_REASONING)
+    assert cancelled == ["bear"]
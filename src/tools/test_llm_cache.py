@@ -0,0 +1,67 @@
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.tools import openrouter_config
+from src.utils.sqlite_cache import SQLiteCache
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    """过期条目失效,超出条目数时淘汰最久未访问的条目"""
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), ttl=0.2, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    time.sleep(0.01)
+    assert cache.get("a") == "1"  # a 成为最近访问
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+    time.sleep(0.25)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_size_limit(tmp_path):
+    """总字节数超过上限时淘汰旧条目"""
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), max_bytes=25)
+    for key in "abc":
+        cache.set(key, "x" * 10)
+        time.sleep(0.01)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 20
+    assert cache.get("a") is None
+
+
+def test_chat_completion_uses_cache(tmp_path, monkeypatch):
+    """相同请求第二次直接命中缓存,修改采样参数或跳过缓存时重新请求"""
+    cache = SQLiteCache(str(tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(openrouter_config, "llm_cache", cache)
+    calls = []
+
+    def fake_generate(model, contents, config=None):
+        calls.append(contents)
+        return FakeResponse(f'{{"answer": {len(calls)}}}')
+
+    monkeypatch.setattr(openrouter_config, "generate_content_with_retry", fake_generate)
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hello"}]
+
+    first = openrouter_config.get_chat_completion(messages)
+    assert openrouter_config.get_chat_completion(messages) == first
+    assert len(calls) == 1
+
+    openrouter_config.get_chat_completion(messages, use_cache=False)
+    assert len(calls) == 2
+
+    monkeypatch.setitem(openrouter_config.SAMPLING_PARAMS, "temperature", 0.9)
+    openrouter_config.get_chat_completion(messages)
+    assert len(calls) == 3
+
+    stats = openrouter_config.get_llm_cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.tools import openrouter_config
+from src.utils.sqlite_cache import SQLiteCache
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """本地模拟的LLM接口,支持HTTP/1.1长连接"""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.delay)
+        content = {"choices": [{"message": {"content": body["messages"][1]["content"]}}]}
+        payload = json.dumps(content).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已超时断开
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def mock_llm(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockLLMHandler)
+    server.connections = 0
+    server.delay = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(openrouter_config, "base_url",
+                        f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions")
+    monkeypatch.setattr(openrouter_config, "llm_cache", SQLiteCache(str(tmp_path / "llm.sqlite")))
+    openrouter_config.close_http_client()
+    yield server
+
+    openrouter_config.close_http_client()
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_connection(mock_llm):
+    """连续请求复用同一个TCP连接"""
+    for i in range(5):
+        messages = [{"role": "user", "content": f"question {i}"}]
+        result = openrouter_config.get_chat_completion(messages, use_cache=False)
+        assert json.loads(result)["choices"][0]["message"]["content"] == f"User: question {i}"
+    assert mock_llm.connections == 1
+
+
+def test_read_timeout(mock_llm, monkeypatch):
+    """响应超过读取超时时间时放弃请求"""
+    monkeypatch.setattr(openrouter_config, "LLM_TIMEOUT", 0.2)
+    mock_llm.delay = 0.5
+
+    start = time.perf_counter()
+    result = openrouter_config.get_chat_completion(
+        [{"role": "user", "content": "slow"}], max_retries=1, use_cache=False)
+    assert result is None
+    assert time.perf_counter() - start < 0.5
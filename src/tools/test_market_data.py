@@ -0,0 +1,49 @@
+import os
+import time
+import threading
+
+import pandas as pd
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.agents import market_data
+from src.utils import throttle
+
+
+def test_parallel_fetch(monkeypatch):
+    """并发获取各股票数据:单项失败只影响该项,结果按 ticker_list 排序,主机并发数不超过上限"""
+    monkeypatch.setitem(throttle.HOST_CONCURRENCY, "eastmoney", 3)
+    monkeypatch.setattr(throttle, "_host_semaphores", {})
+
+    lock = threading.Lock()
+    active, peak = [0], [0]
+    symbols = [f"{i:06d}" for i in range(1, 9)]
+
+    def fetcher(key):
+        def fetch(ticker):
+            with throttle.host_slot("eastmoney"):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                # 排在前面的股票更晚完成
+                time.sleep(0.02 * (len(symbols) - symbols.index(ticker)))
+                with lock:
+                    active[0] -= 1
+            if key == "financial_metrics" and ticker == "000003":
+                raise ConnectionError("timeout")
+            if key == "prices":
+                return pd.DataFrame({"close": [float(ticker[-1])]})
+            return {"ticker": ticker}
+        return fetch
+
+    fetchers = {key: fetcher(key) for key in ["prices", "financial_metrics", "market_data"]}
+    failures = []
+    results = market_data.fetch_all_tickers(symbols, fetchers, max_workers=8, failures=failures)
+
+    assert all(list(values) == symbols for values in results.values())
+    assert results["financial_metrics"]["000003"] == {}
+    assert results["financial_metrics"]["000004"] == {"ticker": "000004"}
+    assert results["market_data"]["000003"] == {"ticker": "000003"}
+    assert results["prices"]["000003"]["close"].iloc[0] == 3.0
+    assert failures == [("financial_metrics", "000003")]
+    assert peak[0] == 3
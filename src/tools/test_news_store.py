@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.agents import sentiment
+from src.tools import news_crawler
+from src.tools.news_store import NewsStore
+from src.utils import throttle
+
+
+def article(i, title=None, day="2024-03-01"):
+    return {"title": title or f"新闻标题{i}", "content": f"新闻内容,足够长的正文{i}",
+            "publish_time": f"{day} {i:02d}:00:00", "source": "证券时报",
+            "url": f"https://example.com/{i}", "keyword": ""}
+
+
+def em_frame(articles):
+    """ak.stock_news_em 返回的格式"""
+    return pd.DataFrame({
+        "关键词": [a["keyword"] for a in articles],
+        "新闻标题": [a["title"] for a in articles],
+        "新闻内容": [a["content"] for a in articles],
+        "发布时间": [a["publish_time"] for a in articles],
+        "文章来源": [a["source"] for a in articles],
+        "新闻链接": [a["url"] for a in articles],
+    })
+
+
+def test_dedup_and_queries(tmp_path):
+    store = NewsStore(str(tmp_path))
+    assert store.append("600519", [article(1), article(2), article(3, day="2024-03-02")]) == 3
+    # 同一链接、以及不同链接的转载稿(标题只差标点空白)都不重复入库
+    syndicated = dict(article(9, title="新闻标题 1!"), url="https://other.com/9")
+    assert store.append("600519", [article(2), syndicated, article(4, day="2024-03-03")]) == 1
+
+    assert store.latest_publish_time("600519") == "2024-03-03 04:00:00"
+    assert [a["url"] for a in store.query("600519", as_of="2024-03-02")] == [
+        "https://example.com/3", "https://example.com/2", "https://example.com/1"]
+    assert len(store.query("600519", as_of="2024-03-01 01:30:00")) == 1
+    assert len(store.query("600519", start="2024-03-02", limit=1)) == 1
+
+    # 另一个实例(如另一个进程)读取到相同内容
+    lines = (tmp_path / "600519_news.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 4
+    assert NewsStore(str(tmp_path)).query("600519") == store.query("600519")
+
+
+def test_legacy_json_migrated(tmp_path):
+    with open(tmp_path / "000001_news.json", "w", encoding="utf-8") as f:
+        json.dump({"date": "2024-03-01", "news": [article(1), article(2)]}, f, ensure_ascii=False)
+    store = NewsStore(str(tmp_path))
+    assert len(store.query("000001")) == 2
+    assert (tmp_path / "000001_news.jsonl").exists()
+
+
+def test_incremental_fetch(monkeypatch, tmp_path):
+    store = NewsStore(str(tmp_path))
+    monkeypatch.setattr(news_crawler, "news_store", store)
+    monkeypatch.setattr(news_crawler, "NEWS_REFRESH_INTERVAL", 0)
+
+    fetches = []
+    available = [article(1), article(2)]
+
+    def fake_stock_news_em(symbol):
+        fetches.append(symbol)
+        return em_frame(available)
+
+    monkeypatch.setattr(news_crawler.ak, "stock_news_em", fake_stock_news_em)
+
+    assert len(news_crawler.get_stock_news("600519", max_news=10)) == 2
+    available = [article(3, day="2024-03-02"), article(2), article(1),
+                 dict(article(4), content="短")]
+    news = news_crawler.get_stock_news("600519", max_news=10)
+    assert [a["url"] for a in news] == ["https://example.com/3", "https://example.com/2",
+                                        "https://example.com/1"]
+    assert len(fetches) == 2
+
+    # 回测日期早于今天时只查询新闻库
+    past = news_crawler.get_stock_news("600519", max_news=10, as_of="2024-03-01")
+    assert len(past) == 2 and len(fetches) == 2
+
+    # 刷新间隔内不重新抓取
+    monkeypatch.setattr(news_crawler, "NEWS_REFRESH_INTERVAL", 3600)
+    news_crawler.get_stock_news("600519")
+    assert len(fetches) == 2
+
+
+def test_same_second_article_kept(monkeypatch, tmp_path):
+    """与库中最新一条同一秒发布的新文章也会入库,重复的由新闻库去重"""
+    monkeypatch.setattr(news_crawler, "news_store", NewsStore(str(tmp_path)))
+    available = [article(1)]
+    monkeypatch.setattr(news_crawler.ak, "stock_news_em", lambda symbol: em_frame(available))
+
+    assert news_crawler.fetch_stock_news("600519") == 1
+    available = [article(1), dict(article(1), title="同一时间的另一条新闻", url="https://example.com/x")]
+    assert news_crawler.fetch_stock_news("600519") == 1
+    assert len(news_crawler.news_store.query("600519")) == 2
+
+
+def test_parallel_collection(monkeypatch, tmp_path):
+    """并发获取多只股票的新闻,东方财富的并发数不超过上限"""
+    monkeypatch.setattr(news_crawler, "news_store", NewsStore(str(tmp_path)))
+    monkeypatch.setitem(throttle.HOST_CONCURRENCY, "eastmoney", 4)
+    monkeypatch.setattr(throttle, "_host_semaphores", {})
+
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def fake_stock_news_em(symbol):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+        if symbol == "000003":
+            raise ConnectionError("timeout")
+        return em_frame([dict(article(1), url=f"https://example.com/{symbol}",
+                              title=f"{symbol}公告")])
+
+    monkeypatch.setattr(news_crawler.ak, "stock_news_em", fake_stock_news_em)
+
+    symbols = [f"{i:06d}" for i in range(1, 13)]
+    start = time.perf_counter()
+    news_dict = sentiment._collect_news(symbols, num_of_news=5, max_workers=8)
+    elapsed = time.perf_counter() - start
+
+    assert list(news_dict) == symbols
+    assert news_dict["000003"] == []
+    assert news_dict["000001"][0]["title"] == "000001公告"
+    assert peak[0] == 4
+    assert elapsed < 12 * 0.1 * 0.6
+
+
+def test_live_run_fetches_latest(monkeypatch, tmp_path):
+    """实盘运行时 main.py 传入的 end_date 为昨天,仍需抓取并返回今天的新闻"""
+    monkeypatch.setattr(news_crawler, "news_store", NewsStore(str(tmp_path)))
+    monkeypatch.setattr(news_crawler, "NEWS_REFRESH_INTERVAL", 0)
+    today = datetime.now().strftime("%Y-%m-%d")
+    fetches = []
+
+    def fake_stock_news_em(symbol):
+        fetches.append(symbol)
+        return em_frame([article(1, day=today)])
+
+    monkeypatch.setattr(news_crawler.ak, "stock_news_em", fake_stock_news_em)
+
+    # 与 main.py 相同的 end_date
+    end_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    news_dict = sentiment._collect_news(["999999"], 5, end_date)
+    assert fetches == ["999999"]
+    assert news_dict["999999"][0]["publish_time"].startswith(today)
+
+    # 更早的回测日期只查询新闻库
+    past = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    assert sentiment._collect_news(["999999"], 5, past) == {"999999": []}
+    assert fetches == ["999999"]
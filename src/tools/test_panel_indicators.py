@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+from src.tools import tech_calculator
+from src.tools.panel_indicators import (
+    SIGNAL_LABELS, build_price_panel, calculate_panel_indicators,
+    calculate_panel_indicator_signals, calculate_panel_strategy_signals,
+    combine_panel_signals, DEFAULT_STRATEGY_WEIGHTS)
+from src.tools.test_tech_calculator import generate_mock_prices
+
+STRATEGY_FUNCTIONS = {
+    'trend': tech_calculator.calculate_trend_signals,
+    'mean_reversion': tech_calculator.calculate_mean_reversion_signals,
+    'momentum': tech_calculator.calculate_momentum_signals,
+    'volatility': tech_calculator.calculate_volatility_signals,
+    'stat_arb': tech_calculator.calculate_stat_arb_signals,
+}
+
+
+def generate_universe(count, days=300):
+    """生成长度各不相同的一组股票数据"""
+    return {f"{600000 + i}": generate_mock_prices(days - 17 * i, seed=i)
+            for i in range(count)}
+
+
+def per_ticker_signals(prices_df):
+    """逐只股票调用原有函数计算策略信号"""
+    strategies = {name: func(prices_df.copy())
+                  for name, func in STRATEGY_FUNCTIONS.items()}
+    combined = tech_calculator.weighted_signal_combination(
+        strategies, DEFAULT_STRATEGY_WEIGHTS)
+    return strategies, combined
+
+
+def test_panel_matches_per_ticker():
+    """面板计算的最新一行与逐只股票计算结果一致"""
+    prices_dict = generate_universe(6)
+    panel = build_price_panel(prices_dict)
+    strategy_signals = calculate_panel_strategy_signals(panel)
+    combined = combine_panel_signals(strategy_signals)
+
+    for ticker, prices_df in prices_dict.items():
+        expected, expected_combined = per_ticker_signals(prices_df)
+        for name, result in expected.items():
+            panel_result = strategy_signals[name]
+            assert SIGNAL_LABELS[panel_result['signal'][ticker].iloc[-1]] == result['signal']
+            np.testing.assert_allclose(
+                panel_result['confidence'][ticker].iloc[-1], result['confidence'], rtol=1e-9)
+            for metric, value in result['metrics'].items():
+                np.testing.assert_allclose(
+                    panel_result['metrics'][metric][ticker].iloc[-1], value,
+                    rtol=1e-9, atol=1e-12)
+        assert SIGNAL_LABELS[combined['signal'][ticker].iloc[-1]] == expected_combined['signal']
+        np.testing.assert_allclose(
+            combined['confidence'][ticker].iloc[-1], expected_combined['confidence'], rtol=1e-9)
+
+
+def test_panel_rows_match_truncated_history():
+    """面板中间某一行等于截至该日的历史单独计算的结果"""
+    prices_df = generate_mock_prices(260, seed=3)
+    strategy_signals = calculate_panel_strategy_signals(build_price_panel({"a": prices_df}))
+
+    for end in (80, 150):
+        expected, _ = per_ticker_signals(prices_df.iloc[:end].reset_index(drop=True))
+        for name, result in expected.items():
+            assert SIGNAL_LABELS[strategy_signals[name]['signal']['a'].iloc[end - 1]] == result['signal']
+            np.testing.assert_allclose(
+                strategy_signals[name]['confidence']['a'].iloc[end - 1],
+                result['confidence'], rtol=1e-9)
+
+
+def test_indicator_signals_match_cal_signals():
+    """MACD/RSI/布林带/OBV信号与 cal_signals 一致"""
+    prices_dict = generate_universe(4)
+    panel = build_price_panel(prices_dict)
+    indicators = calculate_panel_indicators(panel)
+    indicator_signals = calculate_panel_indicator_signals(panel, indicators)
+
+    for ticker, prices_df in prices_dict.items():
+        macd_line, signal_line = tech_calculator.calculate_macd(prices_df)
+        rsi = tech_calculator.calculate_rsi(prices_df)
+        upper_band, lower_band = tech_calculator.calculate_bollinger_bands(prices_df)
+        obv = tech_calculator.calculate_obv(prices_df)
+        obv_slope = obv.diff().iloc[-5:].mean()
+        price_drop = (prices_df['close'].iloc[-1] -
+                      prices_df['close'].iloc[-5]) / prices_df['close'].iloc[-5]
+        expected = tech_calculator.cal_signals(
+            prices_df, macd_line, signal_line, rsi, upper_band, lower_band,
+            obv, obv_slope, price_drop)
+
+        actual = [SIGNAL_LABELS[indicator_signals[name][ticker].iloc[-1]]
+                  for name in ('MACD', 'RSI', 'Bollinger', 'OBV')]
+        if indicator_signals['price_drop'][ticker].iloc[-1] > 0:
+            actual.append('bullish')
+        assert actual == expected
+        np.testing.assert_allclose(indicators['obv_slope'][ticker].iloc[-1], obv_slope)
+
+
+def benchmark_panel_indicators():
+    """对比逐只股票计算与面板计算在不同股票数量下的耗时"""
+    for count in (5, 50, 300):
+        prices_dict = {f"{600000 + i}": generate_mock_prices(500, seed=i)
+                       for i in range(count)}
+
+        start = time.perf_counter()
+        for prices_df in prices_dict.values():
+            per_ticker_signals(prices_df)
+        per_ticker_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        panel = build_price_panel(prices_dict)
+        combine_panel_signals(calculate_panel_strategy_signals(panel))
+        calculate_panel_indicator_signals(panel, calculate_panel_indicators(panel))
+        panel_time = time.perf_counter() - start
+
+        print(f"{count}只股票: 逐只计算 {per_ticker_time:.3f}s, "
+              f"面板计算 {panel_time:.3f}s")
+
+
+if __name__ == "__main__":
+    benchmark_panel_indicators()
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import logging
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src import backtest_runner
+from src.backtester import Backtester
+from src.tools.price_store import PRICE_DTYPE, attach_shared_prices, share_price_frames
+from src.utils.throttle import RateLimiter
+
+DATES = pd.bdate_range("2024-01-02", "2024-02-09")
+
+
+def make_prices(ticker, start_date, end_date):
+    rng = np.random.default_rng(int(ticker))
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, len(DATES))))
+    df = pd.DataFrame({"date": DATES, "open": close * 0.995, "close": close,
+                       "high": close * 1.01, "low": close * 0.99,
+                       "volume": np.full(len(DATES), 1e5)})
+    return df[(df["date"] >= start_date) & (df["date"] <= end_date)].reset_index(drop=True)
+
+
+def fake_agent(ticker_list, start_date, end_date, portfolio, num_of_news):
+    """按日期和股票代码给出确定的交易信号"""
+    day = pd.Timestamp(end_date).day + int(ticker_list[0])
+    return json.dumps({"action": "buy" if day % 3 else "sell", "quantity": 200, "confidence": 0.6})
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """不访问网络、不写日志文件;fork 出的子进程继承这些替换"""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("需要 fork 启动方式")
+    monkeypatch.setattr(backtest_runner, "get_price_data", make_prices)
+    monkeypatch.setattr(Backtester, "setup_backtest_logging",
+                        lambda self: setattr(self, "backtest_logger", logging.getLogger("backtest_test")))
+
+
+def test_parallel_matches_sequential(offline):
+    """多进程组合回测与逐只股票顺序回测的结果一致"""
+    tickers = ["600519", "000001", "300750"]
+    result = backtest_runner.run_portfolio_backtest(
+        fake_agent, tickers, "2024-01-01", "2024-02-09", 300000, workers=2)
+
+    assert not result["errors"]
+    assert list(result["ticker_values"].columns) == tickers
+    for ticker in tickers:
+        backtester = Backtester(fake_agent, ticker, "2024-01-01", "2024-02-09", 100000, 5,
+                                price_data=make_prices(ticker, "2024-01-01", "2024-02-09"),
+                                api_min_interval=0, api_calls_per_minute=None)
+        backtester.run_backtest()
+        expected = [v["Portfolio Value"] for v in backtester.portfolio_values]
+        np.testing.assert_allclose(result["ticker_values"][ticker].values, expected)
+
+    value = result["portfolio_value"]
+    assert len(value) == len(DATES)
+    assert value.iloc[-1] == pytest.approx(result["ticker_values"].iloc[-1].sum())
+    assert result["metrics"]["final_value"] == pytest.approx(value.iloc[-1])
+
+
+def test_shared_prices_not_copied(offline):
+    """子进程中的 Backtester 直接使用共享内存中的行情视图"""
+    frames = {ticker: make_prices(ticker, "2024-01-01", "2024-02-09") for ticker in ["600519", "000001"]}
+    shm, index = share_price_frames(frames)
+    try:
+        table = np.ndarray((len(DATES) * 2,), dtype=PRICE_DTYPE, buffer=shm.buf)
+        view_shm, records = attach_shared_prices(shm.name, index["000001"])
+        backtester = Backtester(fake_agent, "000001", "2024-01-01", "2024-02-09", 100000, 5,
+                                price_data=records)
+        backtester.load_price_series()
+        assert np.shares_memory(backtester._prices["close"], records)
+        assert backtester.trading_days == list(DATES)
+        assert backtester.price_on(DATES[3], "close") == frames["000001"]["close"][3]
+        # 父进程写入共享内存后,子进程中的 Backtester 读到的是同一份数据
+        start, _ = index["000001"]
+        table["close"][start + 3] = 1.5
+        assert backtester.price_on(DATES[3], "close") == 1.5
+        del backtester, records, table
+        view_shm.close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _take_slots(limiter, n, stamps):
+    for _ in range(n):
+        limiter.acquire()
+        stamps.append(time.time())
+
+
+def test_rate_limiter_shared_across_processes():
+    """两个进程共用一个速率上限"""
+    ctx = multiprocessing.get_context()
+    limiter = RateLimiter(rate=20, period=1.0, ctx=ctx)
+    with ctx.Manager() as manager:
+        stamps = manager.list()
+        procs = [ctx.Process(target=_take_slots, args=(limiter, 4, stamps)) for _ in range(2)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        stamps = sorted(stamps)
+
+    assert len(stamps) == 8
+    # 8个请求间隔0.05秒,总跨度至少0.35秒
+    assert stamps[-1] - stamps[0] >= 0.3
@@ -0,0 +1,133 @@
+import multiprocessing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.tools import price_store
+
+
+class MockHistory:
+    """模拟远端日线接口,记录每次请求的日期区间"""
+
+    def __init__(self, scale=1.0):
+        dates = pd.bdate_range("2023-01-02", "2024-12-31")
+        self.data = pd.DataFrame({
+            "date": dates,
+            "open": np.arange(len(dates), dtype=float) + 10,
+            "close": np.arange(len(dates), dtype=float) + 10.5,
+            "high": np.arange(len(dates), dtype=float) + 11,
+            "low": np.arange(len(dates), dtype=float) + 9,
+            "volume": np.full(len(dates), 1000.0),
+        })
+        self.scale = scale
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start.date(), end.date()))
+        mask = (self.data["date"] >= pd.Timestamp(start)) & (
+            self.data["date"] <= pd.Timestamp(end))
+        df = self.data[mask].copy()
+        df[["open", "close", "high", "low"]] *= self.scale
+        return df
+
+
+def test_incremental_append(tmp_path, monkeypatch):
+    """已缓存的区间直接返回,只下载缺失的首尾日期"""
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path))
+    fetch = MockHistory()
+
+    df = price_store.load_price_history(
+        "600519", datetime(2024, 1, 1), datetime(2024, 6, 30), "qfq", fetch)
+    assert len(fetch.calls) == 1
+    assert df["date"].min() >= pd.Timestamp("2024-01-01")
+
+    # 相同区间不再请求远端
+    cached = price_store.load_price_history(
+        "600519", datetime(2024, 1, 1), datetime(2024, 6, 30), "qfq", fetch)
+    assert len(fetch.calls) == 1
+    pd.testing.assert_frame_equal(df, cached)
+
+    # 只下载新增的交易日(带一个重叠日用于校验复权价格)
+    df = price_store.load_price_history(
+        "600519", datetime(2024, 1, 1), datetime(2024, 7, 31), "qfq", fetch)
+    assert len(fetch.calls) == 2
+    assert fetch.calls[-1] == (datetime(2024, 6, 28).date(), datetime(2024, 7, 31).date())
+    expected = fetch(datetime(2024, 1, 1), datetime(2024, 7, 31))
+    np.testing.assert_allclose(df["close"].values, expected["close"].values)
+    assert df["date"].is_monotonic_increasing and df["date"].is_unique
+
+
+def test_adjust_factor_change_triggers_refetch(tmp_path, monkeypatch):
+    """复权价格变化时整体重新下载"""
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path))
+    fetch = MockHistory()
+    price_store.load_price_history(
+        "000001", datetime(2024, 1, 1), datetime(2024, 3, 31), "qfq", fetch)
+
+    fetch.scale = 0.9
+    df = price_store.load_price_history(
+        "000001", datetime(2024, 1, 1), datetime(2024, 4, 30), "qfq", fetch)
+    expected = fetch(datetime(2024, 1, 1), datetime(2024, 4, 30))
+    np.testing.assert_allclose(df["close"].values, expected["close"].values)
+
+
+def test_empty_fetch_not_covered(tmp_path, monkeypatch):
+    """远端返回空数据时不记入覆盖区间,下次读取时重新下载"""
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path))
+    fetch = MockHistory()
+    failing = [True]
+
+    def flaky(start, end):
+        if failing[0]:
+            fetch.calls.append((start.date(), end.date()))
+            return pd.DataFrame()
+        return fetch(start, end)
+
+    # 首次下载为空时不写入本地行情库
+    assert price_store.load_price_history(
+        "600519", datetime(2024, 1, 1), datetime(2024, 6, 30), "qfq", flaky).empty
+    failing[0] = False
+    df = price_store.load_price_history(
+        "600519", datetime(2024, 1, 1), datetime(2024, 6, 30), "qfq", flaky)
+    assert len(fetch.calls) == 2 and not df.empty
+
+    # 增量下载为空时,缺失的日期下次重新下载
+    failing[0] = True
+    price_store.load_price_history(
+        "600519", datetime(2024, 1, 1), datetime(2024, 7, 31), "qfq", flaky)
+    failing[0] = False
+    df = price_store.load_price_history(
+        "600519", datetime(2024, 1, 1), datetime(2024, 7, 31), "qfq", flaky)
+    assert fetch.calls[-1] == (datetime(2024, 6, 28).date(), datetime(2024, 7, 31).date())
+    assert df["date"].max() == pd.Timestamp("2024-07-31")
+
+
+def _load_range(store_dir, start, end):
+    price_store.PRICE_STORE_DIR = store_dir
+    for _ in range(5):
+        price_store.load_price_history("600519", start, end, "qfq", MockHistory())
+
+
+def test_concurrent_processes(tmp_path, monkeypatch):
+    """多个进程同时扩展同一分区,数据与元数据始终一致,只保留当前版本的数据文件"""
+    ctx = multiprocessing.get_context()
+    ranges = [(datetime(2024, 1, 1), datetime(2024, 3, 31)),
+              (datetime(2024, 3, 1), datetime(2024, 8, 31)),
+              (datetime(2023, 6, 1), datetime(2024, 2, 29)),
+              (datetime(2024, 7, 1), datetime(2024, 12, 31))]
+    procs = [ctx.Process(target=_load_range, args=(str(tmp_path), start, end))
+             for start, end in ranges]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    assert all(proc.exitcode == 0 for proc in procs)
+
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path))
+    records, meta = price_store._read_partition("600519", "qfq")
+    assert meta["start"] == "2023-06-01" and meta["end"] == "2024-12-31"
+    expected = MockHistory()(datetime(2023, 6, 1), datetime(2024, 12, 31))
+    np.testing.assert_allclose(records["close"], expected["close"].values)
+    assert [p.name for p in tmp_path.glob("*.npy")] == [meta["data"]]
+
@@ -0,0 +1,145 @@
+import os
+import json
+import asyncio
+import threading
+
+import numpy as np
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.tools import prompt_packer, tech_analyzer, news_crawler, overall_analyzer
+from src.tools.prompt_packer import (compact_json, estimate_tokens, fit_fields, merge_results,
+                                     split_by_budget, truncate_text)
+
+
+def llm_response(content):
+    return json.dumps({"choices": [{"message": {"content": content}}]})
+
+
+def test_estimate_and_truncate():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("贵州茅台") == 4
+    assert estimate_tokens("abcdefgh") == 2
+
+    text = "营业收入同比增长" * 100
+    short = truncate_text(text, 50)
+    assert short.endswith("…") and estimate_tokens(short) <= 50
+    assert text.startswith(short[:-1])
+    assert truncate_text("短文本", 50) == "短文本"
+
+
+def test_compact_json():
+    data = {"close": np.float64(12.345678), "volume": np.int64(1000), "rsi": float("nan"),
+            "note": None, "flags": [np.bool_(True)], "empty": {}}
+    assert compact_json(data) == '{"close":12.3457,"volume":1000,"flags":[true]}'
+    assert len(compact_json(data)) < len(str(data))
+
+
+def test_fit_fields():
+    data = {"technical": {"technical_reason": "均线多头排列" * 400},
+            "fundamentals": "营收增长" * 300, "valuation": "估值偏低"}
+    fitted = fit_fields(data, 1000)
+    assert estimate_tokens(compact_json(fitted)) <= 1000
+    # 短字段不截断,超出部分由长字段分摊;嵌套结构保持不变
+    assert fitted["valuation"] == "估值偏低"
+    assert fitted["technical"]["technical_reason"].endswith("…")
+    assert fitted["fundamentals"].endswith("…")
+    assert fit_fields({"a": "短"}, 1000) == {"a": "短"}
+
+
+def test_split_and_merge():
+    items = {f"{i:06d}": {"reason": "指标" * 100} for i in range(10)}
+    chunks = split_by_budget(items, overhead_tokens=100, budget=600)
+    assert [key for chunk in chunks for key in chunk] == list(items)
+    assert all(100 + estimate_tokens(compact_json(chunk)) <= 600 for chunk in chunks)
+    assert len(chunks) == 5
+    # 单项超出预算时单独成块
+    assert split_by_budget({"a": "x" * 4000}, 100, budget=500) == [{"a": "x" * 4000}]
+
+    assert merge_results([{"r": "A"}, {"r": "B"}]) == {"r": "A\n\nB"}
+    # 部分块失败时列出没有得到分析的股票
+    assert merge_results([{"r": "A"}, 0.0, {"r": "B"}], [{"1": 0}, {"2": 0, "3": 0}, {"4": 0}]) == {
+        "r": "A\n\nB", "missing_tickers": ["2", "3"]}
+    assert merge_results([0.0, 0.0]) == 0.0
+
+
+def test_merge_two_chunks():
+    """两块的回答合并为一个分数列表和一段原因"""
+    chunks = [{"600519": 0, "000001": 0}, {"300750": 0}]
+    results = [{"technical_reason": "结果:[600519:0.8,000001:-0.5]\n原因:茅台放量突破;平安均线空头排列"},
+               {"technical_reason": "结果：[300750:0.3]\n原因：宁德时代横盘整理"}]
+    merged = merge_results(results, chunks)
+    assert merged == {"technical_reason": "结果:[600519:0.8,000001:-0.5,300750:0.3]\n"
+                                          "原因:茅台放量突破;平安均线空头排列\n\n宁德时代横盘整理"}
+    assert merge_results(results[:1], chunks[:1]) == results[0]
+
+
+def test_chunked_tech_analyze(monkeypatch):
+    """技术指标超出预算时分块并行请求,合并各块的分析"""
+    monkeypatch.setattr(prompt_packer, "LLM_PROMPT_TOKEN_BUDGET", 1500)
+    calls, lock = [], threading.Lock()
+
+    def fake_completion(messages):
+        content = messages[1]["content"]
+        assert prompt_packer.estimate_message_tokens(messages) <= 1500
+        symbols = [s for s in stock_tech_dict if f'"{s}"' in content]
+        with lock:
+            calls.append(symbols)
+        return llm_response(f"结果:[{','.join(f'{s}:0.5' for s in symbols)}]")
+
+    monkeypatch.setattr(tech_analyzer, "get_chat_completion", fake_completion)
+    stock_tech_dict = {f"{i:06d}": {"close": list(np.linspace(10, 11, 200)), "rsi": float("nan")}
+                       for i in range(4)}
+    result = tech_analyzer.get_tech_analyze("2024-03-01", stock_tech_dict, "信号", "策略")
+
+    assert len(calls) > 1
+    assert sorted(s for symbols in calls for s in symbols) == list(stock_tech_dict)
+    assert all(f"{s}:0.5" in result["technical_reason"] for s in stock_tech_dict)
+    assert result["technical_reason"].count("结果:") == 1
+
+    async def fake_async(messages):
+        return fake_completion(messages)
+
+    monkeypatch.setattr(tech_analyzer, "get_chat_completion_async", fake_async)
+    calls.clear()
+    result = asyncio.run(tech_analyzer.get_tech_analyze_async(
+        "2024-03-01", stock_tech_dict, "信号", "策略"))
+    assert len(calls) > 1 and "000003:0.5" in result["technical_reason"]
+    assert "missing_tickers" not in result
+
+    # 某一块请求失败时,合并结果中标出缺失的股票
+    def failing_completion(messages):
+        return None if '"000000"' in messages[1]["content"] else fake_completion(messages)
+
+    monkeypatch.setattr(tech_analyzer, "get_chat_completion", failing_completion)
+    result = tech_analyzer.get_tech_analyze("2024-03-01", stock_tech_dict, "信号", "策略")
+    assert result["missing_tickers"] == ["000000", "000001"]
+    assert "000002:0.5" in result["technical_reason"]
+
+
+def test_sentiment_batches_within_budget(monkeypatch):
+    monkeypatch.setattr(news_crawler, "LLM_PROMPT_TOKEN_BUDGET", 2000)
+    monkeypatch.setattr(news_crawler, "SENTIMENT_ARTICLE_TOKENS", 300)
+    news = {"title": "年报", "content": "营业收入同比增长" * 200, "source": "证券时报",
+            "publish_time": "2024-03-29 18:00:00", "url": "https://example.com/1"}
+    articles = [("600519", news, str(i)) for i in range(10)]
+
+    batches = news_crawler._batches(articles)
+    assert len(batches) > 1 and sum(len(b) for b in batches) == 10
+    for batch in batches:
+        messages = news_crawler.build_sentiment_messages(batch)
+        assert prompt_packer.estimate_message_tokens(messages) <= 2000
+        # 正文只保留导语部分
+        assert "营业收入同比增长" * 50 not in messages[1]["content"]
+
+
+def test_bull_reasoning_fitted(monkeypatch):
+    monkeypatch.setattr(overall_analyzer, "LLM_PROMPT_TOKEN_BUDGET", 3000)
+    reasoning_dict = {"technical": {"technical_reason": "均线多头排列" * 2000},
+                      "valuation": {"valuation_reason": "估值偏低"}}
+    messages = overall_analyzer.build_bull_messages(["600519"], reasoning_dict)
+    assert prompt_packer.estimate_message_tokens(messages) <= 3000
+    assert "估值偏低" in messages[1]["content"]
+    # 嵌套的结论不会被再次编码为JSON字符串
+    assert '"valuation":{"valuation_reason":"估值偏低"}' in messages[1]["content"]
+    assert '\\"' not in messages[1]["content"]
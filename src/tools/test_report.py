@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import logging
+import subprocess
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src import backtester as backtester_module
+from src.backtester import Backtester
+from src.tools.performance import trade_metrics
+
+
+@pytest.fixture
+def finished_backtest(monkeypatch):
+    """不访问网络、不写日志文件的已完成回测"""
+    dates = pd.bdate_range("2024-01-02", "2024-01-12")
+    prices = pd.DataFrame({"date": dates, "open": [10, 11, 12, 11, 10, 12, 13, 12, 14],
+                           "close": [11, 12, 11, 10, 12, 13, 12, 14, 15]})
+
+    monkeypatch.setattr(backtester_module, "get_price_data", lambda *args: prices)
+    monkeypatch.setattr(Backtester, "setup_backtest_logging",
+                        lambda self: setattr(self, "backtest_logger", logging.getLogger("backtest_test")))
+    monkeypatch.setattr(backtester_module.time, "sleep", lambda seconds: None)
+
+    calls = []
+
+    def agent(ticker_list, start_date, end_date, portfolio, num_of_news):
+        calls.append(end_date)
+        action = "buy" if len(calls) % 2 else "sell"
+        return json.dumps({"action": action, "quantity": 100, "confidence": 0.6})
+
+    backtester = Backtester(agent=agent, ticker="600519", start_date="2024-01-01",
+                            end_date="2024-01-12", initial_capital=100000, num_of_news=5)
+    backtester.run_backtest()
+    return backtester
+
+
+def test_trade_metrics():
+    values = pd.Series([1000.0, 1000.0])
+    trades = [
+        {"action": "buy", "quantity": 10, "price": 10},
+        {"action": "buy", "quantity": 10, "price": 20},
+        {"action": "sell", "quantity": 10, "price": 16},   # 平均成本15,盈利
+        {"action": "sell", "quantity": 10, "price": 14},   # 亏损
+    ]
+    metrics = trade_metrics(trades, values)
+    assert metrics["trade_count"] == 4
+    assert metrics["turnover"] == pytest.approx((100 + 200 + 160 + 140) / 1000)
+    assert metrics["hit_rate"] == pytest.approx(0.5)
+    assert trade_metrics([], values)["hit_rate"] == 0.0
+
+
+def test_headless_report(finished_backtest, tmp_path):
+    """写入指标、净值和图表文件,不弹出窗口"""
+    backtester = finished_backtest
+    assert len(backtester.trades) == 9
+
+    backtester.analyze_performance(report_dir=str(tmp_path), annotate=True)
+    name = "backtest_600519_20240101_20240112"
+    metrics = json.loads((tmp_path / f"{name}_metrics.json").read_text(encoding="utf-8"))
+    assert set(metrics) >= {"total_return", "sharpe_ratio", "max_drawdown", "turnover", "hit_rate"}
+    assert metrics["trade_count"] == 9
+
+    equity = pd.read_csv(tmp_path / f"{name}_equity.csv")
+    assert len(equity) == 9 and "Cumulative Return" in equity.columns
+    assert (tmp_path / f"{name}_equity.png").read_bytes()[:4] == b"\x89PNG"
+
+    backtester.analyze_performance(report_dir=str(tmp_path / "no_plot"), plot=False)
+    assert not (tmp_path / "no_plot" / f"{name}_equity.png").exists()
+
+
+def test_backtester_import_skips_matplotlib():
+    """导入回测器时不导入 matplotlib"""
+    code = "import sys, src.backtester; print('matplotlib' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env={**os.environ, "GEMINI_API_KEY": "test-key"})
+    assert result.stdout.strip().splitlines()[-1] == "False"
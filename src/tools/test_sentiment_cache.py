@@ -0,0 +1,129 @@
+import os
+import json
+import asyncio
+import multiprocessing
+
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.tools import news_crawler
+from src.utils.sqlite_cache import SQLiteCache
+
+NEWS = {
+    "600519": [
+        {"title": "贵州茅台发布年报", "content": "营业收入同比增长" * 50, "source": "证券时报",
+         "publish_time": "2024-03-29 18:00:00", "url": "https://example.com/1"},
+        {"title": "茅台提价", "content": "出厂价上调", "source": "财联社",
+         "publish_time": "2024-03-28 09:00:00", "url": "https://example.com/2"},
+    ]
+}
+
+
+def llm_response(items):
+    return json.dumps({"choices": [{"message": {"content": "```json\n" + json.dumps(items) + "\n```"}}]})
+
+
+def fake_llm(calls, score=0.5):
+    """按消息中的新闻编号逐条打分"""
+    def completion(messages):
+        count = messages[1]["content"].count("新闻编号:")
+        calls.append(count)
+        return llm_response([{"id": i, "score": score, "reason": f"第{i}条"} for i in range(1, count + 1)])
+    return completion
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = SQLiteCache(str(tmp_path / "sentiment.sqlite"))
+    monkeypatch.setattr(news_crawler, "sentiment_cache", cache)
+    return cache
+
+
+def test_only_unseen_articles_scored(monkeypatch, cache):
+    calls = []
+    monkeypatch.setattr(news_crawler, "get_chat_completion", fake_llm(calls))
+
+    first = news_crawler.get_news_sentiment(["600519"], NEWS, num_of_news=2)
+    second = news_crawler.get_news_sentiment(["600519"], NEWS, num_of_news=2)
+    assert first == second
+    assert calls == [2]
+    summary = first["sentiment_scores"]["600519"]
+    assert summary["score"] == pytest.approx(0.5) and summary["signal"] == "bullish"
+    assert summary["scored_count"] == 2
+
+    # 新增一条新闻时只分析这一条
+    fresh = {"title": "茅台新品上市", "content": "新品发布", "source": "新浪财经",
+             "publish_time": "2024-03-30 10:00:00", "url": "https://example.com/3"}
+    news = {"600519": [fresh] + NEWS["600519"]}
+    monkeypatch.setattr(news_crawler, "get_chat_completion", fake_llm(calls, score=-0.7))
+    result = news_crawler.get_news_sentiment(["600519"], news, num_of_news=3)
+    assert calls == [2, 1]
+    assert result["sentiment_scores"]["600519"]["score"] == pytest.approx((0.5 + 0.5 - 0.7) / 3)
+
+
+def test_batches_and_async(monkeypatch, cache):
+    calls = []
+
+    async def fake_async(messages):
+        return fake_llm(calls)(messages)
+
+    monkeypatch.setattr(news_crawler, "get_chat_completion_async", fake_async)
+    monkeypatch.setattr(news_crawler, "SENTIMENT_BATCH_SIZE", 2)
+    news = {"600519": [dict(NEWS["600519"][0], url=f"https://example.com/{i}") for i in range(5)],
+            "000001": []}
+    result = asyncio.run(news_crawler.get_news_sentiment_async(["600519", "000001"], news, 5))
+    assert sorted(calls) == [1, 2, 2]
+    assert result["sentiment_scores"]["600519"]["scored_count"] == 5
+    assert result["sentiment_scores"]["000001"] == {
+        "score": 0.0, "signal": "neutral", "news_count": 0, "scored_count": 0, "articles": []}
+
+
+def test_errors_not_cached(monkeypatch, cache):
+    monkeypatch.setattr(news_crawler, "get_chat_completion", lambda messages: None)
+    result = news_crawler.get_news_sentiment(["600519"], NEWS, num_of_news=2)
+    assert result["sentiment_scores"]["600519"]["scored_count"] == 0
+    assert cache.stats()["entries"] == 0
+
+    # 只给出部分得分时,其余新闻下次重新分析
+    monkeypatch.setattr(news_crawler, "get_chat_completion",
+                        lambda messages: llm_response([{"id": 2, "score": -2, "reason": "x"}]))
+    result = news_crawler.get_news_sentiment(["600519"], NEWS, num_of_news=2)
+    assert result["sentiment_scores"]["600519"]["score"] == -1.0
+    assert cache.stats()["entries"] == 1
+
+
+def _write_entries(path, worker):
+    cache = SQLiteCache(path)
+    for i in range(50):
+        cache.set(f"{worker}-{i}", json.dumps({"sentiment_reason": i}))
+
+
+def test_concurrent_processes(tmp_path):
+    """多个进程同时写入同一个缓存文件"""
+    path = str(tmp_path / "shared.sqlite")
+    ctx = multiprocessing.get_context()
+    procs = [ctx.Process(target=_write_entries, args=(path, worker)) for worker in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    assert all(proc.exitcode == 0 for proc in procs)
+    assert SQLiteCache(path).stats()["entries"] == 200
+
+
+def test_empty_news_and_report(monkeypatch, cache):
+    """没有新闻时返回相同结构;智能体输出逐只股票列出得分和信号"""
+    from src.agents.sentiment import format_sentiment_result
+
+    empty = {"score": 0.0, "signal": "neutral", "news_count": 0, "scored_count": 0, "articles": []}
+    assert news_crawler.get_news_sentiment(["600519"], {}) == {"sentiment_scores": {"600519": empty}}
+    assert asyncio.run(news_crawler.get_news_sentiment_async(["600519"], {})) == {
+        "sentiment_scores": {"600519": empty}}
+
+    monkeypatch.setattr(news_crawler, "get_chat_completion", fake_llm([]))
+    result = news_crawler.get_news_sentiment(["600519", "000001"], NEWS, num_of_news=2)
+    text = format_sentiment_result(result)
+    assert "600519: 情感得分0.50,信号bullish(看多),已分析2/2条新闻" in text
+    assert "  - [+0.50] 茅台提价: 第2条" in text
+    assert "000001: 情感得分0.00,信号neutral(中性),已分析0/0条新闻" in text
@@ -0,0 +1,109 @@
+import os
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src import backtester as backtester_module
+from src.backtester import Backtester
+from src.tools.signal_store import SignalStore
+
+
+@pytest.fixture
+def offline_backtester(monkeypatch, tmp_path):
+    """不访问网络、不写日志文件、不等待API间隔的回测器"""
+    # 1月1日元旦休市
+    dates = pd.bdate_range("2024-01-02", "2024-01-12")
+    prices = pd.DataFrame({"date": dates, "open": range(10, 10 + len(dates)),
+                           "close": range(11, 11 + len(dates))})
+
+    price_calls = []
+
+    def fake_price_data(ticker, start_date, end_date):
+        price_calls.append((start_date, end_date))
+        return prices[(prices["date"] >= start_date) & (prices["date"] <= end_date)]
+
+    def quiet_logging(self):
+        self.backtest_logger = logging.getLogger("backtest_test")
+
+    monkeypatch.setattr(backtester_module, "get_price_data", fake_price_data)
+    monkeypatch.setattr(Backtester, "setup_backtest_logging", quiet_logging)
+    monkeypatch.setattr(backtester_module.time, "sleep", lambda seconds: None)
+
+    calls = []
+
+    def agent(ticker_list, start_date, end_date, portfolio, num_of_news):
+        calls.append(end_date)
+        action = "buy" if len(calls) % 2 else "sell"
+        return json.dumps({"action": action, "quantity": 100, "confidence": 0.6})
+
+    def make():
+        return Backtester(agent=agent, ticker="600519", start_date="2024-01-01",
+                          end_date="2024-01-12", initial_capital=100000, num_of_news=5,
+                          signal_store=SignalStore(str(tmp_path / "signals.sqlite")))
+    return make, calls, price_calls
+
+
+def test_precompute_then_replay(offline_backtester):
+    """第一阶段写入信号,再次运行和回放都不再调用智能体"""
+    make, calls, _ = offline_backtester
+
+    first = make()
+    first.run_backtest()
+    assert len(calls) == 9
+    live_values = [v["Portfolio Value"] for v in first.portfolio_values]
+
+    second = make()
+    second.run_backtest()
+    assert len(calls) == 9
+
+    replay = make()
+    replay.replay_backtest()
+    assert len(calls) == 9
+    assert [v["Portfolio Value"] for v in replay.portfolio_values] == live_values
+
+    # 改变仓位设置只需重新回放
+    replay.replay_backtest(trade_fraction=0.5, price_field="close")
+    assert replay.portfolio_values[0]["Portfolio Value"] == pytest.approx(100000)
+    assert replay.portfolio["stock"] > 100
+
+
+def test_prices_loaded_once(offline_backtester):
+    """行情只获取一次,交易日取自行情数据,跳过节假日"""
+    make, calls, price_calls = offline_backtester
+    backtester = make()
+    backtester.run_backtest()
+
+    assert price_calls == [("2024-01-01", "2024-01-12")]
+    assert calls[0] == "2024-01-02"
+    assert backtester.portfolio_values[0]["Date"] == pd.Timestamp("2024-01-02")
+    assert backtester.price_on("2024-01-03", "open") == 11
+
+
+def test_failed_decisions_not_stored(offline_backtester):
+    """决策失败的日期按持有处理且不写入信号库,再次运行时重新获取"""
+    make, calls, _ = offline_backtester
+    failed = []
+
+    def flaky_agent(ticker_list, start_date, end_date, portfolio, num_of_news):
+        if end_date == "2024-01-03" and not failed:
+            failed.append(end_date)
+            return "not json"
+        calls.append(end_date)
+        return json.dumps({"action": "buy", "quantity": 100})
+
+    first = make()
+    first.agent = flaky_agent
+    first.run_backtest()
+    assert failed == ["2024-01-03"] and "2024-01-03" not in calls
+    assert pd.Timestamp("2024-01-03") not in [trade["date"] for trade in first.trades]
+
+    second = make()
+    second.agent = flaky_agent
+    second.run_backtest()
+    assert calls[-1] == "2024-01-03"
+    assert len(second.signal_store.load_range("600519", second.config_hash,
+                                              "2024-01-01", "2024-01-12")) == 9
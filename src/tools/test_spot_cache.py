@@ -0,0 +1,41 @@
+import pandas as pd
+
+from src.tools import api
+
+
+def _mock_spot_data():
+    """生成模拟的全市场行情数据"""
+    return pd.DataFrame({
+        "代码": ["600519", "000001", "300059"],
+        "总市值": [2.1e12, 2.2e11, 3.0e11],
+        "流通市值": [2.1e12, 2.2e11, 2.5e11],
+        "成交量": [30000.0, 900000.0, 1500000.0],
+        "52周最高": [1900.0, 13.0, 30.0],
+        "52周最低": [1400.0, 9.0, 12.0],
+    })
+
+
+def test_spot_snapshot_is_shared_within_ttl(monkeypatch):
+    """同一个TTL窗口内多只股票的查询只下载一次全市场行情"""
+    calls = []
+
+    def fake_spot():
+        calls.append(1)
+        return _mock_spot_data()
+
+    monkeypatch.setattr(api.ak, "stock_zh_a_spot_em", fake_spot)
+    api.clear_spot_cache()
+
+    for symbol in ["600519", "000001", "300059"]:
+        market_data = api.get_market_data(symbol)
+        assert market_data["market_cap"] > 0
+    assert len(calls) == 1
+
+    # 未找到的股票返回空字典
+    assert api.get_market_data("999999") == {}
+    assert len(calls) == 1
+
+    # TTL过期后重新下载
+    api.get_spot_snapshot(ttl=0)
+    assert len(calls) == 2
+    api.clear_spot_cache()
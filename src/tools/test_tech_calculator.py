@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from src.tools.tech_calculator import calculate_obv, calculate_obv_array
+
+
+def generate_mock_prices(days=300, seed=0):
+    """生成模拟的日线数据"""
+    rng = np.random.default_rng(seed)
+    close = (10 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))).round(2)
+    high = close * (1 + rng.uniform(0, 0.03, days))
+    low = close * (1 - rng.uniform(0, 0.03, days))
+    volume = rng.integers(1_000, 100_000, days).astype(float)
+    return pd.DataFrame({
+        "open": close,
+        "close": close,
+        "high": high,
+        "low": low,
+        "volume": volume,
+    })
+
+
+def reference_obv(prices_df):
+    """逐行循环计算OBV的原始实现,作为对照"""
+    obv = [0]
+    for i in range(1, len(prices_df)):
+        if prices_df['close'].iloc[i] > prices_df['close'].iloc[i - 1]:
+            obv.append(obv[-1] + prices_df['volume'].iloc[i])
+        elif prices_df['close'].iloc[i] < prices_df['close'].iloc[i - 1]:
+            obv.append(obv[-1] - prices_df['volume'].iloc[i])
+        else:
+            obv.append(obv[-1])
+    return np.array(obv, dtype=float)
+
+
+def test_obv_matches_loop_and_keeps_input():
+    """向量化OBV与逐行实现一致,且不修改输入DataFrame"""
+    prices_df = generate_mock_prices()
+    columns = list(prices_df.columns)
+
+    obv = calculate_obv(prices_df)
+
+    np.testing.assert_allclose(obv.values, reference_obv(prices_df))
+    assert list(prices_df.columns) == columns
+
+
+def test_obv_on_panel():
+    """对 (日期 x 股票) 的二维数组一次计算所有股票的OBV"""
+    frames = [generate_mock_prices(seed=seed) for seed in range(5)]
+    close = np.column_stack([df["close"].values for df in frames])
+    volume = np.column_stack([df["volume"].values for df in frames])
+
+    panel_obv = calculate_obv_array(close, volume)
+
+    assert panel_obv.shape == close.shape
+    for column, df in enumerate(frames):
+        np.testing.assert_allclose(panel_obv[:, column], reference_obv(df))
@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.tools.performance import performance_metrics
+from src.tools.vector_backtest import run_vector_backtest, simulate_positions
+
+
+def make_prices(days, seed, end="2024-06-28"):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=days)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    open_ = close * (1 + rng.normal(0, 0.005, days))
+    return pd.DataFrame({
+        "date": dates,
+        "open": open_,
+        "close": close,
+        "high": np.maximum(open_, close) * 1.01,
+        "low": np.minimum(open_, close) * 0.99,
+        "volume": rng.integers(1e5, 1e6, days).astype(float),
+    })
+
+
+def reference_sleeve(flags, opens, closes, capital, lot=100, rate=0.00025, min_fee=5.0, duty=0.0005):
+    """逐日循环的参考实现:前一日收盘的信号在当日开盘成交"""
+    cash, shares, values = capital, 0, []
+    for day in range(len(opens)):
+        want = flags[day - 1] if day > 0 else 0
+        if want and not shares:
+            quantity = int(cash // (opens[day] * (1 + rate)) // lot * lot)
+            while quantity and quantity * opens[day] + max(quantity * opens[day] * rate, min_fee) > cash:
+                quantity -= lot
+            if quantity:
+                cash -= quantity * opens[day] + max(quantity * opens[day] * rate, min_fee)
+                shares = quantity
+        elif not want and shares:
+            value = shares * opens[day]
+            cash += value - max(value * rate, min_fee) - value * duty
+            shares = 0
+        values.append(cash + shares * closes[day])
+    return np.array(values)
+
+
+def test_simulation_matches_daily_loop():
+    """向量化执行与逐日循环的结果一致"""
+    prices = make_prices(200, seed=1)
+    rng = np.random.default_rng(2)
+    flags = (rng.random(200) > 0.6).astype(float)
+    target = pd.DataFrame({"600519": flags})
+
+    result = simulate_positions(target, prices[["open"]].set_axis(["600519"], axis=1),
+                                prices[["close"]].set_axis(["600519"], axis=1), 50000.0)
+    expected = reference_sleeve(flags, prices["open"].values, prices["close"].values, 50000.0)
+    np.testing.assert_allclose(result["equity"]["600519"].values, expected)
+
+    trades = result["trades"]
+    assert (trades["quantity"] % 100 == 0).all()
+    assert (trades["bar"].values[0] == np.flatnonzero(flags)[0] + 1)  # 次日开盘成交
+    assert (trades["cost"] >= 5.0).all()
+
+
+def test_performance_metrics_match_backtester():
+    """与 Backtester.analyze_performance 的口径一致"""
+    values = pd.Series([100000, 101000, 99000, 103000, 102000], dtype=float)
+    metrics = performance_metrics(values, 100000)
+
+    daily = values.pct_change().fillna(0)
+    assert metrics["total_return"] == pytest.approx(0.02)
+    assert metrics["sharpe_ratio"] == pytest.approx(daily.mean() / daily.std() * 252 ** 0.5)
+    assert metrics["max_drawdown"] == pytest.approx(99000 / 101000 - 1)
+
+    frame = performance_metrics(pd.DataFrame({"a": values, "b": values}), 100000)
+    assert frame.loc["a", "sharpe_ratio"] == pytest.approx(metrics["sharpe_ratio"])
+
+
+def test_run_vector_backtest_portfolio():
+    """不同长度的历史按日期汇总为组合净值"""
+    prices = {"600519": make_prices(300, seed=3), "000001": make_prices(180, seed=4)}
+    result = run_vector_backtest(prices, initial_capital=200000)
+
+    value = result["portfolio_value"]
+    assert value.index.is_monotonic_increasing and len(value) == 300
+    assert value.iloc[0] == pytest.approx(200000)
+    assert set(result["ticker_metrics"].index) == set(prices)
+    assert result["metrics"]["final_value"] == pytest.approx(value.iloc[-1])
+    # 空仓期间持有现金,股票数始终是整手
+    assert (result["shares"].values % 100 == 0).all()
+
+
+if __name__ == "__main__":
+    n_tickers, days = 300, 1250
+    prices = {f"{600000 + i}": make_prices(days, seed=i) for i in range(n_tickers)}
+
+    start = time.perf_counter()
+    result = run_vector_backtest(prices, initial_capital=1e7)
+    elapsed = time.perf_counter() - start
+    print(f"{n_tickers}只股票 x {days}个交易日: {elapsed:.2f}s, "
+          f"交易 {len(result['trades'])} 笔, 总收益率 {result['metrics']['total_return']:.2%}")
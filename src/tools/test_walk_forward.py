@@ -0,0 +1,81 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.tools.panel_indicators import DEFAULT_STRATEGY_PARAMS, build_price_panel
+from src.tools.panel_indicators import calculate_panel_strategy_inputs, combine_panel_signals
+from src.tools.panel_indicators import panel_strategy_signals
+from src.tools.test_vector_backtest import make_prices
+from src.tools.vector_backtest import backtest_panel
+from src.tools.walk_forward import expand_grid, simplex_weights, walk_forward_sweep
+from src.tools.walk_forward import walk_forward_windows
+
+
+def test_grids():
+    weights = simplex_weights(step=0.25)
+    assert len(weights) == 70
+    assert all(sum(w.values()) == pytest.approx(1) for w in weights)
+
+    configs = expand_grid(weights[:3], {"momentum_threshold": [0.03, 0.05]}, [(0.2, -0.2), (0.1, -0.3)])
+    assert len(configs) == 12
+    assert configs[0]["params"]["mean_reversion_z"] == DEFAULT_STRATEGY_PARAMS["mean_reversion_z"]
+    with pytest.raises(ValueError):
+        expand_grid(param_grid={"unknown": [1]})
+
+    windows = walk_forward_windows(500, 250, 60)
+    assert [(w[0].start, w[1].start, w[1].stop) for w in windows] == [
+        (0, 250, 310), (60, 310, 370), (120, 370, 430), (180, 430, 490)]
+
+
+def test_thresholds_change_signals():
+    """阈值放宽时信号只会增多"""
+    panel = build_price_panel({"a": make_prices(400, seed=5), "b": make_prices(400, seed=6)})
+    inputs = calculate_panel_strategy_inputs(panel)
+    default = panel_strategy_signals(inputs)
+    loose = panel_strategy_signals(inputs, {"momentum_threshold": 0.0, "mean_reversion_z": 1.0})
+    for name in ("momentum", "mean_reversion"):
+        assert (loose[name]["signal"].abs().sum() >= default[name]["signal"].abs().sum()).all()
+    assert (loose["mean_reversion"]["signal"].abs().sum().sum()
+            > default["mean_reversion"]["signal"].abs().sum().sum())
+
+
+def test_sweep_picks_best_train_config():
+    prices = {f"{600000 + i}": make_prices(420, seed=i) for i in range(4)}
+    kwargs = dict(train_bars=200, test_bars=60,
+                  weight_grid=simplex_weights(step=0.5),
+                  param_grid={"momentum_threshold": [0.02, 0.05]},
+                  threshold_grid=[(0.2, -0.2), (0.1, -0.1)])
+
+    sequential = walk_forward_sweep(prices, workers=1, **kwargs)
+    parallel = walk_forward_sweep(prices, workers=2, **kwargs)
+    assert len(sequential) == 3
+    np.testing.assert_allclose(sequential["test_final_value"], parallel["test_final_value"])
+    assert list(sequential["weights"]) == list(parallel["weights"])
+    assert (sequential["test_start"] > sequential["train_end"]).all()
+
+    # 第一个窗口的最优配置不差于网格中任一配置
+    panel = build_price_panel(prices)
+    inputs = calculate_panel_strategy_inputs(panel)
+    train = slice(0, 200)
+    best = sequential.loc[0, "train_sharpe_ratio"]
+    for config in expand_grid(kwargs["weight_grid"], kwargs["param_grid"], kwargs["threshold_grid"]):
+        score = combine_panel_signals(panel_strategy_signals(inputs, config["params"]),
+                                      config["weights"])["score"]
+        result = backtest_panel({k: v.iloc[train] for k, v in panel.items()}, score.iloc[train],
+                                config["buy_threshold"], config["sell_threshold"])
+        assert result["metrics"]["sharpe_ratio"] <= best + 1e-12
+
+
+if __name__ == "__main__":
+    prices = {f"{600000 + i}": make_prices(1250, seed=i) for i in range(50)}
+    configs = dict(weight_grid=simplex_weights(step=0.25),
+                   threshold_grid=[(0.1, -0.1), (0.2, -0.2), (0.3, -0.1)])
+    n = len(expand_grid(**configs))
+
+    start = time.perf_counter()
+    results = walk_forward_sweep(prices, train_bars=500, test_bars=125, **configs)
+    elapsed = time.perf_counter() - start
+    print(f"50只股票 x 1250个交易日, {n}组参数 x {len(results)}个窗口: {elapsed:.2f}s")
+    print(results[["test_start", "test_end", "buy_threshold", "train_sharpe_ratio",
+                   "test_total_return"]])
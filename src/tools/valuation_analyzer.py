@@ -1,7 +1,8 @@
 import os
 import json
 from datetime import datetime
-from src.tools.openrouter_config import get_chat_completion, logger as api_logger
+from src.tools.openrouter_config import get_chat_completion, get_chat_completion_async, logger as api_logger
+from src.tools.prompt_packer import compact_json, merge_results, run_chunked, run_chunked_async, split_for_messages
 import time
 import pandas as pd
 import re
@@ -11,6 +12,28 @@ def get_value_analyze(end_date:str,stock_value_dict: dict,signal_text: str) -> f
     if not stock_value_dict:
         return 0.0
 
+    def analyze(chunk):
+        return parse_value_result(get_chat_completion(build_value_messages(end_date, chunk, signal_text)))
+
+    # 超出token预算时按股票分块并行请求,再合并各块的结果
+    chunks = split_for_messages(stock_value_dict, lambda chunk: build_value_messages(end_date, chunk, signal_text))
+    return merge_results(run_chunked(chunks, analyze), chunks)
+
+
+async def get_value_analyze_async(end_date:str,stock_value_dict: dict,signal_text: str) -> float:
+    """get_value_analyze 的异步版本,与其他分析师的LLM请求并发进行"""
+    if not stock_value_dict:
+        return 0.0
+
+    async def analyze(chunk):
+        return parse_value_result(await get_chat_completion_async(build_value_messages(end_date, chunk, signal_text)))
+
+    chunks = split_for_messages(stock_value_dict, lambda chunk: build_value_messages(end_date, chunk, signal_text))
+    return merge_results(await run_chunked_async(chunks, analyze), chunks)
+
+
+def build_value_messages(end_date:str,stock_value_dict: dict,signal_text: str) -> list:
+    """构造价值投资分析的对话消息"""
     stock_list=stock_value_dict.keys()
 
 
@@ -46,7 +69,7 @@ def get_value_analyze(end_date:str,stock_value_dict: dict,signal_text: str) -> f
     user_message = {
         "role": "user", #prompt
         "content": f"""
-        分析以下A股上市公司{stock_list}相关价值投资指标,对比并计算每只的股票的未来价格:\n\n{stock_value_dict}\n\n
+        分析以下A股上市公司{stock_list}相关价值投资指标,对比并计算每只的股票的未来价格:\n\n{compact_json(stock_value_dict)}\n\n
         使用股票价值投资分析、财务分析、交易理论等专业知识,避免模糊的回答，用词专业.
         首先返回一列对价值投资指标综合打分的数字,范围是-1到1,越接近1证明上涨概率越大,记作'结果:[股票列表:分数]',例如'结果:[股票代码1:0.8,股票代码2:-0.5]'.
         之后,结合你所获得的价值投资指标和相关解释,用1000字分点列出做出该判断的理由,要求有理有据且表述明确,不要用模糊的词汇,
@@ -54,9 +77,12 @@ def get_value_analyze(end_date:str,stock_value_dict: dict,signal_text: str) -> f
         """
     }
 
+    return [system_message, user_message]
+
+
+def parse_value_result(result):
+    """从LLM原始响应中提取价值投资分析内容"""
     try:
-        # 获取价值投资分析结果
-        result = get_chat_completion([system_message, user_message])
         if result is None:
             print("Error: PI error occurred, LLM returned None")
             return 0.0
@@ -0,0 +1,226 @@
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.tools.panel_indicators import build_price_panel, calculate_panel_strategy_signals
+from src.tools.panel_indicators import combine_panel_signals
+from src.tools.performance import performance_metrics
+
+# Default A-share trading costs
+COMMISSION_RATE = 0.00025   # broker commission, both sides
+MIN_COMMISSION = 5.0        # minimum commission per order (CNY)
+STAMP_DUTY = 0.0005         # stamp duty, sell side only
+LOT_SIZE = 100              # shares per board lot
+
+
+def target_positions(
+    score: pd.DataFrame,
+    buy_threshold: float = 0.2,
+    sell_threshold: float = -0.2
+) -> pd.DataFrame:
+    """
+    Long-only position flags from the combined strategy score.
+
+    A bar with score above buy_threshold turns the position on, a bar below
+    sell_threshold turns it off, anything in between keeps the previous
+    state. A-shares cannot be shorted, so bearish signals only mean flat.
+
+    Returns:
+        DataFrame of 1.0 (long) / 0.0 (flat) with the shape of score
+    """
+    state = np.where(score > buy_threshold, 1.0,
+                     np.where(score < sell_threshold, 0.0, np.nan))
+    return pd.DataFrame(state, index=score.index, columns=score.columns).ffill().fillna(0.0)
+
+
+def _commission(value: float, commission_rate: float, min_commission: float) -> float:
+    return max(value * commission_rate, min_commission) if value > 0 else 0.0
+
+
+def simulate_positions(
+    target: pd.DataFrame,
+    open_: pd.DataFrame,
+    close: pd.DataFrame,
+    capital_per_ticker: float,
+    lot_size: int = LOT_SIZE,
+    commission_rate: float = COMMISSION_RATE,
+    min_commission: float = MIN_COMMISSION,
+    stamp_duty: float = STAMP_DUTY,
+    slippage: float = 0.0,
+    dates: Optional[pd.DataFrame] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Execute position flags with A-share trading rules.
+
+    The flag decided on the close of bar t is filled at the open of bar t+1,
+    so there is no look-ahead and a position bought on one day can at the
+    earliest be sold on the next (T+1). Bars without an open price (padding,
+    suspensions) carry the previous position. Each ticker trades its own
+    sleeve of capital_per_ticker in whole lots, paying commission (with a
+    minimum per order), sell-side stamp duty and proportional slippage.
+
+    The day-by-day state is built with array operations; only the trade
+    events themselves are walked in order, because the cash available for
+    the next buy depends on the proceeds of the previous sell.
+
+    Returns:
+        Dict with 'shares', 'cash' and 'equity' panels and a 'trades' frame
+    """
+    n_bars, n_tickers = target.shape
+    opens = open_.to_numpy(dtype=float)
+    closes = close.ffill().to_numpy(dtype=float)
+    tradable = ~np.isnan(opens)
+
+    desired = np.vstack([np.zeros((1, n_tickers)), target.to_numpy(dtype=float)[:-1]])
+    held = pd.DataFrame(np.where(tradable, desired, np.nan)).ffill().fillna(0.0).to_numpy()
+    changes = np.diff(held, axis=0, prepend=0.0)
+
+    shares = np.zeros((n_bars, n_tickers))
+    cash = np.full((n_bars, n_tickers), float(capital_per_ticker))
+    trades = []
+    tickers = list(target.columns)
+    for column in range(n_tickers):
+        balance = float(capital_per_ticker)
+        position = 0
+        for bar in np.flatnonzero(changes[:, column]):
+            if changes[bar, column] > 0:
+                price = opens[bar, column] * (1 + slippage)
+                quantity = math.floor(balance / (price * (1 + commission_rate)) / lot_size) * lot_size
+                while quantity > 0 and quantity * price + _commission(
+                        quantity * price, commission_rate, min_commission) > balance:
+                    quantity -= lot_size
+                if quantity <= 0:
+                    continue
+                value = quantity * price
+                fee = _commission(value, commission_rate, min_commission)
+                balance -= value + fee
+                position = quantity
+                action = "buy"
+            else:
+                if position == 0:
+                    continue
+                price = opens[bar, column] * (1 - slippage)
+                quantity = position
+                value = quantity * price
+                fee = _commission(value, commission_rate, min_commission) + value * stamp_duty
+                balance += value - fee
+                position = 0
+                action = "sell"
+
+            shares[bar:, column] = position
+            cash[bar:, column] = balance
+            trades.append({
+                "ticker": tickers[column],
+                "bar": bar,
+                "date": dates.iat[bar, column] if dates is not None else None,
+                "action": action,
+                "quantity": quantity,
+                "price": price,
+                "cost": fee,
+            })
+
+    holdings = np.where(shares > 0, shares * np.nan_to_num(closes), 0.0)
+    equity = cash + holdings
+    # rows before a ticker's first bar are padding, not sleeve history
+    equity = np.where(np.isnan(closes), np.nan, equity)
+
+    def frame(values):
+        return pd.DataFrame(values, index=target.index, columns=target.columns)
+
+    return {
+        "shares": frame(shares),
+        "cash": frame(cash),
+        "equity": frame(equity),
+        "trades": pd.DataFrame(trades, columns=["ticker", "bar", "date", "action",
+                                                "quantity", "price", "cost"]),
+    }
+
+
+def _portfolio_value(equity: pd.DataFrame, dates: Optional[pd.DataFrame],
+                     capital_per_ticker: float) -> pd.Series:
+    """Sum the ticker sleeves on a common calendar; idle sleeves hold cash."""
+    if dates is None:
+        return equity.fillna(capital_per_ticker).sum(axis=1)
+
+    values = equity.to_numpy(dtype=float)
+    stamps = dates.to_numpy(dtype="datetime64[ns]")
+    valid = ~np.isnan(values) & ~np.isnat(stamps)
+    calendar, position = np.unique(stamps[valid], return_inverse=True)
+    combined = np.full((len(calendar), equity.shape[1]), np.nan)
+    combined[position, np.nonzero(valid)[1]] = values[valid]
+    combined = pd.DataFrame(combined, index=pd.DatetimeIndex(calendar), columns=equity.columns)
+    return combined.ffill().fillna(capital_per_ticker).sum(axis=1)
+
+
+def backtest_panel(
+    panel: Dict[str, pd.DataFrame],
+    score: pd.DataFrame,
+    buy_threshold: float = 0.2,
+    sell_threshold: float = -0.2,
+    initial_capital: float = 100000.0,
+    **execution
+) -> Dict:
+    """
+    Backtest a precomputed score panel (see run_vector_backtest).
+
+    Keeping this separate from the signal computation lets parameter sweeps
+    reuse one set of strategy signals.
+
+    Args:
+        panel: Price panel from build_price_panel
+        score: Combined strategy score panel aligned with the price panel
+        buy_threshold: Score above which a position is opened
+        sell_threshold: Score below which a position is closed
+        initial_capital: Capital split equally across tickers
+        **execution: lot_size, commission_rate, min_commission, stamp_duty, slippage
+
+    Returns:
+        Dict with 'equity', 'shares', 'trades', 'portfolio_value',
+        'metrics' (whole portfolio) and 'ticker_metrics' (per ticker sleeve)
+    """
+    capital_per_ticker = initial_capital / max(len(score.columns), 1)
+    dates = panel.get("date")
+    target = target_positions(score, buy_threshold, sell_threshold)
+    result = simulate_positions(target, panel["open"], panel["close"], capital_per_ticker,
+                                dates=dates, **execution)
+
+    portfolio_value = _portfolio_value(result["equity"], dates, capital_per_ticker)
+    result["portfolio_value"] = portfolio_value
+    result["metrics"] = performance_metrics(portfolio_value, initial_capital)
+    result["ticker_metrics"] = performance_metrics(result["equity"], capital_per_ticker)
+    return result
+
+
+def run_vector_backtest(
+    prices_dict: Dict[str, pd.DataFrame],
+    weights: Dict[str, float] = None,
+    buy_threshold: float = 0.2,
+    sell_threshold: float = -0.2,
+    initial_capital: float = 100000.0,
+    **execution
+) -> Dict:
+    """
+    Backtest the rule-based technical strategies without the LLM.
+
+    The trend, mean reversion, momentum, volatility and stat-arb signals and
+    their weighted combination are evaluated for every bar of every ticker in
+    one pass over the price panel (row t equals what tech_calculator returns
+    for the history ending at t), then traded long-only with next-open fills.
+
+    Args:
+        prices_dict: Mapping of ticker to OHLCV DataFrame (with a date column)
+        weights: Strategy weights, defaults to DEFAULT_STRATEGY_WEIGHTS
+        buy_threshold: Combined score above which a position is opened
+        sell_threshold: Combined score below which a position is closed
+        initial_capital: Capital split equally across tickers
+        **execution: lot_size, commission_rate, min_commission, stamp_duty, slippage
+
+    Returns:
+        See backtest_panel
+    """
+    panel = build_price_panel(prices_dict)
+    combined = combine_panel_signals(calculate_panel_strategy_signals(panel), weights)
+    return backtest_panel(panel, combined["score"], buy_threshold, sell_threshold,
+                          initial_capital, **execution)
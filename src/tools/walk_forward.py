@@ -0,0 +1,243 @@
+import os
+import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.tools.panel_indicators import DEFAULT_STRATEGY_PARAMS, DEFAULT_STRATEGY_WEIGHTS
+from src.tools.panel_indicators import build_price_panel, calculate_panel_strategy_inputs
+from src.tools.panel_indicators import combine_panel_signals, panel_strategy_signals
+from src.tools.vector_backtest import backtest_panel
+
+# Worker processes for parameter sweeps
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", str(os.cpu_count() or 1)))
+WALK_FORWARD_RESULTS_PATH = os.path.join("src", "data", "walk_forward.json")
+
+# Set in each worker by _init_worker, so the panels are shipped once per process
+_sweep_state = None
+
+
+def simplex_weights(
+    strategies: Iterable[str] = tuple(DEFAULT_STRATEGY_WEIGHTS),
+    step: float = 0.25
+) -> List[Dict[str, float]]:
+    """
+    All strategy weightings on a grid of `step` that sum to 1.
+
+    With the five strategies a step of 0.25 gives 70 weightings, 0.1 gives
+    1001.
+    """
+    strategies = list(strategies)
+    units = int(round(1 / step))
+    grid = []
+    for cuts in itertools.combinations(range(units + len(strategies) - 1), len(strategies) - 1):
+        bounds = (-1,) + cuts + (units + len(strategies) - 1,)
+        counts = [bounds[i + 1] - bounds[i] - 1 for i in range(len(strategies))]
+        grid.append({name: count / units for name, count in zip(strategies, counts)})
+    return grid
+
+
+def expand_grid(
+    weight_grid: List[Dict[str, float]] = None,
+    param_grid: Dict[str, List[float]] = None,
+    threshold_grid: List[Tuple[float, float]] = None
+) -> List[Dict]:
+    """
+    Cartesian product of the three grids as a list of configs.
+
+    Args:
+        weight_grid: Strategy weightings, defaults to [DEFAULT_STRATEGY_WEIGHTS]
+        param_grid: Candidate values per DEFAULT_STRATEGY_PARAMS key;
+            keys left out keep their default
+        threshold_grid: (buy_threshold, sell_threshold) pairs, defaults to [(0.2, -0.2)]
+
+    Returns:
+        List of {'weights', 'params', 'buy_threshold', 'sell_threshold'},
+        ordered so that configs sharing params are adjacent
+    """
+    weight_grid = weight_grid or [DEFAULT_STRATEGY_WEIGHTS]
+    param_grid = param_grid or {}
+    threshold_grid = threshold_grid or [(0.2, -0.2)]
+    unknown = set(param_grid) - set(DEFAULT_STRATEGY_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown strategy params: {sorted(unknown)}")
+
+    names = list(param_grid)
+    configs = []
+    for values in itertools.product(*param_grid.values()):
+        params = {**DEFAULT_STRATEGY_PARAMS, **dict(zip(names, values))}
+        for weights in weight_grid:
+            for buy_threshold, sell_threshold in threshold_grid:
+                configs.append({
+                    'weights': dict(weights),
+                    'params': params,
+                    'buy_threshold': buy_threshold,
+                    'sell_threshold': sell_threshold,
+                })
+    return configs
+
+
+def walk_forward_windows(
+    n_bars: int,
+    train_bars: int,
+    test_bars: int,
+    step_bars: Optional[int] = None,
+    start: int = 0
+) -> List[Tuple[slice, slice]]:
+    """
+    Rolling (train, test) row ranges: each test range directly follows its
+    train range, and windows advance by step_bars (default test_bars) so the
+    test ranges tile the history without overlap.
+    """
+    step_bars = step_bars or test_bars
+    windows = []
+    begin = start
+    while begin + train_bars + test_bars <= n_bars:
+        split = begin + train_bars
+        windows.append((slice(begin, split), slice(split, split + test_bars)))
+        begin += step_bars
+    return windows
+
+
+def _slice_panel(panel: Dict[str, pd.DataFrame], rows: slice) -> Dict[str, pd.DataFrame]:
+    return {field: frame.iloc[rows] for field, frame in panel.items()}
+
+
+def _evaluate_configs(state: Dict, configs: List[Dict]) -> np.ndarray:
+    """Train-window objective of every config; signals are reused across configs with equal params."""
+    scores = np.full((len(configs), len(state['windows'])), np.nan)
+    params_key, signals = None, None
+    for i, config in enumerate(configs):
+        key = tuple(sorted(config['params'].items()))
+        if key != params_key:
+            params_key, signals = key, panel_strategy_signals(state['inputs'], config['params'])
+        score = combine_panel_signals(signals, config['weights'])['score']
+        for j, (train, _) in enumerate(state['windows']):
+            result = backtest_panel(_slice_panel(state['panel'], train), score.iloc[train],
+                                    config['buy_threshold'], config['sell_threshold'],
+                                    state['initial_capital'], **state['execution'])
+            scores[i, j] = result['metrics'][state['metric']]
+    return scores
+
+
+def _init_worker(state: Dict):
+    global _sweep_state
+    _sweep_state = state
+
+
+def _evaluate_chunk(configs: List[Dict]) -> np.ndarray:
+    return _evaluate_configs(_sweep_state, configs)
+
+
+def _window_dates(panel: Dict[str, pd.DataFrame], rows: slice):
+    if "date" not in panel:
+        return rows.start, rows.stop - 1
+    dates = panel["date"].iloc[rows]
+    return dates.min().min(), dates.max().max()
+
+
+def walk_forward_sweep(
+    prices_dict: Dict[str, pd.DataFrame],
+    train_bars: int = 250,
+    test_bars: int = 60,
+    step_bars: Optional[int] = None,
+    weight_grid: List[Dict[str, float]] = None,
+    param_grid: Dict[str, List[float]] = None,
+    threshold_grid: List[Tuple[float, float]] = None,
+    metric: str = "sharpe_ratio",
+    initial_capital: float = 100000.0,
+    workers: Optional[int] = None,
+    **execution
+) -> pd.DataFrame:
+    """
+    Walk-forward optimization of the strategy weights and thresholds.
+
+    The strategy inputs (EMAs, z-scores, momentum, volatility, Hurst, ...)
+    are computed once for the whole price panel. A grid point then only
+    costs applying its thresholds, the weighted combination and the
+    backtest of each train window. Indicators at row t only use the
+    history up to t, so slicing the full-history panels into windows does
+    not leak future data. Configs are split across a process pool.
+
+    For every window the config with the best train objective is
+    backtested on the following test window with fresh capital.
+
+    Args:
+        prices_dict: Mapping of ticker to OHLCV DataFrame (with a date column)
+        train_bars: Length of each train window in bars
+        test_bars: Length of each test window in bars
+        step_bars: Bars between window starts, defaults to test_bars
+        weight_grid, param_grid, threshold_grid: See expand_grid
+        metric: performance_metrics key to maximize on the train window
+        initial_capital: Capital per window, split equally across tickers
+        workers: Worker processes, defaults to SWEEP_WORKERS; 1 runs in-process
+        **execution: lot_size, commission_rate, min_commission, stamp_duty, slippage
+
+    Returns:
+        DataFrame with one row per window: window dates, the best config
+        (buy/sell threshold, weights, params), its train objective and its
+        test total_return / sharpe_ratio / max_drawdown / final_value
+    """
+    panel = build_price_panel(prices_dict)
+    n_bars = len(panel['close'])
+    windows = walk_forward_windows(n_bars, train_bars, test_bars, step_bars)
+    if not windows:
+        raise ValueError(f"{n_bars} bars are not enough for one {train_bars}+{test_bars} bar window")
+
+    configs = expand_grid(weight_grid, param_grid, threshold_grid)
+    state = {
+        'panel': panel,
+        'inputs': calculate_panel_strategy_inputs(panel),
+        'windows': windows,
+        'metric': metric,
+        'initial_capital': initial_capital,
+        'execution': execution,
+    }
+
+    workers = min(workers or SWEEP_WORKERS, len(configs))
+    if workers <= 1:
+        scores = _evaluate_configs(state, configs)
+    else:
+        size = -(-len(configs) // (workers * 4))
+        chunks = [configs[i:i + size] for i in range(0, len(configs), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(state,)) as pool:
+            scores = np.vstack(list(pool.map(_evaluate_chunk, chunks)))
+
+    rows = []
+    for j, (train, test) in enumerate(windows):
+        column = np.where(np.isnan(scores[:, j]), -np.inf, scores[:, j])
+        index = int(np.argmax(column))
+        best = configs[index]
+        score = combine_panel_signals(panel_strategy_signals(state['inputs'], best['params']),
+                                      best['weights'])['score']
+        result = backtest_panel(_slice_panel(panel, test), score.iloc[test],
+                                best['buy_threshold'], best['sell_threshold'],
+                                initial_capital, **execution)
+        train_start, train_end = _window_dates(panel, train)
+        test_start, test_end = _window_dates(panel, test)
+        rows.append({
+            'window': j,
+            'train_start': train_start,
+            'train_end': train_end,
+            'test_start': test_start,
+            'test_end': test_end,
+            'buy_threshold': best['buy_threshold'],
+            'sell_threshold': best['sell_threshold'],
+            'weights': best['weights'],
+            'params': best['params'],
+            f'train_{metric}': scores[index, j],
+            **{f'test_{name}': value for name, value in result['metrics'].items()},
+        })
+    return pd.DataFrame(rows)
+
+
+def save_walk_forward_results(results: pd.DataFrame, path: str = WALK_FORWARD_RESULTS_PATH):
+    """Write the best config per window as a JSON list."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(json.loads(results.to_json(orient="records", date_format="iso")), f,
+                  ensure_ascii=False, indent=2)
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """获取常驻后台线程中运行的事件循环,首次调用时启动"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever, name="async-runner", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_sync(coro):
+    """在常驻事件循环中运行协程并阻塞等待结果
+
+    与 asyncio.run 不同,事件循环在多次调用之间保持运行,
+    绑定在该循环上的连接池(如LLM异步客户端)可以跨调用复用;
+    调用方自身已处于事件循环中时也可以使用.
+
+    Args:
+        coro: 要运行的协程
+
+    Returns:
+        协程的返回值
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
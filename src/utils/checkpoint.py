@@ -0,0 +1,280 @@
+import os
+import pickle
+import sqlite3
+import inspect
+import functools
+import threading
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.agents.state import FailedUpdate
+from src.utils.sqlite_cache import SQLiteCache, make_cache_key
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger('checkpoint')
+
+# 工作流检查点,运行中断后从最后完成的节点继续
+GRAPH_CHECKPOINT_PATH = os.getenv(
+    "GRAPH_CHECKPOINT_PATH", os.path.join("src", "data", "graph_checkpoints.sqlite"))
+
+# 节点结果缓存,相同输入的节点直接复用上次的结果
+NODE_MEMO_BYPASS = os.getenv("NODE_MEMO_BYPASS", "0") == "1"
+NODE_MEMO_PATH = os.getenv("NODE_MEMO_PATH", os.path.join("src", "data", "node_memo.sqlite"))
+NODE_MEMO_TTL = float(os.getenv("NODE_MEMO_TTL", str(7 * 24 * 3600)))
+NODE_MEMO_MAX_MB = float(os.getenv("NODE_MEMO_MAX_MB", "500"))
+
+node_memo = SQLiteCache(NODE_MEMO_PATH, ttl=NODE_MEMO_TTL,
+                        max_bytes=int(NODE_MEMO_MAX_MB * 1024 * 1024))
+
+# 结果还依赖运行参数以外输入的节点,不做缓存:
+# 情感分析使用的新闻在同一 end_date 下也会不断新增(单条新闻的得分另有缓存)
+NODE_MEMO_EXCLUDE = {"sentiment_agent"}
+
+# 决定一次运行结果的输入参数
+RUN_INPUT_KEYS = ("ticker_list", "portfolio", "start_date", "end_date", "num_of_news")
+
+
+class PickleFallbackSerializer(JsonPlusSerializer):
+    """msgpack 无法编码的对象(如状态中的 DataFrame)改用 pickle 序列化
+
+    检查点只保存在本地,由本程序读写.
+    """
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        try:
+            return super().dumps_typed(obj)
+        except (TypeError, ValueError):
+            return "pickle", pickle.dumps(obj)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        if data[0] == "pickle":
+            return pickle.loads(data[1])
+        return super().loads_typed(data)
+
+
+class SQLiteSaver(InMemorySaver):
+    """把 LangGraph 检查点保存到 SQLite 的 checkpointer
+
+    读写逻辑沿用 InMemorySaver,每次写入时同步落盘,
+    首次访问某个线程时从磁盘加载该线程的检查点.
+
+    Args:
+        path: SQLite文件路径
+    """
+
+    def __init__(self, path: str = GRAPH_CHECKPOINT_PATH):
+        super().__init__(serde=PickleFallbackSerializer())
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = set()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    checkpoint_id TEXT NOT NULL,
+                    checkpoint_type TEXT NOT NULL,
+                    checkpoint BLOB NOT NULL,
+                    metadata_type TEXT NOT NULL,
+                    metadata BLOB NOT NULL,
+                    parent_checkpoint_id TEXT,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    value_type TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    task_path TEXT NOT NULL,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                )""")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _load_thread(self, thread_id: str):
+        """把线程的检查点从磁盘读入内存,每个线程只读取一次"""
+        with self._lock:
+            if thread_id in self._loaded:
+                return
+            conn = self._connect()
+            try:
+                checkpoints = conn.execute(
+                    "SELECT checkpoint_ns, checkpoint_id, checkpoint_type, checkpoint, "
+                    "metadata_type, metadata, parent_checkpoint_id "
+                    "FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchall()
+                writes = conn.execute(
+                    "SELECT checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                    "value_type, value, task_path FROM writes WHERE thread_id = ?",
+                    (thread_id,)).fetchall()
+            finally:
+                conn.close()
+
+            for ns, checkpoint_id, c_type, checkpoint, m_type, metadata, parent in checkpoints:
+                self.storage[thread_id][ns][checkpoint_id] = (
+                    (c_type, checkpoint), (m_type, metadata), parent)
+            for ns, checkpoint_id, task_id, idx, channel, v_type, value, task_path in writes:
+                self.writes[(thread_id, ns, checkpoint_id)][(task_id, idx)] = (
+                    task_id, channel, (v_type, value), task_path)
+            self._loaded.add(thread_id)
+
+    def get_tuple(self, config: RunnableConfig):
+        self._load_thread(config["configurable"]["thread_id"])
+        return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], *, filter=None, before=None, limit=None):
+        if config:
+            self._load_thread(config["configurable"]["thread_id"])
+        else:
+            conn = self._connect()
+            try:
+                thread_ids = [row[0] for row in conn.execute(
+                    "SELECT DISTINCT thread_id FROM checkpoints")]
+            finally:
+                conn.close()
+            for thread_id in thread_ids:
+                self._load_thread(thread_id)
+        yield from super().list(config, filter=filter, before=before, limit=limit)
+
+    def put(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        self._load_thread(thread_id)
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+
+        ns = next_config["configurable"]["checkpoint_ns"]
+        checkpoint_id = next_config["configurable"]["checkpoint_id"]
+        (c_type, c_data), (m_type, m_data), parent = self.storage[thread_id][ns][checkpoint_id]
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint_id, c_type, c_data, m_type, m_data, parent))
+                conn.commit()
+            finally:
+                conn.close()
+        return next_config
+
+    def put_writes(self, config, writes, task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        self._load_thread(thread_id)
+        super().put_writes(config, writes, task_id, task_path)
+
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (thread_id, ns, checkpoint_id, key_task, idx, channel, value[0], value[1], path)
+            for (key_task, idx), (_, channel, value, path)
+            in self.writes[(thread_id, ns, checkpoint_id)].items()
+            if key_task == task_id
+        ]
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def delete_thread(self, thread_id: str):
+        """删除线程的全部检查点"""
+        with self._lock:
+            self.storage.pop(thread_id, None)
+            for key in [key for key in self.writes if key[0] == thread_id]:
+                del self.writes[key]
+            self._loaded.add(thread_id)
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                conn.commit()
+            finally:
+                conn.close()
+
+
+def run_thread_id(data: dict) -> str:
+    """由运行参数生成检查点线程ID,相同参数的运行共用同一个线程"""
+    return make_cache_key("run", {key: data.get(key) for key in RUN_INPUT_KEYS})
+
+
+def node_input_key(name: str, state: dict) -> str:
+    """节点输入的哈希:运行参数加上游节点的全部消息
+
+    上游节点写入 data 的内容同样由运行参数决定,不单独计入.
+    """
+    data = state["data"]
+    messages = [(msg.name, msg.content) for msg in state["messages"]]
+    return make_cache_key("node", name, {key: data.get(key) for key in RUN_INPUT_KEYS}, messages)
+
+
+def memoized_node(name: str, node):
+    """包装节点函数,相同输入时直接返回上次的结果
+
+    未指定 end_date 时结果依赖当天日期,不做缓存;NODE_MEMO_EXCLUDE 中的节点
+    直接返回原函数.节点返回 FailedUpdate(如LLM请求失败后的默认结论)时同样不缓存,
+    下次运行时重新执行.
+
+    Args:
+        name: 节点名称
+        node: 节点函数,参数为 AgentState,返回状态更新
+    """
+    if name in NODE_MEMO_EXCLUDE:
+        return node
+
+    def lookup(state):
+        if NODE_MEMO_BYPASS or not state["data"].get("end_date"):
+            return None, None
+        key = node_input_key(name, state)
+        cached = node_memo.get(key)
+        if cached is None:
+            return key, None
+        logger.info(f"节点 {name} 输入未变化,复用上次结果")
+        return key, pickle.loads(cached)
+
+    def store(key, update):
+        if key is None:
+            return
+        if isinstance(update, FailedUpdate):
+            logger.info(f"节点 {name} 未得到有效结果,不缓存")
+            return
+        try:
+            node_memo.set(key, pickle.dumps(update))
+        except Exception as e:
+            logger.warning(f"节点 {name} 结果缓存失败: {e}")
+
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state):
+            key, update = lookup(state)
+            if update is None:
+                update = await node(state)
+                store(key, update)
+            return update
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state):
+        key, update = lookup(state)
+        if update is None:
+            update = node(state)
+            store(key, update)
+        return update
+    return wrapper
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Union
+
+
+def make_cache_key(*parts) -> str:
+    """把任意可JSON序列化的内容转换为稳定的SHA-256键"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCache:
+    """基于SQLite的磁盘键值缓存,支持过期时间、LRU淘汰和容量上限
+
+    每次操作使用独立连接,可在多线程及多进程间共享同一个缓存文件.
+
+    Args:
+        path: SQLite文件路径
+        ttl: 条目有效期(秒),None或<=0表示不过期
+        max_entries: 最多保留的条目数,None表示不限制
+        max_bytes: 条目内容总字节数上限,None表示不限制
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.path = path
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        """读取缓存,未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    row = None
+                elif row is not None:
+                    conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                conn.commit()
+            finally:
+                conn.close()
+
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: Union[str, bytes]):
+        """写入缓存,并按过期时间和容量上限淘汰旧条目
+
+        value 可以是文本或二进制内容,读取时按写入时的类型返回.
+        """
+        now = time.time()
+        size = len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now))
+                self._evict(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def delete(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM entries")
+                conn.commit()
+            finally:
+                conn.close()
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if self.ttl is not None:
+            conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if self.max_entries is not None and count > self.max_entries:
+            # 删除最久未访问的条目
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+                (count - self.max_entries,))
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+        if self.max_bytes is not None and total > self.max_bytes:
+            excess = total - self.max_bytes
+            removed = 0
+            keys = []
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+                if removed >= excess:
+                    break
+                keys.append((key,))
+                removed += size
+            conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+
+    def stats(self) -> dict:
+        """命中/未命中次数及当前条目数和总字节数"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                count, total = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            finally:
+                conn.close()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": count,
+                "bytes": total,
+            }
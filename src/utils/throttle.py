@@ -0,0 +1,103 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from typing import Optional
+from contextlib import contextmanager
+
+# 每个数据源主机允许的最大并发请求数,可通过环境变量配置
+HOST_CONCURRENCY = {
+    "eastmoney": int(os.getenv("EASTMONEY_MAX_CONCURRENCY", "4")),
+    "sina": int(os.getenv("SINA_MAX_CONCURRENCY", "2")),
+}
+DEFAULT_HOST_CONCURRENCY = int(os.getenv("DEFAULT_HOST_MAX_CONCURRENCY", "4"))
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def _get_host_semaphore(host: str) -> threading.BoundedSemaphore:
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            limit = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+            semaphore = threading.BoundedSemaphore(max(1, limit))
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+
+@contextmanager
+def host_slot(host: str):
+    """占用一个主机并发名额,名额用完时阻塞等待
+
+    Args:
+        host: 数据源主机名称,如 "eastmoney"、"sina"
+    """
+    semaphore = _get_host_semaphore(host)
+    with semaphore:
+        yield
+
+
+# LLM请求速率上限(次/分钟),0表示不限制
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0"))
+
+
+class RateLimiter:
+    """可跨进程共享的请求速率限制器
+
+    请求按 period/rate 秒的间隔依次放行.状态保存在 multiprocessing 共享内存中,
+    在创建进程时作为参数传入(如进程池的 initargs),所有进程共用同一个速率上限.
+
+    Args:
+        rate: 每个周期内允许的请求数
+        period: 周期长度(秒)
+        ctx: multiprocessing 上下文,默认使用当前平台的默认上下文
+    """
+
+    def __init__(self, rate: float, period: float = 60.0, ctx=None):
+        ctx = ctx or multiprocessing.get_context()
+        self.interval = period / rate
+        self._next_slot = ctx.Value("d", 0.0, lock=False)
+        self._lock = ctx.Lock()
+
+    def reserve(self) -> float:
+        """预约下一个请求名额,返回需要等待的秒数"""
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        """阻塞等待到预约的名额"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire 的异步版本,等待时不阻塞事件循环"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_llm_rate_limiter = RateLimiter(LLM_RATE_LIMIT) if LLM_RATE_LIMIT > 0 else None
+
+
+def set_llm_rate_limiter(limiter: Optional[RateLimiter]):
+    """设置全局LLM速率限制器,多进程回测时在子进程初始化中调用"""
+    global _llm_rate_limiter
+    _llm_rate_limiter = limiter
+
+
+def acquire_llm_slot():
+    """发送LLM请求前调用,未设置速率限制时立即返回"""
+    if _llm_rate_limiter is not None:
+        _llm_rate_limiter.acquire()
+
+
+async def acquire_llm_slot_async():
+    """acquire_llm_slot 的异步版本"""
+    if _llm_rate_limiter is not None:
+        await _llm_rate_limiter.acquire_async()